@@ -0,0 +1,263 @@
+"""Benchmarks of the drawing engine across canvas sizes and shapes.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_drawing --output results.json
+    python -m benchmarks.bench_drawing --compare results.json
+    python -m benchmarks.bench_drawing --storage numpy --against list --sizes 2000x2000
+
+Each workload is timed (best of ``--repeat`` runs) and then run once more
+under ``tracemalloc`` to record its peak memory. Only the standard library is
+used so the suite runs offline.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from src.canvas import Canvas
+from src.drawing_board import DrawingBoard
+from src.fill import FILL_ENGINES
+from src.storage import STORAGE_BACKENDS
+
+DEFAULT_SIZES = [(100, 100), (200, 200), (400, 400), (1000, 50), (50, 1000)]
+QUICK_SIZES = [(20, 20), (60, 10)]
+
+
+def _board(width: int, height: int, storage: str, fill_engine: str) -> DrawingBoard:
+    board = DrawingBoard(storage=storage, fill_engine=fill_engine)
+    board.new_canvas(width, height)
+    return board
+
+
+def _draw_maze(board: DrawingBoard):
+    """Vertical walls on every other column with alternating gaps: one long serpentine path."""
+    width, height = board.canvas.width, board.canvas.height
+    if height < 2:
+        return
+    for index, x in enumerate(range(2, width + 1, 2)):
+        if index % 2:
+            board.draw_line(x, 2, x, height, '#')
+        else:
+            board.draw_line(x, 1, x, height - 1, '#')
+
+
+def _draw_checkerboard(board: DrawingBoard):
+    """Walls on alternate pixels of every other row: a connected region of one-pixel spans."""
+    canvas = board.canvas
+    for y in range(2, canvas.height + 1, 2):
+        for x in range(1 + y // 2 % 2, canvas.width + 1, 2):
+            canvas.draw_pixel(x, y, '#')
+
+
+def _draw_spiral(board: DrawingBoard):
+    """Nested rectangle outlines, each opened on its left side towards the next ring."""
+    width, height = board.canvas.width, board.canvas.height
+    offset = 2
+    while offset * 2 + 1 <= min(width, height):
+        left, top, right, bottom = offset, offset, width - offset + 1, height - offset + 1
+        board.draw_rectangle(left, top, right, bottom, '#')
+        if bottom - top > 1:
+            board.canvas.draw_pixel(left, top + 1, ' ')
+        offset += 2
+
+
+def _draw_stripes(board: DrawingBoard):
+    """Horizontal lines on every other row: thin regions as wide as the canvas."""
+    width, height = board.canvas.width, board.canvas.height
+    for y in range(2, height + 1, 2):
+        board.draw_line(1, y, width, y, '-')
+
+
+def _draw_cell(board: DrawingBoard):
+    """A 3x3 cell enclosed in the top-left corner of the canvas."""
+    canvas = board.canvas
+    board.draw_rectangle(1, 1, min(5, canvas.width), min(5, canvas.height), '#')
+
+
+def _fill_workload(pattern, x: int = 1, y: int = 1):
+    def setup(width, height, storage, fill_engine):
+        board = _board(width, height, storage, fill_engine)
+        if pattern:
+            pattern(board)
+        return lambda: board.bucket_fill(min(x, width), min(y, height), '*')
+    return setup
+
+
+def _lines_workload(width, height, storage, fill_engine):
+    board = _board(width, height, storage, fill_engine)
+
+    def run():
+        for y in range(1, height + 1):
+            board.draw_line(1, y, width, y, '-')
+        for x in range(1, width + 1):
+            board.draw_line(x, 1, x, height, '|')
+    return run
+
+
+def _rectangles_workload(width, height, storage, fill_engine):
+    board = _board(width, height, storage, fill_engine)
+
+    def run():
+        for offset in range(min(width, height) // 2):
+            board.draw_rectangle(1 + offset, 1 + offset, width - offset, height - offset, '#')
+    return run
+
+
+def _canvas_workload(width, height, storage, fill_engine):
+    return lambda: Canvas(width, height, storage)
+
+
+def _render_workload(width, height, storage, fill_engine):
+    board = _board(width, height, storage, fill_engine)
+    _draw_spiral(board)
+    return lambda: str(DrawingBoard(board.canvas))
+
+
+WORKLOADS = {
+    'canvas': _canvas_workload,
+    'lines': _lines_workload,
+    'rectangles': _rectangles_workload,
+    'fill_empty': _fill_workload(None),
+    'fill_maze': _fill_workload(_draw_maze),
+    'fill_checkerboard': _fill_workload(_draw_checkerboard),
+    'fill_spiral': _fill_workload(_draw_spiral),
+    'fill_stripes': _fill_workload(_draw_stripes),
+    'fill_cell': _fill_workload(_draw_cell, 3, 3),
+    'render': _render_workload,
+}
+
+
+def measure(workload, width: int, height: int, storage: str, fill_engine: str, repeat: int) -> dict:
+    seconds = []
+    for _ in range(repeat):
+        run = workload(width, height, storage, fill_engine)
+        start = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+
+    run = workload(width, height, storage, fill_engine)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': min(seconds), 'peak_bytes': peak}
+
+
+def run_suite(sizes=None, names=None, storage: str = 'list', fill_engine: str = 'span', repeat: int = 3) -> dict:
+    results = []
+    for name in names or WORKLOADS:
+        for width, height in sizes or DEFAULT_SIZES:
+            result = {'name': name, 'width': width, 'height': height}
+            result.update(measure(WORKLOADS[name], width, height, storage, fill_engine, repeat))
+            results.append(result)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'storage': storage,
+            'fill_engine': fill_engine,
+            'repeat': repeat,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.2) -> list:
+    """Return descriptions of results slower or larger than the baseline by more than threshold.
+
+    Raises ValueError when the baseline was recorded with another storage
+    backend or fill engine, since its results are not comparable.
+    """
+    for setting in ('storage', 'fill_engine'):
+        before, after = baseline.get('meta', {}).get(setting), current.get('meta', {}).get(setting)
+        if before != after:
+            raise ValueError(f"The baseline was recorded with {setting} {before}, not {after}")
+    previous = {(r['name'], r['width'], r['height']): r for r in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        key = result['name'], result['width'], result['height']
+        if key not in previous:
+            continue
+        for metric in ('seconds', 'peak_bytes'):
+            before, after = previous[key][metric], result[metric]
+            if before and after > before * (1 + threshold):
+                regressions.append(
+                    f"{result['name']} {result['width']}x{result['height']} {metric}: "
+                    f"{before:.6g} -> {after:.6g} (+{(after / before - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def speedups(current: dict, other: dict) -> list:
+    """Describe how many times faster every result is than the same result of another run."""
+    timings = {(r['name'], r['width'], r['height']): r['seconds'] for r in other['results']}
+    lines = []
+    for result in current['results']:
+        key = result['name'], result['width'], result['height']
+        if key in timings and result['seconds']:
+            lines.append(f"{result['name']} {result['width']}x{result['height']}: "
+                         f"{timings[key] / result['seconds']:.2f}x")
+    return lines
+
+
+def _parse_size(text: str) -> tuple:
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the drawing engine")
+    parser.add_argument('--sizes', nargs='+', type=_parse_size, metavar='WxH',
+                        help="canvas sizes to sweep, e.g. 200x200 1000x50")
+    parser.add_argument('--quick', action='store_true', help="use tiny canvases, for smoke testing")
+    parser.add_argument('--workloads', nargs='+', choices=sorted(WORKLOADS), help="workloads to run")
+    parser.add_argument('--storage', choices=sorted(STORAGE_BACKENDS), default='list')
+    parser.add_argument('--fill-engine', choices=sorted(FILL_ENGINES), default='span')
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per workload, the best is kept")
+    parser.add_argument('--output', metavar='FILE', help="write results as JSON to FILE")
+    parser.add_argument('--compare', metavar='FILE', help="flag regressions against a saved JSON baseline")
+    parser.add_argument('--against', choices=sorted(STORAGE_BACKENDS), metavar='STORAGE',
+                        help="also run with STORAGE and report the speedup of --storage over it")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="relative slowdown or memory growth reported as a regression")
+    args = parser.parse_args(argv)
+
+    sizes = QUICK_SIZES if args.quick else args.sizes
+    report = run_suite(sizes, args.workloads, args.storage, args.fill_engine, args.repeat)
+
+    for result in report['results']:
+        print(f"{result['name']:<18} {result['width']:>6}x{result['height']:<6} "
+              f"{result['seconds'] * 1000:>10.2f} ms {result['peak_bytes'] / 1024:>10.1f} KiB")
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+
+    if args.against:
+        other = run_suite(sizes, args.workloads, args.against, args.fill_engine, args.repeat)
+        print(f"Speedup of {args.storage} over {args.against}:")
+        for line in speedups(report, other):
+            print(f"  {line}")
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            baseline = json.load(baseline)
+        try:
+            regressions = compare(report, baseline, args.threshold)
+        except ValueError as e:
+            print(f"Can not compare: {e}", file=sys.stderr)
+            return 2
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,26 @@
+import argparse
+import queue
+import sys
+import threading
+
+from src.canvas import Canvas
+from src.canvas_file import CanvasFile
 from src.drawing_board import DrawingBoard
-from src.exceptions import CommandError, DrawingError
+from src.exceptions import CanvasError, CommandError, DrawingError
+from src.export import EXPORTERS
+from src.fill import FILL_ENGINES
+from src.history import History
+from src.journal import SYNC_POLICIES, Journal
+from src.parallel import ParallelExecutor
+from src.protocol import decode_commands, encode_command, encode_header
+from src.renderer import Snapshot, SnapshotRenderer
+from src.stats import Stats
+from src.storage import STORAGE_BACKENDS
 
 
 def validate_params(cmd: str, params: list) -> tuple:
     match [cmd, *params]:
-        case ['Q']:
+        case ['Q'] | ['P']:
             return ()
 
         case ['C', width, height]:
@@ -21,76 +37,653 @@ def validate_params(cmd: str, params: list) -> tuple:
             except ValueError:
                 raise CommandError("Coordinates must be integers")
 
-        case ['B', x, y, c]:
+        case ['B', x, y, c] | ['B', x, y, c, 'view' | 'VIEW']:
             if len(c) != 1:
                 raise CommandError("Parameter c must be a character (length 1)")
             try:
-                return int(x), int(y), c
+                x, y = int(x), int(y)
             except ValueError:
                 raise CommandError("Coordinates must be integers")
+            return (x, y, c, True) if len(params) == 4 else (x, y, c)
+
+        case ['U' | 'Z']:
+            return (1,)
+
+        case ['S'] | ['V']:
+            return ()
+
+        case ['V', dx, dy]:
+            try:
+                return int(dx), int(dy)
+            except ValueError:
+                raise CommandError("Scroll offsets must be integers")
+
+        case ['V', x, y, width, height]:
+            try:
+                x, y, width, height = int(x), int(y), int(width), int(height)
+            except ValueError:
+                raise CommandError("Viewport position and size must be integers")
+            if width <= 0 or height <= 0:
+                raise CommandError("Viewport size must be positive integers")
+            return x, y, width, height
+
+        case ['S', path]:
+            return (path,)
+
+        case ['H']:
+            return ()
+
+        case ['H', c]:
+            if len(c) != 1:
+                raise CommandError("Parameter c must be a character (length 1)")
+            return (c,)
+
+        case ['E', path]:
+            if not path.lower().endswith(tuple(EXPORTERS)):
+                raise CommandError(f"Export file must end with one of {', '.join(EXPORTERS)}")
+            return (path,)
+
+        case ['Y', name]:
+            return (name,)
+
+        case ['Y', name, action]:
+            if action.lower() in ('show', 'hide'):
+                return name, action.lower()
+            try:
+                position = int(action)
+            except ValueError:
+                raise CommandError("Layer action must be show, hide or a position")
+            if position <= 0:
+                raise CommandError("Layer position must be a positive integer")
+            return name, position
+
+        case ['U' | 'Z', steps]:
+            try:
+                steps = int(steps)
+            except ValueError:
+                raise CommandError("Steps must be an integer")
+            if steps <= 0:
+                raise CommandError("Steps must be a positive integer")
+            return (steps,)
 
         case [cmd, *_] if cmd in ('L', 'R'):
             raise CommandError(f"{cmd} requires 5 parameters: x1 y1 x2 y2 c")
 
         case [cmd, *_] if cmd == 'B':
-            raise CommandError("B requires 3 parameters: x y c")
+            raise CommandError("B requires 3 parameters: x y c, optionally followed by view")
 
         case [cmd, *_] if cmd == 'C':
             raise CommandError("C requires 2 parameters: width height")
 
+        case [cmd, *_] if cmd in ('U', 'Z'):
+            raise CommandError(f"{cmd} takes at most 1 parameter: steps")
+
+        case [cmd, *_] if cmd in ('P', 'Q'):
+            raise CommandError(f"{cmd} takes no parameters")
+
+        case [cmd, *_] if cmd == 'V':
+            raise CommandError("V takes no parameters, dx dy or x y width height")
+
+        case [cmd, *_] if cmd == 'Y':
+            raise CommandError("Y requires a layer name, optionally followed by show, hide or a position")
+
+        case [cmd, *_] if cmd == 'S':
+            raise CommandError("S takes at most 1 parameter: file")
+
+        case [cmd, *_] if cmd == 'E':
+            raise CommandError("E requires 1 parameter: file")
+
+        case [cmd, *_] if cmd == 'H':
+            raise CommandError("H takes at most 1 parameter: c")
+
         case _:
             raise CommandError(f"Unknown command: {cmd}")
 
 
-def main():
-    board = DrawingBoard()
+def parse_command(command: str) -> tuple:
+    parts = command.split()
+    cmd, params = parts[0].upper(), parts[1:]
+    return cmd, validate_params(cmd, params)
+
+
+def parse_measured(board: DrawingBoard, command: str) -> tuple:
+    """parse_command, timed as 'validate_params' when the board collects statistics."""
+    if board.stats is None:
+        return parse_command(command)
+    with board.stats.measure('validate_params'):
+        return parse_command(command)
+
+
+def report_stats(board: DrawingBoard, params: tuple) -> str:
+    """Run an S command: the statistics summary, or a JSON dump to the given file."""
+    if board.stats is None:
+        raise CommandError("Statistics are not enabled, restart with --stats")
+    if params:
+        board.stats.dump(params[0])
+        return f"Statistics written to {params[0]}"
+    return board.stats.report()
+
+
+def report_content(board: DrawingBoard, params: tuple) -> str:
+    """The count of one character, or the canvas hash and the count of every character."""
+    content = board.content()
+    if params:
+        return f"{params[0]!r}: {content.count(params[0])}"
+    counts = sorted(content.histogram.items(), key=lambda item: (-item[1], item[0]))
+    return '\n'.join([f"Hash: {content.digest.hex()}"] + [f"{char!r}: {count}" for char, count in counts])
+
+
+def execute(board: DrawingBoard, cmd: str, params: tuple):
+    match cmd:
+        case 'C':
+            board.new_canvas(*params)
+
+        case 'L':
+            board.draw_line(*params)
+
+        case 'R':
+            board.draw_rectangle(*params)
+
+        case 'B':
+            board.bucket_fill(*params)
+
+        case 'U':
+            board.undo(*params)
+
+        case 'Z':
+            board.redo(*params)
+
+        case 'V':
+            match params:
+                case ():
+                    board.clear_viewport()
+                case (dx, dy):
+                    board.scroll_viewport(dx, dy)
+                case _:
+                    board.set_viewport(*params)
+
+        case 'Y':
+            match params:
+                case (name,):
+                    board.select_layer(name)
+                case (name, 'show' | 'hide'):
+                    board.set_layer_visible(name, params[1] == 'show')
+                case (name, position):
+                    board.move_layer(name, position)
+
+
+def format_error(error: Exception) -> str:
+    if isinstance(error, CommandError):
+        return f"Command error: {str(error)}"
+    if isinstance(error, DrawingError):
+        return f"Drawing error: {str(error)}"
+    return f"Unexpected error: {str(error)}"
+
+
+def check_journaled(journal: Journal, cmd: str):
+    """Refuse layer commands in a journaled session: journal snapshots hold a single canvas."""
+    if journal is not None and cmd == 'Y':
+        raise CommandError("Layers can not be journaled, restart without --journal")
+
+
+def journal_command(journal: Journal, board: DrawingBoard, cmd: str, params: tuple):
+    """Journal an executed command; undo and redo are captured as a snapshot."""
+    if journal is None:
+        return
+    if cmd in ('U', 'Z'):
+        journal.checkpoint(board)
+    else:
+        journal.record(board, cmd, params)
+
+
+def show(board: DrawingBoard, diff: bool = False):
+    if diff:
+        print(board.render_diff(), end='')
+    else:
+        print(board)
+
+
+def parse_lines(lines, board: DrawingBoard = None):
+    """Yield ``(line_number, cmd, params, error)`` for the commands among lines.
+
+    Blank lines and comments are skipped. A line that fails to parse yields
+    its error with ``cmd`` and ``params`` None. Parsing is timed on the
+    board's statistics when a board is given.
+    """
+    for line_number, line in enumerate(lines, 1):
+        command = line.strip()
+        if not command or command.startswith('#'):
+            continue
+        try:
+            cmd, params = parse_command(command) if board is None else parse_measured(board, command)
+        except Exception as e:
+            yield line_number, None, None, e
+            continue
+        yield line_number, cmd, params, None
+
+
+def run_commands(commands, board: DrawingBoard, out=sys.stdout, err=sys.stderr, render_every: int = 0,
+                 journal: Journal = None, executor: ParallelExecutor = None, label: str = 'line',
+                 stream: bool = False) -> int:
+    """Execute parsed commands, given as ``(number, cmd, params, error)``, without intermediate renders.
+
+    The board is rendered to ``out`` on ``P`` commands, after every
+    ``render_every`` drawing commands when it is positive, and once at the end
+    unless nothing changed since the last render. Errors are reported to
+    ``err`` as ``{label} {number}: ...`` and do not stop the batch. With an
+    ``executor``, line, rectangle and fill commands go through it and it is
+    flushed before anything else runs. With ``stream``, frames are written
+    row by row (see ``DrawingBoard.write_frame``) instead of being rendered
+    in memory.
+
+    Returns the number of commands that failed.
+    """
+    errors = 0
+    executed = 0
+    changed = False
+
+    def render():
+        nonlocal changed
+        if executor is not None:
+            executor.flush()
+        if stream:
+            board.write_frame(out)
+        else:
+            out.write(str(board) + '\n')
+        changed = False
+
+    for number, cmd, params, error in commands:
+        try:
+            if error is not None:
+                raise error
+            if cmd == 'Q':
+                break
+            if cmd == 'P':
+                render()
+                continue
+            if cmd == 'S':
+                out.write(report_stats(board, params) + '\n')
+                continue
+            if cmd in ('E', 'H'):
+                if executor is not None:
+                    executor.flush()
+                if cmd == 'E':
+                    board.export(*params)
+                else:
+                    out.write(report_content(board, params) + '\n')
+                continue
+
+            check_journaled(journal, cmd)
+            if executor is None:
+                execute(board, cmd, params)
+            elif cmd in ('L', 'R', 'B'):
+                executor.submit(board, cmd, params)
+            else:
+                executor.flush()
+                execute(board, cmd, params)
+            journal_command(journal, board, cmd, params)
+            executed += 1
+            changed = True
+            if render_every and executed % render_every == 0:
+                render()
+        except Exception as e:
+            errors += 1
+            err.write(f"{label} {number}: {format_error(e)}\n")
+
+    if changed:
+        render()
+    return errors
+
+
+def run_batch(lines, board: DrawingBoard, out=sys.stdout, err=sys.stderr, render_every: int = 0,
+              journal: Journal = None, executor: ParallelExecutor = None, stream: bool = False) -> int:
+    """Execute commands from an iterable of lines as ``run_commands`` does.
+
+    Errors are reported with their line number. Returns the number of lines
+    that failed.
+    """
+    return run_commands(parse_lines(lines, board), board, out, err, render_every, journal, executor, stream=stream)
+
+
+def run_binary(data, board: DrawingBoard, out=sys.stdout, err=sys.stderr, render_every: int = 0,
+               journal: Journal = None, executor: ParallelExecutor = None, stream: bool = False) -> int:
+    """Execute the commands of a binary command file (see ``src.protocol``) as ``run_commands`` does.
+
+    Errors are reported as ``command N: ...``, counting commands from 1, with
+    the messages of the text commands. Returns the number of commands that
+    failed.
+    """
+    commands = ((number, *command) for number, command in enumerate(decode_commands(data), 1))
+    return run_commands(commands, board, out, err, render_every, journal, executor, label='command', stream=stream)
+
+
+def encode_script(lines, err=sys.stderr) -> tuple:
+    """Convert text commands to a binary command file.
+
+    Lines that fail to parse or can not be encoded are reported to ``err``
+    with their line number and left out. Returns the file contents and the
+    number of lines left out.
+    """
+    records = [encode_header()]
+    errors = 0
+    for line_number, cmd, params, error in parse_lines(lines):
+        try:
+            if error is not None:
+                raise error
+            records.append(encode_command(cmd, params))
+        except Exception as e:
+            errors += 1
+            err.write(f"line {line_number}: {format_error(e)}\n")
+    return b''.join(records), errors
+
+
+# Marks the end of the items passed between pipeline stages
+_DONE = object()
+
+
+def run_pipeline(lines, board: DrawingBoard, out=sys.stdout, err=sys.stderr, render_every: int = 0,
+                 journal: Journal = None, diff: bool = False, queue_size: int = 16,
+                 line_numbers: bool = True) -> int:
+    """run_batch as three stages, each in its own thread, connected by bounded queues.
+
+    A reader stage reads and parses the lines, the calling thread executes
+    the commands on the board, and a render stage writes the frames and
+    messages. Renders are handed over as board snapshots (see
+    ``DrawingBoard.snapshot``), so drawing goes on while a frame is written.
+    When the render stage falls behind, it writes only the latest of the
+    pending frames; messages are still written in command order. Errors are
+    reported to ``err`` as in run_batch, or without line numbers when
+    ``line_numbers`` is false. Statistics do not time parsing, which runs in
+    the reader stage.
+
+    Returns the number of lines that failed.
+    """
+    commands = queue.Queue(queue_size)
+    outputs = queue.Queue(queue_size)
+    failures = []
+
+    def read():
+        try:
+            for command in parse_lines(lines):
+                commands.put(command)
+                if command[1] == 'Q':
+                    break
+        except Exception as e:
+            failures.append(e)
+        finally:
+            commands.put(_DONE)
+
+    def write():
+        renderer = SnapshotRenderer(diff)
+        while True:
+            items = [outputs.get()]
+            while items[-1] is not _DONE:
+                try:
+                    items.append(outputs.get_nowait())
+                except queue.Empty:
+                    break
+            last_frame = max((index for index, item in enumerate(items) if isinstance(item, Snapshot)), default=None)
+            for index, item in enumerate(items):
+                if item is _DONE:
+                    return
+                if failures:
+                    continue
+                try:
+                    if not isinstance(item, Snapshot):
+                        stream, text = item
+                        stream.write(text)
+                    elif index == last_frame:
+                        out.write(renderer.render(item))
+                    else:
+                        renderer.skip(item)
+                except Exception as e:
+                    # Keep draining so the other stages never block on a full queue
+                    failures.append(e)
+
+    stages = [threading.Thread(target=read, daemon=True), threading.Thread(target=write, daemon=True)]
+    for stage in stages:
+        stage.start()
+
+    errors = 0
+    executed = 0
+    changed = False
+    while (item := commands.get()) is not _DONE:
+        line_number, cmd, params, error = item
+        if error is None:
+            try:
+                if cmd == 'Q':
+                    continue
+                if cmd == 'P':
+                    outputs.put(board.snapshot())
+                    changed = False
+                    continue
+                if cmd == 'S':
+                    outputs.put((out, report_stats(board, params) + '\n'))
+                    continue
+                if cmd == 'E':
+                    board.export(*params)
+                    continue
+                if cmd == 'H':
+                    outputs.put((out, report_content(board, params) + '\n'))
+                    continue
+                check_journaled(journal, cmd)
+                execute(board, cmd, params)
+                journal_command(journal, board, cmd, params)
+                executed += 1
+                changed = True
+                if render_every and executed % render_every == 0:
+                    outputs.put(board.snapshot())
+                    changed = False
+            except Exception as e:
+                error = e
+        if error is not None:
+            errors += 1
+            prefix = f"line {line_number}: " if line_numbers else ''
+            outputs.put((err, prefix + format_error(error) + '\n'))
+
+    if changed:
+        outputs.put(board.snapshot())
+    outputs.put(_DONE)
+    for stage in stages:
+        stage.join()
+    if failures:
+        raise failures[0]
+    return errors
+
+
+def prompted_lines(prompt: str = "enter command: "):
+    """Yield lines typed at the prompt until end of input."""
+    while True:
+        try:
+            yield input(prompt)
+        except EOFError:
+            return
+
+
+def main(diff: bool = False, storage: str = 'list', journal: Journal = None, canvas: Canvas = None,
+         fill_engine: str = 'span', stats: Stats = None, pipeline: bool = False):
+    board = DrawingBoard(canvas, fill_engine=fill_engine, storage=storage, history=History(), stats=stats)
     print("\nDrawing Program")
     print("Commands:")
     print("  C x y             # Create canvas")
     print("  L x1 y1 x2 y2 c   # Draw line")
     print("  R x1 y1 x2 y2 c   # Draw rectangle")
-    print("  B x y c           # Bucket fill")
+    print("  B x y c [view]    # Bucket fill (the visible layers with view)")
+    print("  U [n]             # Undo last n commands")
+    print("  Z [n]             # Redo n undone commands")
+    print("  V x y w h         # Show only a w x h window from (x,y)")
+    print("  V dx dy           # Scroll the window")
+    print("  V                 # Show the whole canvas again")
+    print("  Y name            # Draw on layer name, adding it on top if new")
+    print("  Y name show|hide  # Show or hide layer name")
+    print("  Y name n          # Move layer name to position n (1 is the bottom)")
+    print("  P                 # Print canvas")
+    print("  S [file]          # Show statistics, or save them as JSON")
+    print("  E file            # Export the canvas as .txt, .pgm, .ppm or .gz")
+    print("  H [c]             # Show the canvas hash and character counts, or the count of c")
     print("  Q                 # Quit\n")
 
+    if journal is not None:
+        print(f"Restored {journal.restore(board, execute)} journaled commands")
+        if board.canvas:
+            show(board, diff)
+
+    if pipeline:
+        # A prompt from the reader stage would land among the frames of earlier commands
+        print("Enter commands, one per line")
+        run_pipeline(prompted_lines(''), board, sys.stdout, sys.stdout, render_every=1, journal=journal, diff=diff,
+                     line_numbers=False)
+        print("Quitting...")
+        if journal is not None:
+            journal.close()
+        return
+
     while True:
         try:
             command = input("enter command: ").strip()
             if not command:
                 continue
 
-            parts = command.split()
-            cmd, params = parts[0].upper(), parts[1:]
-
-            validated_params = validate_params(cmd, params)
+            cmd, validated_params = parse_measured(board, command)
 
             match cmd:
                 case 'Q':
                     print("Quitting...")
+                    if journal is not None:
+                        journal.close()
                     break
 
-                case 'C':
-                    board.new_canvas(*validated_params)
-                    print(board)
+                case 'P':
+                    show(board, diff)
 
-                case 'L':
-                    board.draw_line(*validated_params)
-                    print(board)
+                case 'S':
+                    print(report_stats(board, validated_params))
 
-                case 'R':
-                    board.draw_rectangle(*validated_params)
-                    print(board)
+                case 'E':
+                    board.export(*validated_params)
 
-                case 'B':
-                    board.bucket_fill(*validated_params)
-                    print(board)
+                case 'H':
+                    print(report_content(board, validated_params))
+
+                case _:
+                    check_journaled(journal, cmd)
+                    execute(board, cmd, validated_params)
+                    journal_command(journal, board, cmd, validated_params)
+                    show(board, diff)
 
-        except CommandError as e:
-            print(f"Command error: {str(e)}")
-        except DrawingError as e:
-            print(f"Drawing error: {str(e)}")
         except Exception as e:
-            print(f"Unexpected error: {str(e)}")
+            print(format_error(e))
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Terminal drawing program")
+    parser.add_argument('--diff', action='store_true',
+                        help="redraw only changed rows using ANSI cursor positioning")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="run commands from FILE ('-' for stdin) without prompting")
+    parser.add_argument('--render-every', type=int, default=0, metavar='N',
+                        help="in batch mode, also render after every N drawing commands")
+    parser.add_argument('--storage', choices=sorted(STORAGE_BACKENDS), default='list',
+                        help="canvas pixel storage backend")
+    parser.add_argument('--fill-engine', choices=sorted(FILL_ENGINES), default='span',
+                        help="bucket fill algorithm; 'indexed' keeps a region index for repeated fills")
+    parser.add_argument('--history', action='store_true',
+                        help="in batch mode, keep undo history so U and Z commands work")
+    parser.add_argument('--journal', metavar='DIR',
+                        help="journal commands to DIR and restore the session from it on startup")
+    parser.add_argument('--journal-sync', choices=SYNC_POLICIES, default='interval',
+                        help="when journaled commands are fsync'd")
+    parser.add_argument('--snapshot-every', type=int, default=1000, metavar='N',
+                        help="snapshot the canvas every N journaled commands")
+    parser.add_argument('--deferred', action='store_true',
+                        help="in batch mode, queue lines and rectangles and draw them optimized before renders and fills")
+    parser.add_argument('--workers', type=int, default=0, metavar='N',
+                        help="in batch mode, draw lines and rectangles with N processes over canvas bands")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="parse, draw and render in separate threads, skipping frames that can not be written in time")
+    parser.add_argument('--stream', action='store_true',
+                        help="in batch mode, write frames row by row instead of rendering them in memory")
+    parser.add_argument('--binary', action='store_true',
+                        help="the batch FILE is a binary command file (see --encode)")
+    parser.add_argument('--encode', metavar='OUT',
+                        help="convert the text commands of the batch FILE to the binary command file OUT and exit")
+    parser.add_argument('--open', metavar='FILE',
+                        help="start on the canvas file FILE, drawing on it in place through mmap")
+    parser.add_argument('--stats', action='store_true',
+                        help="collect per-command statistics, shown with the S command")
+    parser.add_argument('--stats-json', metavar='FILE',
+                        help="with --stats, write the statistics to FILE as JSON on exit")
+    parser.add_argument('--profile-every', type=int, default=0, metavar='N',
+                        help="with --stats, run every Nth command under cProfile")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="with --profile-every, also record the peak memory of profiled commands")
+    args = parser.parse_args()
+    if args.workers and (args.batch is None or args.history or args.journal):
+        parser.error("--workers only works in batch mode without --history and --journal")
+    if args.deferred and (args.batch is None or args.history):
+        parser.error("--deferred only works in batch mode without --history")
+    if args.pipeline and args.workers:
+        parser.error("--pipeline can not be combined with --workers")
+    if (args.binary or args.encode) and args.batch is None:
+        parser.error("--binary and --encode need a batch FILE")
+    if args.stream and (args.batch is None or args.pipeline):
+        parser.error("--stream only works in batch mode without --pipeline")
+    if args.binary and (args.pipeline or args.encode):
+        parser.error("--binary can not be combined with --pipeline or --encode")
+
+    if args.encode:
+        with sys.stdin if args.batch == '-' else open(args.batch) as script:
+            data, failed = encode_script(script)
+        with open(args.encode, 'wb') as binary:
+            binary.write(data)
+        sys.exit(1 if failed else 0)
+
+    stats = Stats(args.profile_every, args.trace_memory) if args.stats else None
+    try:
+        canvas_file = CanvasFile(args.open) if args.open else None
+    except CanvasError as e:
+        parser.error(str(e))
+    canvas = canvas_file.canvas if canvas_file else None
+    journal = None
+    if args.journal:
+        journal = Journal(args.journal, sync=args.journal_sync, snapshot_every=args.snapshot_every)
+
+    if args.batch is None:
+        main(diff=args.diff, storage=args.storage, journal=journal, canvas=canvas, fill_engine=args.fill_engine,
+             stats=stats, pipeline=args.pipeline)
+        if canvas_file is not None:
+            canvas_file.close()
+        if stats is not None and args.stats_json:
+            stats.dump(args.stats_json)
+    else:
+        board = DrawingBoard(canvas, fill_engine=args.fill_engine, storage=args.storage,
+                             history=History() if args.history else None, stats=stats, deferred=args.deferred)
+        if journal is not None:
+            journal.restore(board, execute)
+        executor = ParallelExecutor(args.workers) if args.workers else None
+        if args.binary:
+            with sys.stdin.buffer if args.batch == '-' else open(args.batch, 'rb') as binary:
+                data = binary.read()
+            try:
+                failed = run_binary(data, board, render_every=args.render_every, journal=journal, executor=executor,
+                                    stream=args.stream)
+            except CommandError as e:
+                # Not a binary command file at all
+                print(format_error(e), file=sys.stderr)
+                failed = 1
+        else:
+            with sys.stdin if args.batch == '-' else open(args.batch) as script:
+                if args.pipeline:
+                    failed = run_pipeline(script, board, render_every=args.render_every, journal=journal)
+                else:
+                    failed = run_batch(script, board, render_every=args.render_every, journal=journal,
+                                       executor=executor, stream=args.stream)
+        if executor is not None:
+            executor.close()
+        if journal is not None:
+            journal.close()
+        if canvas_file is not None:
+            canvas_file.close()
+        if stats is not None and args.stats_json:
+            stats.dump(args.stats_json)
+        sys.exit(1 if failed else 0)
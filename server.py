@@ -0,0 +1,206 @@
+"""Drawing server hosting one independent DrawingBoard per connection.
+
+Clients send the command lines understood by ``runner.py`` (``C``, ``L``,
+``R``, ``B``, ``U``, ``Z``, ``P``, ``S``, ``H``, ``Q``) over TCP or a Unix
+socket. Each command is answered by an optional body followed by a status
+line, ``OK`` or ``ERR <message>``. The body depends on the session's
+response mode:
+
+* ``full`` - the framed canvas after every drawing command.
+* ``diff`` - ANSI output redrawing only the rows that changed.
+* ``ack`` - nothing; the canvas is only sent for ``P``.
+
+``H`` answers with the canvas hash and character counts in every mode, and
+``S`` with the session's statistics summary when the server keeps
+statistics. ``S file`` and ``E file`` are refused: clients do not choose
+files on the server.
+
+``M full|diff|ack`` switches the mode of the current session. Commands on
+canvases of at least ``offload_pixels`` pixels, and ``C`` commands creating
+one, run in a thread pool, so one client's large bucket fill does not stall
+the other sessions. A line longer than the stream limit is skipped and
+answered with ``ERR``.
+"""
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+
+from runner import execute, format_error, parse_command, report_content, report_stats
+from src.drawing_board import DrawingBoard
+from src.exceptions import CommandError
+from src.fill import FILL_ENGINES
+from src.history import History
+from src.stats import Stats
+from src.storage import STORAGE_BACKENDS
+
+RESPONSE_MODES = ('full', 'diff', 'ack')
+LINE_TOO_LONG = b'ERR Command error: line too long\n'
+
+
+class Session:
+    """The board and response mode of one connection."""
+
+    def __init__(self, board: DrawingBoard, mode: str):
+        self.board = board
+        self.mode = mode
+
+
+class DrawingServer:
+
+    def __init__(self, mode: str = 'full', storage: str = 'list', fill_engine: str = 'span',
+                 history: bool = False, offload_pixels: int = 250_000, workers: int = None,
+                 stats: bool = False):
+        if mode not in RESPONSE_MODES:
+            raise ValueError(f"Unknown response mode: {mode}, expected one of {RESPONSE_MODES}")
+        self.mode = mode
+        self.storage = storage
+        self.fill_engine = fill_engine
+        self.history = history
+        self.offload_pixels = offload_pixels
+        self.stats = stats
+        self.executor = ThreadPoolExecutor(workers)
+        self.sessions = set()
+
+    async def start_tcp(self, host: str = '127.0.0.1', port: int = 0) -> asyncio.Server:
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def start_unix(self, path: str) -> asyncio.Server:
+        return await asyncio.start_unix_server(self.handle, path)
+
+    def close(self):
+        self.executor.shutdown()
+
+    def new_session(self) -> Session:
+        board = DrawingBoard(fill_engine=self.fill_engine, storage=self.storage,
+                             history=History() if self.history else None, stats=Stats() if self.stats else None)
+        return Session(board, self.mode)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        session = self.new_session()
+        self.sessions.add(session)
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b'\n')
+                except asyncio.IncompleteReadError as e:
+                    # The last line may end without a newline
+                    if not (line := e.partial):
+                        break
+                except asyncio.LimitOverrunError as e:
+                    await _skip_line(reader, e.consumed)
+                    writer.write(LINE_TOO_LONG)
+                    await writer.drain()
+                    continue
+                command = line.decode('utf-8', errors='replace').strip()
+                if not command:
+                    continue
+                response, done = await self.respond(session, command)
+                writer.write(response.encode('utf-8'))
+                await writer.drain()
+                if done:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+            self.sessions.discard(session)
+
+    async def respond(self, session: Session, command: str) -> tuple:
+        """Return the response to one command line and whether the session ends."""
+        try:
+            parts = command.split()
+            if parts[0].upper() == 'M':
+                if len(parts) != 2 or parts[1] not in RESPONSE_MODES:
+                    return f"ERR Command error: M takes one of {', '.join(RESPONSE_MODES)}\n", False
+                session.mode = parts[1]
+                return 'OK\n', False
+
+            cmd, params = parse_command(command)
+            if cmd == 'Q':
+                return 'OK\n', True
+            if self._pixels(session, cmd, params) >= self.offload_pixels:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self.executor, self._run, session, cmd, params), False
+            return self._run(session, cmd, params), False
+        except Exception as e:
+            return f"ERR {format_error(e)}\n", False
+
+    @staticmethod
+    def _pixels(session: Session, cmd: str, params: tuple) -> int:
+        """The size of the canvas the command will run on."""
+        if cmd == 'C':
+            return params[0] * params[1]
+        canvas = session.board.canvas
+        return 0 if canvas is None else canvas.width * canvas.height
+
+    @staticmethod
+    def _run(session: Session, cmd: str, params: tuple) -> str:
+        board = session.board
+        if cmd == 'P':
+            return str(board) + '\nOK\n'
+        if cmd == 'S':
+            if params:
+                raise CommandError("S file is not available on the server, use S")
+            return report_stats(board, params) + '\nOK\n'
+        if cmd == 'H':
+            return report_content(board, params) + '\nOK\n'
+        if cmd == 'E':
+            raise CommandError("E is not available on the server")
+        execute(board, cmd, params)
+        if session.mode == 'ack':
+            return 'OK\n'
+        if session.mode == 'diff':
+            # The status line must start on a line of its own
+            return board.render_diff().rstrip('\n') + '\nOK\n'
+        return str(board) + '\nOK\n'
+
+
+async def _skip_line(reader: asyncio.StreamReader, consumed: int):
+    """Discard the rest of a line found longer than the reader's limit after consumed bytes."""
+    while True:
+        await reader.readexactly(consumed)
+        try:
+            await reader.readuntil(b'\n')
+            return
+        except asyncio.LimitOverrunError as e:
+            consumed = e.consumed
+        except asyncio.IncompleteReadError:
+            return
+
+
+async def serve(server: DrawingServer, host: str, port: int, unix: str = None):
+    listener = await (server.start_unix(unix) if unix else server.start_tcp(host, port))
+    for sock in listener.sockets:
+        print(f"Serving drawing boards on {sock.getsockname()}")
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-session drawing server")
+    parser.add_argument('--host', default='127.0.0.1', help="TCP address to listen on")
+    parser.add_argument('--port', type=int, default=7878, help="TCP port to listen on")
+    parser.add_argument('--unix', metavar='PATH', help="listen on a Unix socket instead of TCP")
+    parser.add_argument('--mode', choices=RESPONSE_MODES, default='full',
+                        help="default response mode of new sessions")
+    parser.add_argument('--storage', choices=sorted(STORAGE_BACKENDS), default='list',
+                        help="canvas pixel storage backend")
+    parser.add_argument('--fill-engine', choices=sorted(FILL_ENGINES), default='span',
+                        help="bucket fill algorithm")
+    parser.add_argument('--history', action='store_true', help="keep undo history so U and Z commands work")
+    parser.add_argument('--offload-pixels', type=int, default=250_000, metavar='N',
+                        help="run commands on canvases of at least N pixels in a worker thread")
+    parser.add_argument('--stats', action='store_true', help="keep per-session statistics for the S command")
+    args = parser.parse_args()
+
+    drawing_server = DrawingServer(args.mode, args.storage, args.fill_engine, args.history, args.offload_pixels,
+                                   stats=args.stats)
+    try:
+        asyncio.run(serve(drawing_server, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        drawing_server.close()
@@ -1,4 +1,7 @@
+from src.content import ContentIndex
 from src.exceptions import OutOfCanvasError
+from src.regions import RegionIndex
+from src.storage import STORAGE_BACKENDS
 from src.validators import validate_dimensions
 
 
@@ -7,13 +10,83 @@ class Canvas:
 
     The canvas uses 1-based indexing for x and y coordinates.
     Origin (1,1) is at the top-left corner of the canvas.
+
+    Pixels are held by a storage backend chosen at construction time:
+    ``'list'`` (a list of characters per row), ``'bytes'`` (one byte per pixel,
+    Latin-1 characters only), ``'wide'`` (one code point per pixel),
+    ``'tiled'`` (lazily allocated tiles, for huge mostly blank canvases),
+    ``'rle'`` (run lists per row, for very wide canvases of long runs) or
+    ``'numpy'`` (a NumPy array, or ``'wide'`` when NumPy is not installed). A
+    ready storage instance of the right size can be passed instead of a name.
+
+    Writes are tracked as dirty rows plus a dirty bounding rectangle until
+    ``take_dirty`` is called, so renderers only redo what changed. Code that
+    writes through ``pixels`` directly must report it with ``mark_dirty``.
+
+    Objects in ``observers`` are told about every write before it happens
+    through ``before_write(left, top, right, bottom, char)``, with 0-based
+    coordinates and exclusive right and bottom bounds.
+
+    ``regions`` is an index of the connected same-character regions, and
+    ``content`` a character histogram and hash tree of the rows (see
+    ``src.content``); both are created on first access and kept up to date
+    from then on.
+
+    ``fork`` returns an independent canvas with the same pixels, sharing the
+    storage with this one until either canvas writes to it.
     """
 
-    def __init__(self, width: int, height: int):
+    def __init__(self, width: int, height: int, storage='list'):
         validate_dimensions(width, height)
+        if isinstance(storage, str):
+            if storage not in STORAGE_BACKENDS:
+                raise ValueError(f"Unknown storage backend: {storage}, expected one of {sorted(STORAGE_BACKENDS)}")
+            storage = STORAGE_BACKENDS[storage](width, height)
         self.width = width
         self.height = height
-        self.pixels = [[' ' for _ in range(self.width)] for _ in range(self.height)]
+        self.storage = storage
+        self.dirty_rows = set()
+        self.dirty_rect = None
+        self.observers = []
+        self._regions = None
+        self._content = None
+
+    @property
+    def regions(self) -> RegionIndex:
+        if self._regions is None:
+            self._regions = RegionIndex(self)
+            self.observers.append(self._regions)
+        return self._regions
+
+    @property
+    def content(self) -> ContentIndex:
+        if self._content is None:
+            self._content = ContentIndex(self)
+            self.observers.append(self._content)
+        return self._content
+
+    def fork(self) -> 'Canvas':
+        """A canvas with the same pixels and no observers, copied lazily on write.
+
+        The content index, if any, is copied along.
+        """
+        fork = Canvas(self.width, self.height, self.storage.fork())
+        if self._content is not None:
+            fork._content = self._content.fork(fork)
+            fork.observers.append(fork._content)
+        return fork
+
+    @property
+    def pixels(self):
+        """Row-major rows of one-character strings, indexed from 0."""
+        return self.storage.pixels
+
+    def iter_rows(self):
+        if hasattr(self.storage, 'iter_rows'):
+            yield from self.storage.iter_rows()
+            return
+        for y in range(self.height):
+            yield self.storage.row_text(y)
 
     def is_inside(self, x: int, y: int) -> bool:
         return 0 < x <= self.width and 0 < y <= self.height
@@ -25,8 +98,80 @@ class Canvas:
 
     def draw_pixel(self, x: int, y: int, char: str):
         self.valid_point(x, y)
-        self.pixels[y - 1][x - 1] = char
+        self._write_span(y - 1, x - 1, x, char)
 
     def get_pixel(self, x: int, y: int) -> str:
         self.valid_point(x, y)
-        return self.pixels[y - 1][x - 1]
+        return self.storage.get(x - 1, y - 1)
+
+    def row_slice(self, y: int, x1: int, x2: int) -> str:
+        """The pixels of row y from x1 to x2 (inclusive) as a string."""
+        self.valid_point(x1, y)
+        self.valid_point(x2, y)
+        return self.storage.row_text(y - 1, x1 - 1, x2)
+
+    def fill_horizontal(self, x1: int, x2: int, y: int, char: str):
+        """Draw the horizontal span between x1 and x2 (inclusive) on row y."""
+        self.valid_point(x1, y)
+        self.valid_point(x2, y)
+        self._write_span(y - 1, min(x1, x2) - 1, max(x1, x2), char)
+
+    def fill_vertical(self, x: int, y1: int, y2: int, char: str):
+        """Draw the vertical span between y1 and y2 (inclusive) on column x."""
+        self.valid_point(x, y1)
+        self.valid_point(x, y2)
+        self._write_column(x - 1, min(y1, y2) - 1, max(y1, y2), char)
+
+    def fill_rect(self, x1: int, y1: int, x2: int, y2: int, char: str):
+        """Fill the whole rectangular region with corners (x1,y1) and (x2,y2)."""
+        self.valid_point(x1, y1)
+        self.valid_point(x2, y2)
+        self._write_rect(min(x1, x2) - 1, min(y1, y2) - 1, max(x1, x2), max(y1, y2), char)
+
+    def _write_span(self, y: int, start: int, stop: int, char: str):
+        """Write row y from start to stop (exclusive), 0-based and unchecked."""
+        for observer in self.observers:
+            observer.before_write(start, y, stop, y + 1, char)
+        self.storage.fill_span(y, start, stop, char)
+        self.dirty_rows.add(y)
+        self._extend_dirty_rect(start, y, stop - 1, y)
+
+    def _write_column(self, x: int, start: int, stop: int, char: str):
+        """Write column x from start to stop (exclusive), 0-based and unchecked."""
+        for observer in self.observers:
+            observer.before_write(x, start, x + 1, stop, char)
+        self.storage.fill_column(x, start, stop, char)
+        self.dirty_rows.update(range(start, stop))
+        self._extend_dirty_rect(x, start, x, stop - 1)
+
+    def _write_rect(self, left: int, top: int, right: int, bottom: int, char: str):
+        """Write a rectangle with exclusive right and bottom bounds, 0-based and unchecked."""
+        for observer in self.observers:
+            observer.before_write(left, top, right, bottom, char)
+        self.storage.fill_rect(left, top, right, bottom, char)
+        self.dirty_rows.update(range(top, bottom))
+        self._extend_dirty_rect(left, top, right - 1, bottom - 1)
+
+    def mark_dirty(self, x1: int, y1: int, x2: int, y2: int):
+        """Report pixels in the rectangle (x1,y1)-(x2,y2) as changed."""
+        self.valid_point(x1, y1)
+        self.valid_point(x2, y2)
+        self.dirty_rows.update(range(min(y1, y2) - 1, max(y1, y2)))
+        self._extend_dirty_rect(min(x1, x2) - 1, min(y1, y2) - 1, max(x1, x2) - 1, max(y1, y2) - 1)
+        for index in (self._regions, self._content):
+            if index is not None:
+                index.invalidate(min(x1, x2) - 1, min(y1, y2) - 1, max(x1, x2), max(y1, y2))
+
+    def take_dirty(self) -> tuple:
+        """Return and reset the 0-based dirty rows and inclusive dirty rectangle."""
+        dirty = self.dirty_rows, self.dirty_rect
+        self.dirty_rows = set()
+        self.dirty_rect = None
+        return dirty
+
+    def _extend_dirty_rect(self, left: int, top: int, right: int, bottom: int):
+        if self.dirty_rect is not None:
+            old_left, old_top, old_right, old_bottom = self.dirty_rect
+            left, top = min(left, old_left), min(top, old_top)
+            right, bottom = max(right, old_right), max(bottom, old_bottom)
+        self.dirty_rect = left, top, right, bottom
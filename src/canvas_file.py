@@ -0,0 +1,118 @@
+"""Canvas files that are drawn on in place through mmap.
+
+A canvas file is a 32-byte header followed by the raw pixels, row-major:
+
+    magic b'DRWC' | version u16 | cell size u16 | width u32 | height u32 | 16 reserved bytes
+
+with all integers little-endian. Cells are one Latin-1 byte (cell size 1) or
+one UTF-32-LE code point (cell size 4). Opening a file maps it instead of
+reading it, so canvases larger than RAM can be drawn on; the OS pages rows
+in and out as they are touched.
+"""
+import mmap
+import struct
+import sys
+
+from src.canvas import Canvas
+from src.exceptions import CanvasError
+from src.storage import ByteStorage, WideStorage
+from src.validators import validate_dimensions
+
+MAGIC = b'DRWC'
+VERSION = 1
+HEADER = struct.Struct('<4sHHII16x')
+ENCODINGS = {'bytes': 1, 'wide': 4}
+_CHUNK_CELLS = 1 << 16
+
+
+def _storage_class(cell_size: int):
+    if cell_size == ENCODINGS['bytes']:
+        return ByteStorage
+    if cell_size == ENCODINGS['wide']:
+        if sys.byteorder != 'little':
+            raise CanvasError("Wide canvas files can only be mapped on little-endian hosts")
+        return WideStorage
+    raise CanvasError(f"Unsupported canvas file cell size: {cell_size}")
+
+
+def create_canvas_file(path: str, width: int, height: int, encoding: str = 'bytes'):
+    """Create a blank canvas file without holding the canvas in memory."""
+    validate_dimensions(width, height)
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown canvas file encoding: {encoding}, expected one of {sorted(ENCODINGS)}")
+    blank = ' '.encode(_storage_class(ENCODINGS[encoding]).encoding)
+    with open(path, 'wb') as canvas_file:
+        canvas_file.write(HEADER.pack(MAGIC, VERSION, ENCODINGS[encoding], width, height))
+        remaining = width * height
+        while remaining:
+            count = min(remaining, _CHUNK_CELLS)
+            canvas_file.write(blank * count)
+            remaining -= count
+
+
+def save_canvas(canvas: Canvas, path: str, encoding: str = 'bytes'):
+    """Write any canvas to a canvas file, one row at a time."""
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Unknown canvas file encoding: {encoding}, expected one of {sorted(ENCODINGS)}")
+    storage_class = _storage_class(ENCODINGS[encoding])
+    with open(path, 'wb') as canvas_file:
+        canvas_file.write(HEADER.pack(MAGIC, VERSION, ENCODINGS[encoding], canvas.width, canvas.height))
+        for row in canvas.iter_rows():
+            try:
+                canvas_file.write(row.encode(storage_class.encoding))
+            except UnicodeEncodeError:
+                raise CanvasError(f"The canvas can not be saved with {encoding} encoding")
+
+
+class CanvasFile:
+    """An open canvas file whose ``canvas`` reads and writes the mapped pixels.
+
+    Writes reach the file when the OS flushes the mapping, on ``flush`` or on
+    ``close``. Use it as a context manager to close it reliably.
+    """
+
+    def __init__(self, path: str, writable: bool = True):
+        self.path = path
+        self.file = open(path, 'r+b' if writable else 'rb')
+        self.mapping = None
+        try:
+            header = self.file.read(HEADER.size)
+            if len(header) != HEADER.size:
+                raise CanvasError(f"{path} is not a version {VERSION} canvas file")
+            magic, version, cell_size, width, height = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise CanvasError(f"{path} is not a version {VERSION} canvas file")
+            validate_dimensions(width, height)
+            storage_class = _storage_class(cell_size)
+            self.mapping = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+            if len(self.mapping) < HEADER.size + width * height * cell_size:
+                raise CanvasError(f"{path} is truncated")
+        except BaseException:
+            if self.mapping is not None:
+                self.mapping.close()
+            self.file.close()
+            raise
+
+        body = memoryview(self.mapping)[HEADER.size:HEADER.size + width * height * cell_size]
+        if storage_class is WideStorage:
+            body = body.cast('I')
+        self.canvas = Canvas(width, height, storage_class(width, height, buffer=body))
+
+    def flush(self):
+        self.mapping.flush()
+
+    def close(self):
+        if self.mapping.closed:
+            return
+        storage = self.canvas.storage
+        # Views into the map must be released before it can be closed
+        storage.view.release()
+        storage.buffer.release()
+        self.mapping.close()
+        self.file.close()
+
+    def __enter__(self) -> 'CanvasFile':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,236 @@
+"""A DrawingBoard shared by several writer threads.
+
+The canvas rows are split into bands of ``band_height`` rows (the tile
+height for tiled storage), each guarded by its own lock, so writers drawing
+on different bands never wait for each other:
+
+* Lines and rectangles lock the bands of the rows they cover, in ascending
+  order, which rules out deadlocks between them.
+* Bucket fills lock bands as the fill reaches them. A band below one already
+  held is only tried without blocking; if it is busy, the fill releases its
+  bands and takes them all again in ascending order before going on, so it
+  never waits out of order either. Pixels are checked again when the fill
+  resumes, so it fills what is still the target character.
+* Renders take every band lock just long enough to fork the canvas (see
+  ``Canvas.fork``) and then render the fork, while writers carry on.
+
+Concurrent boards keep no history, statistics, layers or deferred queue.
+"""
+import threading
+from bisect import insort
+from contextlib import contextmanager
+
+from src.drawing_board import DrawingBoard
+from src.exceptions import CanvasNotReadyError, LayerError
+from src.fill import FILL_ENGINES
+
+
+class BandLocks:
+    """A canvas and one lock per band of its rows."""
+
+    def __init__(self, canvas, band_height: int):
+        self.canvas = canvas
+        self.band_height = band_height
+        self.locks = [threading.Lock() for _ in range(-(-canvas.height // band_height))]
+
+    @contextmanager
+    def hold(self, top: int, bottom: int):
+        """Hold the bands of the 0-based rows top to bottom (exclusive)."""
+        bands = range(top // self.band_height, (bottom - 1) // self.band_height + 1)
+        for band in bands:
+            self.locks[band].acquire()
+        try:
+            yield
+        finally:
+            for band in reversed(bands):
+                self.locks[band].release()
+
+    def hold_all(self):
+        return self.hold(0, self.canvas.height)
+
+    def snapshot(self, take_dirty: bool = False):
+        """A fork of the canvas taken while no band is being written.
+
+        With take_dirty, the rows reported dirty by the canvas move to the fork.
+        """
+        with self.hold_all():
+            snapshot = self.canvas.fork()
+            if hasattr(snapshot.storage, 'owners'):
+                # Whichever side writes a shared buffer first copies it, which
+                # concurrent writers can not do safely: copy it now instead
+                snapshot.storage._own()
+            if take_dirty:
+                snapshot.dirty_rows, snapshot.dirty_rect = self.canvas.take_dirty()
+        return snapshot
+
+
+class _HeldBands:
+    """The bands held by one growing operation, always acquired in ascending order."""
+
+    def __init__(self, bands: BandLocks):
+        self.bands = bands
+        self.held = []
+
+    def need(self, y: int):
+        band = y // self.bands.band_height
+        if band in self.held:
+            return
+        lock = self.bands.locks[band]
+        if not self.held or band > self.held[-1]:
+            lock.acquire()
+            self.held.append(band)
+        elif lock.acquire(blocking=False):
+            insort(self.held, band)
+        else:
+            needed = sorted(self.held + [band])
+            self.release()
+            for index in needed:
+                self.bands.locks[index].acquire()
+            self.held = needed
+
+    def release(self):
+        for band in reversed(self.held):
+            self.bands.locks[band].release()
+        self.held = []
+
+
+def band_fill(bands: BandLocks, x: int, y: int, c: str):
+    """Scanline fill from the 1-based (x, y) holding the bands of the rows it reads."""
+    canvas = bands.canvas
+    storage = canvas.storage
+    width, height = canvas.width, canvas.height
+    held = _HeldBands(bands)
+    try:
+        held.need(y - 1)
+        target_char = storage.get(x - 1, y - 1)
+        if target_char == c:
+            return
+        target = storage.encode(target_char)
+        storage.encode(c)
+
+        stack = [(x - 1, y - 1)]
+        while stack:
+            seed_x, seed_y = stack.pop()
+            held.need(seed_y)
+            row = storage.cells(seed_y)
+            if row[seed_x] != target:
+                continue
+
+            left = seed_x
+            while left > 0 and row[left - 1] == target:
+                left -= 1
+            right = seed_x + 1
+            while right < width and row[right] == target:
+                right += 1
+            canvas._write_span(seed_y, left, right, c)
+
+            for ny in (seed_y - 1, seed_y + 1):
+                if not 0 <= ny < height:
+                    continue
+                held.need(ny)
+                neighbour = storage.cells(ny)
+                nx = left
+                while nx < right:
+                    if neighbour[nx] == target:
+                        stack.append((nx, ny))
+                        nx += 1
+                        while nx < right and neighbour[nx] == target:
+                            nx += 1
+                    nx += 1
+    finally:
+        held.release()
+
+
+class ConcurrentBoard(DrawingBoard):
+    """A DrawingBoard whose drawing commands and renders may run in several threads at once.
+
+    Each canvas comes with its ``bands`` of row locks. Replacing the canvas
+    swaps both at once, so commands running meanwhile finish on the previous
+    canvas.
+    """
+
+    def __init__(self, canvas=None, storage: str = 'list', band_height: int = 64):
+        self.band_height = band_height
+        self.bands = None
+        self.render_lock = threading.Lock()
+        # The canvas of the last render and the snapshot it was rendered from
+        self._rendered = None, None
+        super().__init__(canvas, storage=storage)
+
+    @property
+    def canvas(self):
+        bands = self.bands
+        return None if bands is None else bands.canvas
+
+    @canvas.setter
+    def canvas(self, canvas):
+        if canvas is None:
+            self.bands = None
+            return
+        band_height = getattr(canvas.storage, 'tile_size', self.band_height)
+        self.bands = BandLocks(canvas, band_height)
+
+    def _current_bands(self) -> BandLocks:
+        bands = self.bands
+        if bands is None:
+            raise CanvasNotReadyError('Canvas not ready, please initiate a new canvas')
+        return bands
+
+    def __str__(self):
+        with self.render_lock:
+            return super().__str__()
+
+    def render_diff(self) -> str:
+        with self.render_lock:
+            return super().render_diff()
+
+    def _view(self):
+        """A snapshot of the canvas, rendered incrementally from the previous one."""
+        bands = self._current_bands()
+        snapshot = bands.snapshot(take_dirty=True)
+        (canvas, previous), self._rendered = self._rendered, (bands.canvas, snapshot)
+        if canvas is bands.canvas and self.renderer.canvas is previous:
+            self.renderer.rebind(snapshot)
+        return snapshot
+
+    def content(self):
+        """The content index of a snapshot, built from scratch: writers do not update one."""
+        return self._current_bands().snapshot().content
+
+    def fork(self) -> 'ConcurrentBoard':
+        bands = self._current_bands()
+        return ConcurrentBoard(bands.snapshot(), self.storage, self.band_height)
+
+    def select_layer(self, name: str):
+        raise LayerError('Concurrent boards have no layers')
+
+    def draw_line(self, x1: int, y1: int, x2: int, y2: int, c: str):
+        bands = self._current_bands()
+        canvas = bands.canvas
+        self._validate_line(x1, y1, x2, y2, canvas)
+        with bands.hold(min(y1, y2) - 1, max(y1, y2)):
+            if x1 == x2:
+                canvas.fill_vertical(x1, y1, y2, c)
+            else:
+                canvas.fill_horizontal(x1, x2, y1, c)
+
+    def draw_rectangle(self, x1: int, y1: int, x2: int, y2: int, c: str):
+        bands = self._current_bands()
+        canvas = bands.canvas
+        left, top, right, bottom = self._validate_rectangle(x1, y1, x2, y2, canvas)
+        with bands.hold(top - 1, bottom):
+            canvas.fill_horizontal(left, right, top, c)
+            canvas.fill_horizontal(left, right, bottom, c)
+            canvas.fill_vertical(left, top, bottom, c)
+            canvas.fill_vertical(right, top, bottom, c)
+
+    def bucket_fill(self, x: int, y: int, c: str, view: bool = False):
+        """Fill band by band; backends without row cells are filled holding every band."""
+        bands = self._current_bands()
+        canvas = bands.canvas
+        canvas.valid_point(x, y)
+        if hasattr(canvas.storage, 'cells'):
+            band_fill(bands, x, y, c)
+            return
+        with bands.hold_all():
+            FILL_ENGINES['span'](canvas, x, y, c)
@@ -0,0 +1,135 @@
+"""A character histogram and a hash tree of the rows of a canvas.
+
+The histogram counts the pixels holding each character. As a canvas
+observer it is updated from every write: the pixels about to be overwritten
+are counted out and the new ones counted in, so the cost of a write follows
+its area and queries cost nothing.
+
+Every row has a digest, and the digests are combined pairwise up a binary
+tree (a Merkle tree) whose root, with the canvas size, is the digest of the
+whole canvas. A write marks its rows stale; the next query rehashes only
+those rows and their ancestors. Comparing two canvases is then a comparison
+of roots, and finding the rows that differ descends only into subtrees whose
+digests differ. Digests are BLAKE2b, so they are the same in every process.
+
+Pixels written around the canvas methods and reported with ``mark_dirty``
+leave the histogram to be counted again on the next query.
+"""
+import hashlib
+import struct
+from collections import Counter
+
+from src.exceptions import CanvasError
+
+DIGEST_SIZE = 8
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+
+class ContentIndex:
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.leaves = 1 << max(canvas.height - 1, 0).bit_length()
+        # tree[1] is the root and row y is the leaf tree[leaves + y]; leaves past the
+        # last row stay empty
+        self.tree = [b''] * (2 * self.leaves)
+        self.stale = set(range(canvas.height))
+        self.counts = None
+
+    def fork(self, canvas) -> 'ContentIndex':
+        """A copy of the index for canvas, a fork of the indexed canvas."""
+        index = ContentIndex.__new__(ContentIndex)
+        index.canvas = canvas
+        index.leaves = self.leaves
+        index.tree = list(self.tree)
+        index.stale = set(self.stale)
+        index.counts = None if self.counts is None else Counter(self.counts)
+        return index
+
+    def before_write(self, left: int, top: int, right: int, bottom: int, char: str):
+        # Raise what the write would raise before counting a write that will not happen
+        self.canvas.storage.encode(char)
+        self.stale.update(range(top, bottom))
+        if self.counts is None:
+            return
+        area = (right - left) * (bottom - top)
+        if area == self.canvas.width * self.canvas.height:
+            self.counts = Counter({char: area})
+            return
+        overwritten = Counter()
+        row_text = self.canvas.storage.row_text
+        for y in range(top, bottom):
+            overwritten.update(row_text(y, left, right))
+        self.counts.subtract(overwritten)
+        self.counts[char] += area
+        for old in overwritten:
+            if not self.counts[old]:
+                del self.counts[old]
+
+    def invalidate(self, left: int, top: int, right: int, bottom: int):
+        """Report pixels changed without going through the canvas write methods."""
+        self.stale.update(range(top, bottom))
+        self.counts = None
+
+    @property
+    def histogram(self) -> dict:
+        """The number of pixels holding each character."""
+        return dict(self._counted())
+
+    def count(self, char: str) -> int:
+        return self._counted()[char]
+
+    def _counted(self) -> Counter:
+        if self.counts is None:
+            self.counts = Counter()
+            for row in self.canvas.iter_rows():
+                self.counts.update(row)
+        return self.counts
+
+    @property
+    def digest(self) -> bytes:
+        """The digest of the canvas size and of every pixel."""
+        self._refresh()
+        return _digest(struct.pack('<II', self.canvas.width, self.canvas.height) + self.tree[1])
+
+    def row_digest(self, y: int) -> bytes:
+        """The digest of the 0-based row y."""
+        self._refresh()
+        return self.tree[self.leaves + y]
+
+    def differing_rows(self, other: 'ContentIndex') -> list:
+        """The 0-based rows that differ from the same rows of a canvas of the same size."""
+        if (self.canvas.width, self.canvas.height) != (other.canvas.width, other.canvas.height):
+            raise CanvasError("Only canvases of the same size can be compared row by row")
+        self._refresh()
+        other._refresh()
+        rows = []
+        nodes = [1]
+        while nodes:
+            node = nodes.pop()
+            if self.tree[node] == other.tree[node]:
+                continue
+            if node >= self.leaves:
+                rows.append(node - self.leaves)
+            else:
+                nodes.extend((2 * node + 1, 2 * node))
+        return rows
+
+    def _refresh(self):
+        if not self.stale:
+            return
+        row_text = self.canvas.storage.row_text
+        parents = set()
+        for y in self.stale:
+            self.tree[self.leaves + y] = _digest(row_text(y).encode('utf-8', 'surrogatepass'))
+            parents.add((self.leaves + y) >> 1)
+        self.stale = set()
+        # A single row is its own root
+        parents.discard(0)
+        while parents:
+            for node in parents:
+                self.tree[node] = _digest(self.tree[2 * node] + self.tree[2 * node + 1])
+            parents = {node >> 1 for node in parents if node > 1}
@@ -0,0 +1,119 @@
+"""Deferred drawing: queued writes optimized before they reach the canvas.
+
+Lines and rectangles are queued as rectangle writes ``(left, top, right,
+bottom, char)``, 0-based with exclusive right and bottom bounds. Before the
+queue is applied, ``optimize`` drops writes completely painted over by later
+ones and merges writes of the same character that together form a single
+rectangle, such as adjacent segments of one row. The optimized writes paint
+exactly the same pixels as the original queue.
+"""
+from bisect import bisect_right
+
+# How many earlier writes a write is compared with when looking for a merge
+MERGE_WINDOW = 32
+
+
+def line_writes(x1: int, y1: int, x2: int, y2: int, c: str) -> list:
+    """The writes of a validated horizontal or vertical line, in 1-based coordinates."""
+    return [(min(x1, x2) - 1, min(y1, y2) - 1, max(x1, x2), max(y1, y2), c)]
+
+
+def rectangle_writes(left: int, top: int, right: int, bottom: int, c: str) -> list:
+    """The writes of the four sides of a validated rectangle, in 1-based coordinates."""
+    return [
+        (left - 1, top - 1, right, top, c),
+        (left - 1, bottom - 1, right, bottom, c),
+        (left - 1, top - 1, left, bottom, c),
+        (right - 1, top - 1, right, bottom, c),
+    ]
+
+
+def optimize(writes: list) -> list:
+    return _coalesce(_drop_covered(writes))
+
+
+def apply_writes(canvas, writes: list):
+    """Apply writes with the canvas bulk write methods."""
+    for left, top, right, bottom, char in writes:
+        if bottom - top == 1:
+            canvas._write_span(top, left, right, char)
+        elif right - left == 1:
+            canvas._write_column(left, top, bottom, char)
+        else:
+            canvas._write_rect(left, top, right, bottom, char)
+
+
+def _drop_covered(writes: list) -> list:
+    """Remove the writes whose every pixel is written again later."""
+    covered = {}
+    kept = []
+    for write in reversed(writes):
+        left, top, right, bottom, _ = write
+        visible = False
+        for y in range(top, bottom):
+            row = covered.setdefault(y, [])
+            if not _covers(row, left, right):
+                visible = True
+                _cover(row, left, right)
+        if visible:
+            kept.append(write)
+    kept.reverse()
+    return kept
+
+
+def _covers(row: list, start: int, stop: int) -> bool:
+    """Whether the sorted disjoint [start, stop] pairs of row cover [start, stop)."""
+    index = bisect_right(row, [start, float('inf')]) - 1
+    return index >= 0 and row[index][1] >= stop
+
+
+def _cover(row: list, start: int, stop: int):
+    """Add [start, stop) to row, merging it with the intervals it touches."""
+    index = bisect_right(row, [start, float('inf')])
+    if index and row[index - 1][1] >= start:
+        index -= 1
+        start = row[index][0]
+    end = index
+    while end < len(row) and row[end][0] <= stop:
+        stop = max(stop, row[end][1])
+        end += 1
+    row[index:end] = [[start, stop]]
+
+
+def _coalesce(writes: list) -> list:
+    """Merge writes of one character whose union is a rectangle.
+
+    A write can be merged into an earlier one only if no write in between
+    overlaps it, since it then paints its pixels earlier than it used to.
+    """
+    merged = []
+    for write in writes:
+        left, top, right, bottom, char = write
+        for index in range(len(merged) - 1, max(len(merged) - MERGE_WINDOW, 0) - 1, -1):
+            other_left, other_top, other_right, other_bottom, other_char = merged[index]
+            if other_char == char:
+                union = _union(merged[index], write)
+                if union is not None:
+                    merged[index] = union
+                    break
+            if other_left < right and left < other_right and other_top < bottom and top < other_bottom:
+                merged.append(write)
+                break
+        else:
+            merged.append(write)
+    return merged
+
+
+def _union(first: tuple, second: tuple):
+    """The write covering exactly both writes, or None if their union is not a rectangle."""
+    left, top, right, bottom, char = first
+    other_left, other_top, other_right, other_bottom, _ = second
+    if (top, bottom) == (other_top, other_bottom) and other_left <= right and left <= other_right:
+        return min(left, other_left), top, max(right, other_right), bottom, char
+    if (left, right) == (other_left, other_right) and other_top <= bottom and top <= other_bottom:
+        return left, min(top, other_top), right, max(bottom, other_bottom), char
+    if left <= other_left and other_right <= right and top <= other_top and other_bottom <= bottom:
+        return first
+    if other_left <= left and right <= other_right and other_top <= top and bottom <= other_bottom:
+        return second
+    return None
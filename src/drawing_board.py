@@ -1,83 +1,336 @@
+import copy
+from contextlib import nullcontext
+
 from src.canvas import Canvas
-from src.exceptions import CanvasNotReadyError
+from src.content import ContentIndex
+from src.deferred import apply_writes, line_writes, optimize, rectangle_writes
+from src.exceptions import CanvasNotReadyError, HistoryError, LayerError, ViewportError
+from src.export import export_canvas
+from src.fill import FILL_ENGINES
+from src.history import History
+from src.layers import LayerStack
+from src.renderer import ANSI_HOME_AND_CLEAR, Renderer, Snapshot, Viewport, render_viewport, write_frame
+from src.stats import Stats
 from src.validators import validate_line_orientation
 
 
 class DrawingBoard:
-    def __init__(self, canvas: Canvas = None):
+    """Drawing commands applied to a canvas.
+
+    With ``deferred=True`` lines and rectangles are validated and queued
+    instead of drawn. The queue is optimized (see ``src.deferred``) and
+    applied when the board is rendered, before a bucket fill and on
+    ``flush``; a new canvas discards it. Code reading ``canvas`` directly
+    must call ``flush`` first. Deferred boards keep no undo history.
+
+    Selecting a layer (see ``src.layers``) turns the canvas into the bottom
+    layer of ``layers``; from then on ``canvas`` is the active layer and the
+    board renders the composite of the visible layers. A new canvas has no
+    layers. Undo and redo apply to drawing, not to layer commands.
+    """
+
+    def __init__(self, canvas: Canvas = None, fill_engine: str = 'span', storage: str = 'list',
+                 history: History = None, stats: Stats = None, deferred: bool = False,
+                 max_pending: int = 10_000):
+        if fill_engine not in FILL_ENGINES:
+            raise ValueError(f"Unknown fill engine: {fill_engine}, expected one of {sorted(FILL_ENGINES)}")
+        if deferred and history is not None:
+            raise ValueError("Deferred execution can not be combined with undo history")
         self.canvas = canvas
+        self.fill_engine = fill_engine
+        self.storage = storage
+        self.renderer = Renderer()
+        self.history = history
+        self.stats = stats
+        self.deferred = deferred
+        self.max_pending = max_pending
+        self.pending = []
+        self.viewport = None
+        self.layers = None
+        # Rows renders took from the shown canvas since the last snapshot, None before the first one
+        self._unsnapped = None
 
     def __str__(self):
         self._ensure_canvas()
-        border = '-' * (self.canvas.width + 2)
-        rows = ['|' + ''.join(row) + '|' for row in self.canvas.pixels]
-        return '\n'.join([border] + rows + [border])
+        self.flush()
+        if self.stats is None:
+            return self._render()
+        with self.stats.measure('render'):
+            frame = self._render()
+        self.stats.record_render(frame)
+        return frame
+
+    def _view(self) -> Canvas:
+        """The canvas shown: the composite of the layers on a layered board."""
+        return self.canvas if self.layers is None else self.layers.refresh()
+
+    def _rendered_view(self) -> Canvas:
+        """The shown canvas, keeping the dirty rows the renderer is about to take for the next snapshot."""
+        view = self._view()
+        if self._unsnapped is not None:
+            self._unsnapped |= view.dirty_rows
+        return view
+
+    def _render(self) -> str:
+        if self.viewport is None:
+            return self.renderer.render(self._rendered_view())
+        return render_viewport(self._view(), self.viewport)
+
+    def write_frame(self, out):
+        """Write ``str(board)`` and a newline to the text file out, streaming the rows.
+
+        Unlike ``str(board)`` the frame is never held whole in memory, and
+        the renderer cache is left alone, so repeated frames are not cheaper.
+        """
+        self._ensure_canvas()
+        self.flush()
+        if self.stats is not None:
+            out = _RecordingWriter(out, self.stats)
+        with nullcontext() if self.stats is None else self.stats.measure('render'):
+            if self.viewport is None:
+                write_frame(self._view(), out)
+            else:
+                out.write(render_viewport(self._view(), self.viewport) + '\n')
+
+    def export(self, path: str):
+        """Export the whole canvas shown, ignoring the viewport, to path (see ``src.export``)."""
+        self._ensure_canvas()
+        self.flush()
+        with self._measuring('export'):
+            export_canvas(self._view(), path)
+
+    def render_diff(self) -> str:
+        """ANSI output redrawing only the rows changed since the last render.
+
+        A viewport is always redrawn whole, which costs no more than its area.
+        """
+        self._ensure_canvas()
+        self.flush()
+        if self.stats is None:
+            return self._render_diff()
+        with self.stats.measure('render_diff'):
+            output = self._render_diff()
+        self.stats.record_render(output)
+        return output
+
+    def _render_diff(self) -> str:
+        if self.viewport is None:
+            return self.renderer.render_diff(self._rendered_view())
+        return ANSI_HOME_AND_CLEAR + render_viewport(self._view(), self.viewport) + '\n'
+
+    def snapshot(self) -> Snapshot:
+        """What the board shows, as a fork that can be rendered later or in another thread.
+
+        The fork's dirty rows hold at least the rows changed since the previous
+        snapshot, see ``SnapshotRenderer``. The shown canvas keeps its own for
+        the board's renderer.
+        """
+        self._ensure_canvas()
+        self.flush()
+        view = self._view()
+        canvas = view.fork()
+        rows = view.dirty_rows if self._unsnapped is None else self._unsnapped | view.dirty_rows
+        canvas.dirty_rows, canvas.dirty_rect = set(rows), view.dirty_rect
+        self._unsnapped = set()
+        return Snapshot(canvas, view, copy.copy(self.viewport))
+
+    def content(self) -> ContentIndex:
+        """The character histogram and row hashes of the canvas shown (see ``src.content``)."""
+        self._ensure_canvas()
+        self.flush()
+        return self._view().content
+
+    def same_content(self, other: 'DrawingBoard') -> bool:
+        """Whether both boards show canvases of the same size and pixels, comparing their hashes."""
+        return self.content().digest == other.content().digest
+
+    def differing_rows(self, other: 'DrawingBoard') -> list:
+        """The 1-based rows that differ between the canvases shown by two boards of the same size."""
+        return [y + 1 for y in self.content().differing_rows(other.content())]
+
+    def set_viewport(self, x: int, y: int, width: int, height: int):
+        """Render only the width x height window whose top-left pixel is (x, y)."""
+        self._ensure_canvas()
+        self.canvas.valid_point(x, y)
+        self.viewport = Viewport(x, y, width, height)
+
+    def scroll_viewport(self, dx: int, dy: int):
+        self._ensure_canvas()
+        if self.viewport is None:
+            raise ViewportError('No viewport to scroll, set one first')
+        self.viewport.scroll(dx, dy, self.canvas)
+
+    def clear_viewport(self):
+        """Render the whole canvas again."""
+        self.viewport = None
+        # The last frame shown was the viewport, so diff rendering must start over
+        self.renderer = Renderer()
+
+    def select_layer(self, name: str):
+        """Draw on the layer called name, adding it transparent on top of the others if it is new."""
+        self._ensure_canvas()
+        self.flush()
+        if self.layers is None:
+            self.layers = LayerStack(self.canvas, self.storage)
+        layer = self.layers.find(name)
+        if layer is None:
+            layer = self.layers.add(name)
+        self.canvas = layer.canvas
+
+    def set_layer_visible(self, name: str, visible: bool):
+        self._ensure_layers()
+        self.layers.set_visible(name, visible)
+
+    def move_layer(self, name: str, position: int):
+        """Move the layer called name to position, counted from 1 at the bottom."""
+        self._ensure_layers()
+        self.layers.move(name, position)
+
+    def flush(self):
+        """Apply the lines and rectangles queued in deferred mode."""
+        if not self.pending:
+            return
+        with self._measuring('flush'):
+            writes, self.pending = optimize(self.pending), []
+            apply_writes(self.canvas, writes)
+
+    def _defer(self, writes: list, c: str):
+        self.canvas.storage.encode(c)
+        self.pending.extend(writes)
+        if len(self.pending) >= self.max_pending:
+            self.flush()
+
+    def fork(self) -> 'DrawingBoard':
+        """A board with the same drawing and configuration whose commands do not affect this one.
+
+        The canvas is forked (see ``Canvas.fork``), so branching costs no pixel
+        copies until either board draws. The fork starts with an empty history.
+        """
+        self._ensure_canvas()
+        self.flush()
+        with self._measuring('fork'):
+            if self.layers is None:
+                layers, canvas = None, self.canvas.fork()
+            else:
+                layers = self.layers.fork()
+                canvas = layers.layers[self.layers.layers.index(self.layers.of(self.canvas))].canvas
+        history = None if self.history is None else History(self.history.limit, self.history.snapshot_every)
+        board = DrawingBoard(canvas, self.fill_engine, self.storage, history, self.stats, self.deferred,
+                             self.max_pending)
+        board.layers = layers
+        if self.viewport is not None:
+            board.viewport = copy.copy(self.viewport)
+        return board
 
     def new_canvas(self, width: int, height: int):
-        self.canvas = Canvas(width, height)
+        # Queued writes to the replaced canvas could never be seen
+        self.pending = []
+        with self._measuring('new_canvas'):
+            previous, self.canvas = self.canvas, Canvas(width, height, self.storage)
+        previous_layers, self.layers = self.layers, None
+        if self.history is not None:
+            self.history.record_canvas(previous, self.canvas, previous_layers)
+
+    def undo(self, steps: int = 1) -> int:
+        self._ensure_history()
+        with self._measuring('undo'):
+            return self.history.undo(self, steps)
+
+    def redo(self, steps: int = 1) -> int:
+        self._ensure_history()
+        with self._measuring('redo'):
+            return self.history.redo(self, steps)
 
     def _ensure_canvas(self):
         if not self.canvas:
             raise CanvasNotReadyError('Canvas not ready, please initiate a new canvas')
 
-    def _validate_line(self, x1: int, y1: int, x2: int, y2: int):
+    def _ensure_layers(self):
+        if self.layers is None:
+            raise LayerError('The board has no layers, select one first')
+
+    def _ensure_history(self):
+        if self.history is None:
+            raise HistoryError('Undo history is not enabled for this board')
+
+    def _measuring(self, name: str):
+        if self.stats is None:
+            return nullcontext()
+        return self.stats.measure(name, self.canvas)
+
+    def _recording(self):
+        if self.history is None:
+            return nullcontext()
+        return self.history.record(self.canvas)
+
+    def _validate_line(self, x1: int, y1: int, x2: int, y2: int, canvas: Canvas = None):
+        """Check the line against canvas, the board's canvas by default."""
+        canvas = self.canvas if canvas is None else canvas
         validate_line_orientation(x1, y1, x2, y2)
         for point in ((x1, y1), (x2, y2)):
-            self.canvas.valid_point(*point)
+            canvas.valid_point(*point)
+
+    def _validate_rectangle(self, x1: int, y1: int, x2: int, y2: int, canvas: Canvas = None) -> tuple:
+        """Check all four corners and return the left, top, right and bottom bounds."""
+        canvas = self.canvas if canvas is None else canvas
+        left, right = min(x1, x2), max(x1, x2)
+        top, bottom = min(y1, y2), max(y1, y2)
+        for point in ((left, top), (right, top), (left, bottom), (right, bottom)):
+            canvas.valid_point(*point)
+        return left, top, right, bottom
 
     def draw_line(self, x1: int, y1: int, x2: int, y2: int, c: str):
         self._ensure_canvas()
         self._validate_line(x1, y1, x2, y2)
+        if self.deferred:
+            self._defer(line_writes(x1, y1, x2, y2, c), c)
+            return
 
-        if x1 == x2:  # Vertical line
-            for y in range(min(y1, y2), max(y1, y2) + 1):
-                self.canvas.draw_pixel(x1, y, c)
-        else:  # Horizontal line
-            for x in range(min(x1, x2), max(x1, x2) + 1):
-                self.canvas.draw_pixel(x, y1, c)
+        with self._measuring('draw_line'), self._recording():
+            if x1 == x2:  # Vertical line
+                self.canvas.fill_vertical(x1, y1, y2, c)
+            else:  # Horizontal line
+                self.canvas.fill_horizontal(x1, x2, y1, c)
 
     def draw_rectangle(self, x1: int, y1: int, x2: int, y2: int, c: str):
         self._ensure_canvas()
+        left, top, right, bottom = self._validate_rectangle(x1, y1, x2, y2)
+        if self.deferred:
+            self._defer(rectangle_writes(left, top, right, bottom, c), c)
+            return
 
-        left, right = min(x1, x2), max(x1, x2)
-        top, bottom = min(y1, y2), max(y1, y2)
-
-        for point in ((left, top), (right, top), (left, bottom), (right, bottom)):
-            self.canvas.valid_point(*point)
+        with self._measuring('draw_rectangle'), self._recording():
+            self.canvas.fill_horizontal(left, right, top, c)
+            self.canvas.fill_horizontal(left, right, bottom, c)
+            self.canvas.fill_vertical(left, top, bottom, c)
+            self.canvas.fill_vertical(right, top, bottom, c)
 
-        self.draw_line(left, top, right, top, c)
-        self.draw_line(left, bottom, right, bottom, c)
-        self.draw_line(left, top, left, bottom, c)
-        self.draw_line(right, top, right, bottom, c)
+    def bucket_fill(self, x: int, y: int, c: str, view: bool = False):
+        """Fill the area connected to (x, y) with c.
 
-    def bucket_fill(self, x: int, y: int, c: str):
+        On a layered board the area is found on the active layer, or with
+        ``view`` on the composite of the visible layers; either way it is
+        painted on the active layer.
+        """
         self._ensure_canvas()
         self.canvas.valid_point(x, y)
+        self.flush()
+        fill = FILL_ENGINES[self.fill_engine]
+        fill_stats = None if self.stats is None else self.stats.fill
+        with self._measuring('bucket_fill'), self._recording():
+            if view and self.layers is not None:
+                self.layers.fill_view(self.canvas, x, y, c, fill, stats=fill_stats)
+            else:
+                fill(self.canvas, x, y, c, stats=fill_stats)
 
-        start_color = self.canvas.get_pixel(x, y)
-        if start_color == c:
-            return
-
-        stack = [(x, y)]
-        visited = set()
-
-        while stack:
-            current_x, current_y = stack.pop()
-
-            if (current_x, current_y) in visited:
-                continue
-
-            visited.add((current_x, current_y))
 
-            if not self.canvas.is_inside(current_x, current_y) or \
-                    self.canvas.get_pixel(current_x, current_y) != start_color:
-                continue
+class _RecordingWriter:
+    """A text file wrapper counting what is written to it as rendered output."""
 
-            self.canvas.draw_pixel(current_x, current_y, c)
+    def __init__(self, out, stats: Stats):
+        self.out = out
+        self.stats = stats
 
-            neighbors = [
-                (current_x + dx, current_y + dy)
-                for dx, dy in [(1, 0), (-1, 0), (0, 1), (0, -1)]
-                if self.canvas.is_inside(current_x + dx, current_y + dy)
-            ]
-            stack.extend(n for n in neighbors if n not in visited)
+    def write(self, text: str) -> int:
+        self.stats.record_render(text)
+        return self.out.write(text)
@@ -21,6 +21,11 @@ class CanvasDimensionError(CanvasError):
     pass
 
 
+class UnsupportedCharacterError(CanvasError):
+    """Raised when a character can not be stored by the canvas storage backend."""
+    pass
+
+
 class WrongOrientationError(DrawingError):
     """Raised when a line is neither horizontal nor vertical."""
     pass
@@ -30,6 +35,21 @@ class OutOfCanvasError(DrawingError):
     """Raised when trying to draw outside canvas bounds."""
 
 
+class ViewportError(DrawingError):
+    """Raised when scrolling without a viewport."""
+    pass
+
+
+class LayerError(DrawingError):
+    """Raised when a layer command refers to a missing layer or position."""
+    pass
+
+
+class HistoryError(DrawingError):
+    """Raised when undo or redo is not possible."""
+    pass
+
+
 class CommandError(DrawingError):
     """Raised when there is an error in command format or parameters."""
     pass
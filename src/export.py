@@ -0,0 +1,108 @@
+"""Canvas exporters streaming row by row.
+
+Every exporter reads the canvas one row at a time (``Canvas.iter_rows``) and
+writes it in chunks of about ``WRITE_CHUNK_SIZE`` bytes, so the memory it
+needs stays the same however tall the canvas is:
+
+* ``export_text`` - the rows without the border frame, one per line
+* ``export_pgm`` - a binary greyscale PGM image, one grey level per pixel
+* ``export_ppm`` - a binary colour PPM image, one RGB colour per pixel
+* ``export_gzip`` - the plain text compressed with gzip
+
+``export_canvas`` picks the exporter from the file extension.
+"""
+import gzip
+import io
+import os
+
+from src.renderer import WRITE_CHUNK_SIZE, write_chunks
+
+# Grey levels (0 is black) and RGB colours of characters in images; the
+# characters missing from a palette are drawn with the palette's default
+GREYS = {' ': 255}
+COLOURS = {' ': (255, 255, 255)}
+# The colours given to the other characters of a PPM image, chosen by code point
+DEFAULT_COLOURS = [(0, 0, 0), (200, 30, 30), (30, 150, 30), (30, 60, 200), (220, 160, 0), (150, 40, 170),
+                   (0, 150, 160), (120, 120, 120)]
+
+
+class _Palette(dict):
+    """A str.translate table from code points to the Latin-1 bytes of their colour."""
+
+    def __init__(self, colours: dict, default):
+        super().__init__()
+        self.colours = colours
+        self.default = default
+
+    def __missing__(self, code_point: int) -> str:
+        char = chr(code_point)
+        colour = self.colours[char] if char in self.colours else self.default(char)
+        encoded = self[code_point] = ''.join(map(chr, colour if isinstance(colour, tuple) else (colour,)))
+        return encoded
+
+
+def export_text(canvas, out, chunk_size: int = WRITE_CHUNK_SIZE):
+    """Write the rows without the frame to the text file out."""
+    write_chunks(canvas.iter_rows(), out, chunk_size)
+
+
+def export_gzip(canvas, out, chunk_size: int = WRITE_CHUNK_SIZE):
+    """Write the rows as gzip-compressed UTF-8 text to the binary file out."""
+    with gzip.GzipFile(fileobj=out, mode='wb') as compressed:
+        text = io.TextIOWrapper(compressed, encoding='utf-8', newline='\n')
+        export_text(canvas, text, chunk_size)
+        # Leave closing the gzip stream (but not out) to the with statement
+        text.detach()
+
+
+def _export_image(canvas, out, magic: bytes, palette: _Palette, chunk_size: int):
+    out.write(b'%s\n%d %d\n255\n' % (magic, canvas.width, canvas.height))
+    parts = []
+    pending = 0
+    for row in canvas.iter_rows():
+        parts.append(row.translate(palette).encode('latin-1'))
+        pending += len(parts[-1])
+        if pending >= chunk_size:
+            out.write(b''.join(parts))
+            parts, pending = [], 0
+    out.write(b''.join(parts))
+
+
+def export_pgm(canvas, out, greys: dict = None, default: int = 0, chunk_size: int = WRITE_CHUNK_SIZE):
+    """Write a binary PGM image to the binary file out, one grey level from 0 to 255 per pixel.
+
+    greys maps characters to grey levels (``GREYS`` when None); other
+    characters are drawn in the default grey.
+    """
+    palette = _Palette(GREYS if greys is None else greys, lambda char: default)
+    _export_image(canvas, out, b'P5', palette, chunk_size)
+
+
+def export_ppm(canvas, out, colours: dict = None, chunk_size: int = WRITE_CHUNK_SIZE):
+    """Write a binary PPM image to the binary file out, one RGB colour per pixel.
+
+    colours maps characters to ``(red, green, blue)`` (``COLOURS`` when
+    None); other characters get one of ``DEFAULT_COLOURS`` by code point.
+    """
+    palette = _Palette(COLOURS if colours is None else colours,
+                       lambda char: DEFAULT_COLOURS[ord(char) % len(DEFAULT_COLOURS)])
+    _export_image(canvas, out, b'P6', palette, chunk_size)
+
+
+# File extension: (exporter, whether it writes bytes)
+EXPORTERS = {
+    '.txt': (export_text, False),
+    '.pgm': (export_pgm, True),
+    '.ppm': (export_ppm, True),
+    '.gz': (export_gzip, True),
+}
+
+
+def export_canvas(canvas, path: str):
+    """Export the canvas to path in the format of its extension (see ``EXPORTERS``)."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXPORTERS:
+        raise ValueError(f"Unknown export format: {extension or path}, expected one of {sorted(EXPORTERS)}")
+    exporter, binary = EXPORTERS[extension]
+    with open(path, 'wb') if binary else open(path, 'w', encoding='utf-8', newline='\n') as out:
+        exporter(canvas, out)
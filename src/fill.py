@@ -0,0 +1,128 @@
+"""Flood fill engines used by DrawingBoard.bucket_fill.
+
+Every engine fills the 4-connected area of pixels sharing the colour of the
+start point, so all of them produce the same canvas for the same input.
+
+Engines accept an optional ``stats`` object (``src.stats.FillStats``) whose
+``fills``, ``visited`` and ``peak_depth`` counters they update; the search
+counters are only tracked by the naive and span engines.
+"""
+
+
+def naive_fill(canvas, x: int, y: int, c: str, stats=None):
+    """Pixel-by-pixel fill using a stack of points and a visited set."""
+    start_color = canvas.get_pixel(x, y)
+    if stats is not None:
+        stats.fills += 1
+    if start_color == c:
+        return
+
+    stack = [(x, y)]
+    visited = set()
+    peak_depth = 0
+
+    while stack:
+        if stats is not None:
+            peak_depth = max(peak_depth, len(stack))
+        current_x, current_y = stack.pop()
+
+        if (current_x, current_y) in visited:
+            continue
+
+        visited.add((current_x, current_y))
+
+        if not canvas.is_inside(current_x, current_y) or \
+                canvas.get_pixel(current_x, current_y) != start_color:
+            continue
+
+        canvas.draw_pixel(current_x, current_y, c)
+
+        neighbors = [
+            (current_x + dx, current_y + dy)
+            for dx, dy in [(1, 0), (-1, 0), (0, 1), (0, -1)]
+            if canvas.is_inside(current_x + dx, current_y + dy)
+        ]
+        stack.extend(n for n in neighbors if n not in visited)
+
+    if stats is not None:
+        stats.visited += len(visited)
+        stats.peak_depth = max(stats.peak_depth, peak_depth)
+
+
+def span_fill(canvas, x: int, y: int, c: str, stats=None):
+    """Scanline fill that paints a whole horizontal run per stack entry.
+
+    Filled pixels no longer hold the start colour, so no visited set is
+    needed. Rows are compared as raw storage cells with 0-based indexes; the
+    start point is the only one that gets bounds-checked. Storage backends
+    without contiguous rows provide their own ``span_fill``.
+    """
+    storage = canvas.storage
+    width, height = canvas.width, canvas.height
+    target_char = canvas.get_pixel(x, y)
+    if stats is not None:
+        stats.fills += 1
+    if target_char == c:
+        return
+    if not hasattr(storage, 'cells'):
+        storage.span_fill(canvas, x - 1, y - 1, target_char, c)
+        return
+    target = storage.encode(target_char)
+    storage.encode(c)
+
+    stack = [(x - 1, y - 1)]
+    visited = peak_depth = 0
+    while stack:
+        if stats is not None:
+            peak_depth = max(peak_depth, len(stack))
+        seed_x, seed_y = stack.pop()
+        row = storage.cells(seed_y)
+        if row[seed_x] != target:
+            continue
+
+        left = seed_x
+        while left > 0 and row[left - 1] == target:
+            left -= 1
+        right = seed_x + 1
+        while right < width and row[right] == target:
+            right += 1
+        canvas._write_span(seed_y, left, right, c)
+        visited += right - left
+
+        for ny in (seed_y - 1, seed_y + 1):
+            if not 0 <= ny < height:
+                continue
+            visited += right - left
+            neighbour = storage.cells(ny)
+            nx = left
+            while nx < right:
+                if neighbour[nx] == target:
+                    stack.append((nx, ny))
+                    nx += 1
+                    while nx < right and neighbour[nx] == target:
+                        nx += 1
+                nx += 1
+
+    if stats is not None:
+        stats.visited += visited
+        stats.peak_depth = max(stats.peak_depth, peak_depth)
+
+
+def indexed_fill(canvas, x: int, y: int, c: str, stats=None):
+    """Fill through the canvas region index.
+
+    The first fill labels the whole canvas; later fills only rewrite the spans
+    already known for the region and relabel what earlier writes touched, so
+    repeated fills on large canvases are much cheaper than a new search.
+    """
+    canvas.valid_point(x, y)
+    if stats is not None:
+        stats.fills += 1
+    canvas.regions.fill(x - 1, y - 1, c)
+
+
+FILL_ENGINES = {
+    'naive': naive_fill,
+    'span': span_fill,
+    'indexed': indexed_fill,
+}
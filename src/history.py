@@ -0,0 +1,200 @@
+"""Undo/redo history stored as compact per-command deltas.
+
+Every command that writes to the canvas is recorded as a ``Delta``: for each
+row span or column span it wrote, the previous content (run-length encoded)
+and the character written. Memory therefore grows with the number of pixels
+changed rather than with the canvas size. Full snapshots are taken every
+``snapshot_every`` entries so that undoing many steps at once costs at most
+one snapshot restore plus ``snapshot_every`` deltas.
+"""
+import re
+from contextlib import contextmanager
+
+from src.exceptions import HistoryError
+
+_RUN = re.compile(r'(.)\1*', re.DOTALL)
+
+
+def encode_runs(text: str) -> list:
+    """Run-length encode text as a list of (char, count) pairs."""
+    return [(match[1], len(match[0])) for match in _RUN.finditer(text)]
+
+
+def decode_runs(runs: list) -> str:
+    return ''.join(char * count for char, count in runs)
+
+
+def _write_runs(canvas, x: int, y: int, vertical: bool, runs: list):
+    for char, count in runs:
+        if vertical:
+            canvas._write_column(x, y, y + count, char)
+            y += count
+        else:
+            canvas._write_span(y, x, x + count, char)
+            x += count
+
+
+class Delta:
+    """The writes of one command, captured as a canvas observer."""
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.records = []
+
+    def before_write(self, left: int, top: int, right: int, bottom: int, char: str):
+        storage = self.canvas.storage
+        if right - left == 1 and bottom - top > 1:
+            old = ''.join(storage.get(left, y) for y in range(top, bottom))
+            self.records.append((left, top, right, bottom, encode_runs(old), char))
+            return
+        # Rectangles are recorded as one span per row
+        for y in range(top, bottom):
+            self.records.append((left, y, right, y + 1, encode_runs(storage.row_text(y, left, right)), char))
+
+    def undo(self, board):
+        # The written canvas, which on a layered board need not be the active one
+        for left, top, right, bottom, runs, _ in reversed(self.records):
+            _write_runs(self.canvas, left, top, bottom - top > 1, runs)
+
+    def redo(self, board):
+        for left, top, right, bottom, _, char in self.records:
+            if bottom - top > 1:
+                self.canvas._write_column(left, top, bottom, char)
+            else:
+                self.canvas._write_span(top, left, right, char)
+
+
+class CanvasChange:
+    """A new canvas replacing the previous one.
+
+    The board's canvas and layers on either side of the change are swapped
+    back in on undo and redo, so layers added in between are kept.
+    """
+
+    def __init__(self, previous, canvas, previous_layers=None):
+        self.previous = previous
+        self.previous_layers = previous_layers
+        self.canvas = canvas
+        self.layers = None
+
+    def undo(self, board):
+        self.canvas, self.layers = board.canvas, board.layers
+        board.canvas, board.layers = self.previous, self.previous_layers
+
+    def redo(self, board):
+        self.previous, self.previous_layers = board.canvas, board.layers
+        board.canvas, board.layers = self.canvas, self.layers
+
+
+class Snapshot:
+    """The full content of a canvas, one run-length encoded row at a time."""
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.rows = [encode_runs(row) for row in canvas.iter_rows()]
+
+    def restore(self):
+        for y, runs in enumerate(self.rows):
+            _write_runs(self.canvas, 0, y, False, runs)
+
+
+class History:
+    """Linear undo/redo history of a DrawingBoard.
+
+    Positions count committed entries from the start of the session; at most
+    ``limit`` entries are kept, the oldest being dropped first.
+    """
+
+    def __init__(self, limit: int = 1000, snapshot_every: int = 100):
+        self.limit = limit
+        self.snapshot_every = snapshot_every
+        self.entries = []
+        self.base = 0
+        self.position = 0
+        self.snapshots = {}
+
+    @property
+    def undo_steps(self) -> int:
+        return self.position - self.base
+
+    @property
+    def redo_steps(self) -> int:
+        return self.base + len(self.entries) - self.position
+
+    @contextmanager
+    def record(self, canvas):
+        """Record the writes made to canvas inside the block as one entry.
+
+        If the block raises, the writes it made are reverted and nothing is
+        recorded, so a failed command leaves neither pixels nor an entry.
+        """
+        delta = Delta(canvas)
+        canvas.observers.append(delta)
+        try:
+            yield
+        except BaseException:
+            canvas.observers.remove(delta)
+            # The last record may be the write that failed; restoring it is harmless
+            delta.undo(None)
+            raise
+        canvas.observers.remove(delta)
+        if delta.records:
+            self._push(delta, canvas)
+
+    def record_canvas(self, previous, canvas, previous_layers=None):
+        self._push(CanvasChange(previous, canvas, previous_layers), canvas)
+
+    def _push(self, entry, canvas):
+        del self.entries[self.position - self.base:]
+        self.snapshots = {position: snapshot for position, snapshot in self.snapshots.items()
+                          if position <= self.position}
+
+        self.entries.append(entry)
+        self.position += 1
+        if len(self.entries) > self.limit:
+            self.entries.pop(0)
+            self.base += 1
+            self.snapshots.pop(self.base - 1, None)
+
+        if self.position % self.snapshot_every == 0:
+            self.snapshots[self.position] = Snapshot(canvas)
+
+    def undo(self, board, steps: int = 1) -> int:
+        """Undo up to steps entries and return how many were undone."""
+        steps = min(steps, self.undo_steps)
+        if not steps:
+            raise HistoryError("Nothing to undo")
+
+        target = self.position - steps
+        snapshot_position = self._snapshot_before(target)
+        if snapshot_position is not None and target - snapshot_position < steps:
+            self.snapshots[snapshot_position].restore()
+            for entry in self.entries[snapshot_position - self.base:target - self.base]:
+                entry.redo(board)
+        else:
+            for entry in reversed(self.entries[target - self.base:self.position - self.base]):
+                entry.undo(board)
+        self.position = target
+        return steps
+
+    def redo(self, board, steps: int = 1) -> int:
+        """Redo up to steps entries and return how many were redone."""
+        steps = min(steps, self.redo_steps)
+        if not steps:
+            raise HistoryError("Nothing to redo")
+
+        for entry in self.entries[self.position - self.base:self.position - self.base + steps]:
+            entry.redo(board)
+        self.position += steps
+        return steps
+
+    def _snapshot_before(self, target: int):
+        """The latest snapshot at or before target, if every later entry wrote to its canvas."""
+        for position in sorted(self.snapshots, reverse=True):
+            if position <= target:
+                canvas = self.snapshots[position].canvas
+                if all(isinstance(entry, Delta) and entry.canvas is canvas
+                       for entry in self.entries[position - self.base:self.position - self.base]):
+                    return position
+                return None
+        return None
@@ -0,0 +1,174 @@
+"""Crash recovery through a command journal and canvas snapshots.
+
+A journal directory holds two files:
+
+* ``journal.log`` - one JSON array per executed command: ``[seq, cmd, *params]``.
+* ``snapshot.bin`` - the latest canvas snapshot: a fixed header followed by the
+  zlib-compressed UTF-32-LE pixels, row by row.
+
+Restoring loads the snapshot and replays only the journal entries recorded
+after it. Taking a snapshot empties the journal, so the tail stays short.
+"""
+import json
+import os
+import struct
+import zlib
+
+from src.canvas import Canvas
+from src.history import encode_runs
+
+SNAPSHOT_MAGIC = b'DRWS'
+SNAPSHOT_VERSION = 1
+# magic, version, seq, width, height
+SNAPSHOT_HEADER = struct.Struct('<4sHQII')
+
+SYNC_POLICIES = ('always', 'interval', 'never')
+
+
+def write_snapshot(path: str, canvas, seq: int):
+    """Atomically write the canvas (or the absence of one) to path."""
+    width, height = (canvas.width, canvas.height) if canvas else (0, 0)
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as snapshot:
+        snapshot.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, seq, width, height))
+        if canvas:
+            compressor = zlib.compressobj()
+            for row in canvas.iter_rows():
+                snapshot.write(compressor.compress(row.encode('utf-32-le')))
+            snapshot.write(compressor.flush())
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+    os.replace(temporary, path)
+
+
+def read_snapshot(path: str, storage: str = 'list') -> tuple:
+    """Return (seq, canvas) from a snapshot file; canvas is None for an empty board."""
+    with open(path, 'rb') as snapshot:
+        magic, version, seq, width, height = SNAPSHOT_HEADER.unpack(snapshot.read(SNAPSHOT_HEADER.size))
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} canvas snapshot")
+        if not width:
+            return seq, None
+        pixels = zlib.decompress(snapshot.read()).decode('utf-32-le')
+
+    canvas = Canvas(width, height, storage)
+    for y in range(height):
+        x = 0
+        for char, count in encode_runs(pixels[y * width:(y + 1) * width]):
+            if char != ' ':
+                canvas._write_span(y, x, x + count, char)
+            x += count
+    canvas.take_dirty()
+    return seq, canvas
+
+
+class Journal:
+    """Append-only journal of validated commands for one board.
+
+    ``sync`` decides when appended commands are flushed and fsync'd:
+    after every command (``'always'``), every ``sync_every`` commands
+    (``'interval'``) or only when the journal is closed (``'never'``).
+    A snapshot is taken automatically every ``snapshot_every`` commands.
+    """
+
+    def __init__(self, directory: str, sync: str = 'interval', sync_every: int = 100,
+                 snapshot_every: int = 1000):
+        if sync not in SYNC_POLICIES:
+            raise ValueError(f"Unknown sync policy: {sync}, expected one of {SYNC_POLICIES}")
+        os.makedirs(directory, exist_ok=True)
+        self.log_path = os.path.join(directory, 'journal.log')
+        self.snapshot_path = os.path.join(directory, 'snapshot.bin')
+        self.sync = sync
+        self.sync_every = sync_every
+        self.snapshot_every = snapshot_every
+        self.seq = 0
+        self.unsynced = 0
+        self.since_snapshot = 0
+        self.log = None
+        self.valid_end = 0
+
+    def restore(self, board, execute) -> int:
+        """Load the latest snapshot into board and replay the journal tail.
+
+        ``execute(board, cmd, params)`` applies one command. A last line cut
+        short by a crash is cut off the journal, so the commands recorded
+        from now on are not appended to it. Returns the number of replayed
+        commands.
+        """
+        snapshot_seq = 0
+        if os.path.exists(self.snapshot_path):
+            snapshot_seq, board.canvas = read_snapshot(self.snapshot_path, board.storage)
+        self.seq = snapshot_seq
+
+        replayed = 0
+        for seq, cmd, params in self._read_log():
+            if seq <= snapshot_seq:
+                continue
+            execute(board, cmd, params)
+            self.seq = seq
+            replayed += 1
+        self.since_snapshot = replayed
+        self._truncate_log()
+        return replayed
+
+    def _read_log(self):
+        """Yield the journaled commands, recording in ``valid_end`` where the last whole line ends."""
+        self.valid_end = 0
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, 'rb') as log:
+            for line in log:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError('unterminated line')
+                    seq, cmd, *params = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash can only be the last one
+                    break
+                self.valid_end += len(line)
+                yield seq, cmd, tuple(params)
+
+    def _truncate_log(self):
+        """Cut whatever follows the last whole line off the journal."""
+        if os.path.exists(self.log_path) and os.path.getsize(self.log_path) > self.valid_end:
+            with open(self.log_path, 'r+b') as log:
+                log.truncate(self.valid_end)
+                log.flush()
+                os.fsync(log.fileno())
+
+    def record(self, board, cmd: str, params: tuple):
+        """Append an executed command, syncing or snapshotting per policy."""
+        if self.log is None:
+            self.log = open(self.log_path, 'a', encoding='utf-8')
+        self.seq += 1
+        self.log.write(json.dumps([self.seq, cmd, *params]) + '\n')
+        self.unsynced += 1
+        self.since_snapshot += 1
+
+        if self.since_snapshot >= self.snapshot_every:
+            self.checkpoint(board)
+        elif self.sync == 'always' or (self.sync == 'interval' and self.unsynced >= self.sync_every):
+            self.flush()
+
+    def checkpoint(self, board):
+        """Snapshot the board and empty the journal."""
+        board.flush()
+        write_snapshot(self.snapshot_path, board.canvas, self.seq)
+        if self.log is not None:
+            self.log.close()
+        self.log = open(self.log_path, 'w', encoding='utf-8')
+        self.unsynced = 0
+        self.since_snapshot = 0
+
+    def flush(self):
+        if self.log is None:
+            return
+        self.log.flush()
+        os.fsync(self.log.fileno())
+        self.unsynced = 0
+
+    def close(self):
+        if self.log is not None:
+            self.flush()
+            self.log.close()
+            self.log = None
@@ -0,0 +1,185 @@
+"""Named drawing layers composited into a single canvas.
+
+Every layer is a ``Canvas`` of the same size. Pixels of an upper layer holding
+``TRANSPARENT`` show the layers below it; pixels left transparent by every
+visible layer show as blank. The bottom layer is the board's original canvas,
+which starts blank rather than transparent.
+
+The composite is a canvas of its own, kept up to date incrementally: on
+``refresh`` the rows each layer reports dirty are composited again, top layer
+first, stopping as soon as the span is opaque, and only the pixels that
+actually changed are written to the composite, so renderers of the composite
+redraw nothing else. Layers remember the bounding box of everything written
+to them and are skipped outside it, which keeps the cost of a refresh
+following the changed area rather than the number of layers.
+"""
+import re
+
+from src.canvas import Canvas
+from src.deferred import apply_writes
+from src.exceptions import LayerError
+from src.history import encode_runs
+
+TRANSPARENT = '\0'
+
+_TRANSPARENT_RUN = re.compile(TRANSPARENT + '+')
+
+
+class Layer:
+
+    def __init__(self, name: str, canvas: Canvas):
+        self.name = name
+        self.canvas = canvas
+        self.visible = True
+        # 0-based inclusive bounding box of the pixels written so far, None if blank
+        self.extent = None
+
+    def _extend(self, left: int, top: int, right: int, bottom: int):
+        if self.extent is not None:
+            old_left, old_top, old_right, old_bottom = self.extent
+            left, top = min(left, old_left), min(top, old_top)
+            right, bottom = max(right, old_right), max(bottom, old_bottom)
+        self.extent = left, top, right, bottom
+
+
+class LayerStack:
+    """The layers of a board, from bottom to top, and their composite."""
+
+    def __init__(self, base: Canvas, storage='list'):
+        self.storage = storage
+        layer = Layer('base', base)
+        layer.extent = 0, 0, base.width - 1, base.height - 1
+        self.layers = [layer]
+        # With a single layer the composite holds the base pixels: start it as a
+        # copy-on-write fork of the base, so nothing is copied until either is written
+        self.composite = base.fork()
+        base.take_dirty()
+
+    def __len__(self) -> int:
+        return len(self.layers)
+
+    def find(self, name: str):
+        """The layer called name, or None."""
+        for layer in self.layers:
+            if layer.name == name:
+                return layer
+        return None
+
+    def get(self, name: str) -> Layer:
+        layer = self.find(name)
+        if layer is None:
+            raise LayerError(f"No layer named {name}")
+        return layer
+
+    def of(self, canvas: Canvas) -> Layer:
+        """The layer drawn on canvas."""
+        return next(layer for layer in self.layers if layer.canvas is canvas)
+
+    def add(self, name: str) -> Layer:
+        """Add a transparent layer on top of the others."""
+        width, height = self.composite.width, self.composite.height
+        canvas = Canvas(width, height, self.storage)
+        canvas.storage.fill_rect(0, 0, width, height, TRANSPARENT)
+        layer = Layer(name, canvas)
+        self.layers.append(layer)
+        return layer
+
+    def move(self, name: str, position: int):
+        """Move a layer to position, counted from 1 at the bottom."""
+        if not 1 <= position <= len(self.layers):
+            raise LayerError(f"Layer position must be between 1 and {len(self.layers)}")
+        layer = self.get(name)
+        self.layers.remove(layer)
+        self.layers.insert(position - 1, layer)
+        self._invalidate(layer)
+
+    def set_visible(self, name: str, visible: bool):
+        layer = self.get(name)
+        if layer.visible != visible:
+            layer.visible = visible
+            self._invalidate(layer)
+
+    def _invalidate(self, layer: Layer):
+        """Composite again everything the layer covers."""
+        if layer.extent is not None:
+            left, top, right, bottom = layer.extent
+            layer.canvas.mark_dirty(left + 1, top + 1, right + 1, bottom + 1)
+
+    def fork(self) -> 'LayerStack':
+        """A stack of forks of every layer and of the composite (see ``Canvas.fork``)."""
+        self.refresh()
+        stack = LayerStack.__new__(LayerStack)
+        stack.storage = self.storage
+        stack.layers = []
+        for layer in self.layers:
+            fork = Layer(layer.name, layer.canvas.fork())
+            fork.visible, fork.extent = layer.visible, layer.extent
+            stack.layers.append(fork)
+        stack.composite = self.composite.fork()
+        return stack
+
+    def refresh(self) -> Canvas:
+        """Composite the rows changed since the last refresh and return the composite."""
+        spans = {}
+        for layer in self.layers:
+            rows, rect = layer.canvas.take_dirty()
+            if rect is None:
+                continue
+            layer._extend(*rect)
+            left, right = rect[0], rect[2] + 1
+            for y in rows:
+                start, stop = spans.get(y, (left, right))
+                spans[y] = min(start, left), max(stop, right)
+        for y, (start, stop) in spans.items():
+            self._composite_span(y, start, stop)
+        return self.composite
+
+    def _composite_span(self, y: int, start: int, stop: int):
+        text = None
+        for layer in reversed(self.layers):
+            if not layer.visible or layer.extent is None:
+                continue
+            left, top, right, bottom = layer.extent
+            if not (top <= y <= bottom and left < stop and start <= right):
+                continue
+            part = layer.canvas.storage.row_text(y, start, stop)
+            text = part if text is None else _overlay(text, part)
+            if TRANSPARENT not in text:
+                break
+        text = ' ' * (stop - start) if text is None else text.replace(TRANSPARENT, ' ')
+
+        storage = self.composite.storage
+        if text == storage.row_text(y, start, stop):
+            return
+        x = start
+        for char, count in encode_runs(text):
+            if storage.row_text(y, x, x + count) != char * count:
+                self.composite._write_span(y, x, x + count, char)
+            x += count
+
+    def fill_view(self, canvas: Canvas, x: int, y: int, char: str, fill, stats=None):
+        """Paint on canvas the region of the composite holding (x, y), found with the fill engine fill."""
+        view = self.refresh().fork()
+        writes = _Writes()
+        view.observers.append(writes)
+        fill(view, x, y, char, stats=stats)
+        apply_writes(canvas, writes)
+
+
+class _Writes(list):
+    """Canvas observer listing the writes as ``(left, top, right, bottom, char)``."""
+
+    def before_write(self, left: int, top: int, right: int, bottom: int, char: str):
+        self.append((left, top, right, bottom, char))
+
+
+def _overlay(upper: str, lower: str) -> str:
+    """upper with its transparent pixels taken from lower."""
+    parts = []
+    position = 0
+    for match in _TRANSPARENT_RUN.finditer(upper):
+        parts.append(upper[position:match.start()])
+        parts.append(lower[match.start():match.end()])
+        position = match.end()
+    parts.append(upper[position:])
+    return ''.join(parts)
@@ -0,0 +1,176 @@
+"""Band-parallel execution of line and rectangle commands.
+
+While a board is attached to a ``ParallelExecutor``, its canvas pixels live in
+``multiprocessing.shared_memory`` as one 32-bit code point per pixel. Line
+and rectangle commands are validated as usual but only queued as rectangle
+writes. On ``flush`` the canvas is cut into horizontal bands, every queued
+write is clipped to the bands it touches and a process pool draws the bands
+concurrently. Each band applies its writes in command order and bands never
+overlap, so the result is the same as drawing sequentially.
+
+A bucket fill can spread across bands, so it acts as a barrier: the queued
+writes are flushed and the fill runs in this process on the shared pixels.
+Commands drawn by the pool bypass canvas observers, so they are not recorded
+in undo history.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import shared_memory
+
+from src.deferred import line_writes, rectangle_writes
+from src.history import encode_runs
+from src.storage import WideStorage
+
+# Shared canvases attached by this worker process: name -> (memory, storage)
+_attached = {}
+
+
+def _shared_storage(memory, width: int, height: int) -> WideStorage:
+    return WideStorage(width, height, buffer=memory.buf.cast('I'))
+
+
+def _release(memory, storage: WideStorage):
+    # Views into the shared memory must be released before it can be closed
+    storage.view.release()
+    storage.buffer.release()
+    memory.close()
+
+
+def _draw_band(name: str, width: int, height: int, writes: list):
+    """Pool task: apply rectangle writes, already clipped to one band."""
+    if name not in _attached:
+        for memory, storage in _attached.values():
+            _release(memory, storage)
+        _attached.clear()
+        memory = shared_memory.SharedMemory(name=name)
+        _attached[name] = memory, _shared_storage(memory, width, height)
+    storage = _attached[name][1]
+    for left, top, right, bottom, char in writes:
+        storage.fill_rect(left, top, right, bottom, char)
+
+
+class ParallelExecutor:
+    """Draws the line and rectangle commands of a board with a process pool.
+
+    ``workers`` defaults to the number of CPUs; the canvas is split into as
+    many bands. Queued writes are flushed automatically once ``max_pending``
+    of them are waiting. Call ``close`` (or use the executor as a context
+    manager) to move the canvas back to its own storage and stop the pool.
+    """
+
+    def __init__(self, workers: int = None, max_pending: int = 100_000):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.pool = None
+        self.memory = None
+        self.canvas = None
+        self.storage = None
+        self.pending = []
+
+    def submit(self, board, cmd: str, params: tuple):
+        """Execute an L, R or B command on the board."""
+        board._ensure_canvas()
+        if cmd == 'B':
+            board.canvas.valid_point(*params[:2])
+            self._own_storage(board).encode(params[2])
+            self.flush()
+            board.bucket_fill(*params)
+            return
+        if cmd == 'L':
+            board._validate_line(*params[:4])
+            writes = line_writes(*params)
+        elif cmd == 'R':
+            writes = rectangle_writes(*board._validate_rectangle(*params[:4]), params[4])
+        else:
+            raise ValueError(f"Only L, R and B commands can be run in parallel, not {cmd}")
+        # The shared pixels take any character; the canvas must get back only what it can hold
+        self._own_storage(board).encode(params[-1])
+        self.attach(board)
+        self.pending.extend(writes)
+        if len(self.pending) >= self.max_pending:
+            self.flush()
+
+    def _own_storage(self, board):
+        """The storage the board's canvas has when it is not attached."""
+        return self.storage if board.canvas is self.canvas else board.canvas.storage
+
+    def attach(self, board):
+        """Move the board's canvas pixels into shared memory, if not done yet."""
+        board.flush()
+        canvas = board.canvas
+        if canvas is self.canvas:
+            return
+        self.detach()
+
+        width, height = canvas.width, canvas.height
+        self.memory = shared_memory.SharedMemory(create=True, size=width * height * 4)
+        shared = _shared_storage(self.memory, width, height)
+        for y, row in enumerate(canvas.iter_rows()):
+            shared.view[y * width:(y + 1) * width] = memoryview(row.encode(WideStorage.encoding)).cast('I')
+        self.canvas, self.storage = canvas, canvas.storage
+        canvas.storage = shared
+
+    def detach(self):
+        """Flush and move the attached canvas back to its own storage."""
+        if self.canvas is None:
+            return
+        canvas, shared = self.canvas, self.canvas.storage
+        try:
+            self.flush()
+            for y in range(canvas.height):
+                row = shared.row_text(y)
+                if row == self.storage.row_text(y):
+                    continue
+                x = 0
+                for char, count in encode_runs(row):
+                    self.storage.fill_span(y, x, x + count, char)
+                    x += count
+        finally:
+            canvas.storage = self.storage
+            self.pending = []
+            _release(self.memory, shared)
+            self.memory.unlink()
+            self.memory = self.canvas = self.storage = None
+
+    def flush(self):
+        """Draw the queued writes."""
+        if not self.pending:
+            return
+        writes, self.pending = self.pending, []
+        canvas = self.canvas
+        band_height = -(-canvas.height // self.workers)
+        bands = []
+        for band_top in range(0, canvas.height, band_height):
+            band_bottom = min(band_top + band_height, canvas.height)
+            clipped = [(left, max(top, band_top), right, min(bottom, band_bottom), char)
+                       for left, top, right, bottom, char in writes if top < band_bottom and bottom > band_top]
+            if clipped:
+                bands.append(clipped)
+
+        if len(bands) == 1:
+            for left, top, right, bottom, char in bands[0]:
+                canvas.storage.fill_rect(left, top, right, bottom, char)
+        else:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(self.workers)
+            draw = partial(_draw_band, self.memory.name, canvas.width, canvas.height)
+            list(self.pool.map(draw, bands))
+
+        for left, top, right, bottom, _ in writes:
+            canvas.mark_dirty(left + 1, top + 1, right, bottom)
+
+    def close(self):
+        try:
+            self.detach()
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
+
+    def __enter__(self) -> 'ParallelExecutor':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
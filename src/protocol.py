@@ -0,0 +1,146 @@
+"""Binary command files, decoded a whole buffer at a time.
+
+A binary command file is an 8-byte header followed by fixed-width records,
+one per command, with all integers little-endian:
+
+    header: magic b'DRWB' | version u16 | 2 reserved bytes
+    record: opcode u8 | flags u8 | 2 reserved bytes | a, b, c, d i32 | char u32
+
+``a`` to ``d`` hold the integer parameters in the order of the text command
+and ``char`` the code point of its character. For ``B`` flag 1 means
+``view``; for ``V`` the flags hold the number of parameters (0, 2 or 4) and
+for ``H`` flag 1 means a character is given.
+Layer commands, ``S file`` and ``E file`` have names of any length and can
+not be encoded.
+
+Decoding unpacks every record with ``struct.iter_unpack`` and builds the
+``(cmd, params)`` of ``runner.validate_params`` without going through text,
+checking what the fixed-width fields can still get wrong with the same
+messages as the text commands.
+"""
+import struct
+
+from src.exceptions import CommandError
+
+MAGIC = b'DRWB'
+VERSION = 1
+HEADER = struct.Struct('<4sH2x')
+# opcode, flags, a, b, c, d, char
+RECORD = struct.Struct('<BB2xiiiiI')
+
+OPCODES = {'C': 1, 'L': 2, 'R': 3, 'B': 4, 'U': 5, 'Z': 6, 'V': 7, 'P': 8, 'S': 9, 'Q': 10, 'H': 11}
+COMMANDS = {opcode: cmd for cmd, opcode in OPCODES.items()}
+
+_C, _L, _R, _B, _U, _Z, _V, _P, _S, _Q, _H = range(1, 12)
+_INVALID_CHARACTER = "Parameter c must be a character (length 1)"
+
+
+def encode_header() -> bytes:
+    return HEADER.pack(MAGIC, VERSION)
+
+
+def encode_command(cmd: str, params: tuple) -> bytes:
+    """The record of a command parsed by ``runner.parse_command``."""
+    if cmd not in OPCODES or cmd == 'S' and params:
+        name = 'name' if cmd == 'Y' else 'file'
+        raise CommandError(f"{cmd} {name} can not be encoded in a binary command file")
+    flags = 0
+    char = 0
+    match cmd:
+        case 'L' | 'R':
+            *numbers, c = params
+            char = ord(c)
+        case 'B':
+            x, y, c, *view = params
+            numbers, char, flags = (x, y), ord(c), 1 if view else 0
+        case 'V':
+            numbers, flags = params, len(params)
+        case 'H':
+            numbers, flags, char = (), len(params), ord(params[0]) if params else 0
+        case _:
+            numbers = params
+    numbers = (*numbers, 0, 0, 0, 0)[:4]
+    try:
+        return RECORD.pack(OPCODES[cmd], flags, *numbers, char)
+    except struct.error:
+        raise CommandError("Coordinates must fit in 32-bit integers")
+
+
+def encode_commands(commands) -> bytes:
+    """A binary command file holding an iterable of ``(cmd, params)``."""
+    return encode_header() + b''.join(encode_command(cmd, params) for cmd, params in commands)
+
+
+def _records(data) -> memoryview:
+    view = memoryview(data)
+    if len(view) < HEADER.size:
+        raise CommandError("Binary command file is too short")
+    magic, version = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise CommandError("Not a binary command file")
+    if version != VERSION:
+        raise CommandError(f"Unsupported binary command file version: {version}")
+    records = view[HEADER.size:]
+    if len(records) % RECORD.size:
+        raise CommandError("Binary command file ends with a partial command")
+    return records
+
+
+def decode_commands(data):
+    """Yield ``(cmd, params, error)`` for every record of a binary command file.
+
+    ``error`` is None for valid records. A record that fails validation
+    yields the CommandError the text command would raise, with ``params``
+    None, so the caller can report it and go on. A buffer that is not a
+    binary command file raises CommandError before anything is yielded.
+    """
+    records = _records(data)
+    for opcode, flags, a, b, c, d, char in RECORD.iter_unpack(records):
+        # Most common commands first
+        try:
+            if opcode == _L:
+                yield 'L', (a, b, c, d, chr(char)), None
+            elif opcode == _R:
+                yield 'R', (a, b, c, d, chr(char)), None
+            elif opcode == _B:
+                if flags == 0:
+                    yield 'B', (a, b, chr(char)), None
+                elif flags == 1:
+                    yield 'B', (a, b, chr(char), True), None
+                else:
+                    yield 'B', None, CommandError("B requires 3 parameters: x y c, optionally followed by view")
+            elif opcode == _C:
+                yield 'C', (a, b), None
+            elif opcode == _P or opcode == _S or opcode == _Q:
+                yield COMMANDS[opcode], (), None
+            elif opcode == _U or opcode == _Z:
+                if a > 0:
+                    yield COMMANDS[opcode], (a,), None
+                else:
+                    yield COMMANDS[opcode], None, CommandError("Steps must be a positive integer")
+            elif opcode == _V:
+                yield 'V', *_viewport(flags, a, b, c, d)
+            elif opcode == _H:
+                if flags == 0:
+                    yield 'H', (), None
+                elif flags == 1:
+                    yield 'H', (chr(char),), None
+                else:
+                    yield 'H', None, CommandError("H takes at most 1 parameter: c")
+            else:
+                yield None, None, CommandError(f"Unknown command: opcode {opcode}")
+        except ValueError:
+            # chr of a number that is not a code point
+            yield COMMANDS[opcode], None, CommandError(_INVALID_CHARACTER)
+
+
+def _viewport(flags: int, x: int, y: int, width: int, height: int) -> tuple:
+    if flags == 0:
+        return (), None
+    if flags == 2:
+        return (x, y), None
+    if flags != 4:
+        return None, CommandError("V takes no parameters, dx dy or x y width height")
+    if width <= 0 or height <= 0:
+        return None, CommandError("Viewport size must be positive integers")
+    return (x, y, width, height), None
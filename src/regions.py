@@ -0,0 +1,188 @@
+"""An index of the 4-connected same-character regions of a canvas.
+
+Every row is partitioned into spans ``[start, stop, rid]`` sorted by start.
+Region ids are merged with union-find and each root keeps the list of spans
+of its region, so a bucket fill is a rewrite of known spans instead of a
+search. The index is built lazily on first use and then kept up to date as a
+canvas observer: a write only relabels the regions it touches, merging or
+splitting them as needed.
+"""
+from bisect import bisect_right
+from operator import itemgetter
+
+from src.history import encode_runs
+
+_start = itemgetter(0)
+
+
+class RegionIndex:
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.rows = [[] for _ in range(canvas.height)]
+        self.parent = {}
+        self.members = {}
+        self.chars = {}
+        # Cached neighbour region ids, per root, for regions already filled
+        self.borders = {}
+        self.next_id = 0
+        # Nothing is labelled yet: the whole canvas is pending
+        self.pending = [(0, 0, canvas.width, canvas.height)]
+        self.suspended = False
+
+    def before_write(self, left: int, top: int, right: int, bottom: int, char: str):
+        if not self.suspended:
+            self.pending.append((left, top, right, bottom))
+
+    def invalidate(self, left: int, top: int, right: int, bottom: int):
+        """Report pixels changed without going through the canvas write methods."""
+        self.pending.append((left, top, right, bottom))
+
+    def find(self, rid: int) -> int:
+        root = rid
+        while root in self.parent:
+            root = self.parent[root]
+        while rid != root:
+            self.parent[rid], rid = root, self.parent[rid]
+        return root
+
+    def union(self, first: int, second: int) -> int:
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return first
+        if len(self.members[first]) < len(self.members[second]):
+            first, second = second, first
+        self.members[first].extend(self.members.pop(second))
+        del self.chars[second]
+        self.borders.pop(first, None)
+        self.borders.pop(second, None)
+        self.parent[second] = first
+        return first
+
+    def region_at(self, x: int, y: int) -> int:
+        """The root id of the region holding the 0-based pixel (x, y)."""
+        self._refresh()
+        row = self.rows[y]
+        return self.find(row[bisect_right(row, x, key=_start) - 1][2])
+
+    def spans_at(self, x: int, y: int) -> list:
+        """The (y, start, stop) spans of the region holding the 0-based pixel (x, y)."""
+        return list(self.members[self.region_at(x, y)])
+
+    def region_count(self) -> int:
+        self._refresh()
+        return len(self.members)
+
+    def fill(self, x: int, y: int, char: str):
+        """Bucket fill the region holding the 0-based pixel (x, y) with char."""
+        root = self.region_at(x, y)
+        if self.chars[root] == char:
+            return
+        self.canvas.storage.encode(char)
+
+        spans = list(self.members[root])
+        self.suspended = True
+        try:
+            for span_y, start, stop in spans:
+                self.canvas._write_span(span_y, start, stop, char)
+        finally:
+            self.suspended = False
+        self.chars[root] = char
+
+        # The region may now touch regions of the same character
+        for rid in self._border(root):
+            if self.chars[self.find(rid)] == char:
+                root = self.union(root, rid)
+
+    def _border(self, root: int) -> set:
+        """The ids of the regions adjacent to a region, cached until one of them is relabelled."""
+        border = self.borders.get(root)
+        if border is None or any(self.find(rid) not in self.members for rid in border):
+            border = {self.find(neighbour[2]) for span_y, start, stop in self.members[root]
+                      for neighbour in self._neighbours(span_y, start, stop)}
+            border.discard(root)
+            self.borders[root] = border
+        return border
+
+    def _overlapping(self, y: int, start: int, stop: int):
+        row = self.rows[y]
+        index = max(bisect_right(row, start, key=_start) - 1, 0)
+        while index < len(row) and row[index][0] < stop:
+            if row[index][1] > start:
+                yield row[index]
+            index += 1
+
+    def _neighbours(self, y: int, start: int, stop: int):
+        """Spans 4-adjacent to the span [start, stop) of row y."""
+        for row_y in (y - 1, y + 1):
+            if 0 <= row_y < self.canvas.height:
+                yield from self._overlapping(row_y, start, stop)
+        if start > 0:
+            yield from self._overlapping(y, start - 1, start)
+        if stop < self.canvas.width:
+            yield from self._overlapping(y, stop, stop + 1)
+
+    def _refresh(self):
+        """Relabel the regions touched by pending writes."""
+        if not self.pending:
+            return
+        boxes, self.pending = self.pending, []
+
+        intervals = {}
+        affected = set()
+        for left, top, right, bottom in boxes:
+            for y in range(top, bottom):
+                intervals.setdefault(y, []).append((left, right))
+                for span in self._overlapping(y, left, right):
+                    affected.add(self.find(span[2]))
+
+        for root in affected:
+            for y, start, stop in self.members.pop(root):
+                intervals.setdefault(y, []).append((start, stop))
+            del self.chars[root]
+            self.borders.pop(root, None)
+
+        dropped = []
+        for y in intervals:
+            kept = []
+            for span in self.rows[y]:
+                (dropped if self.find(span[2]) in affected else kept).append(span)
+            self.rows[y] = kept
+        # Every id of the relabelled regions was the id of one of their spans
+        for span in dropped:
+            self.parent.pop(span[2], None)
+        for y in sorted(intervals):
+            self._label_row(y, _merge(intervals[y]))
+
+    def _label_row(self, y: int, intervals: list):
+        storage = self.canvas.storage
+        new_spans = []
+        for start, stop in intervals:
+            x = start
+            for char, count in encode_runs(storage.row_text(y, start, stop)):
+                rid = self.next_id
+                self.next_id += 1
+                self.members[rid] = [(y, x, x + count)]
+                self.chars[rid] = char
+                new_spans.append([x, x + count, rid])
+                x += count
+
+        row = self.rows[y]
+        row.extend(new_spans)
+        row.sort(key=_start)
+        for start, stop, rid in new_spans:
+            char = self.chars[self.find(rid)]
+            for neighbour in self._neighbours(y, start, stop):
+                if self.chars[self.find(neighbour[2])] == char:
+                    self.union(rid, neighbour[2])
+
+
+def _merge(intervals: list) -> list:
+    """Sort intervals and merge the overlapping or touching ones."""
+    merged = []
+    for start, stop in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], stop)
+        else:
+            merged.append([start, stop])
+    return merged
@@ -0,0 +1,206 @@
+"""Incremental rendering of a canvas inside a border frame."""
+
+ANSI_HOME_AND_CLEAR = '\x1b[H\x1b[2J'
+ANSI_CLEAR_BELOW = '\x1b[J'
+# Characters gathered before each write when streaming frames
+WRITE_CHUNK_SIZE = 1 << 16
+
+
+def ansi_move(row: int, column: int = 1) -> str:
+    """ANSI escape moving the cursor to a 1-based terminal row and column."""
+    return f'\x1b[{row};{column}H'
+
+
+def iter_frame(canvas):
+    """Yield the framed canvas line by line without building the whole frame."""
+    border = '-' * (canvas.width + 2)
+    yield border
+    for row in canvas.iter_rows():
+        yield '|' + row + '|'
+    yield border
+
+
+def write_chunks(lines, out, chunk_size: int = WRITE_CHUNK_SIZE) -> int:
+    """Write lines to out, each followed by a newline, in writes of about chunk_size characters.
+
+    Returns the number of characters written.
+    """
+    parts = []
+    pending = written = 0
+    for line in lines:
+        parts.append(line)
+        pending += len(line) + 1
+        if pending >= chunk_size:
+            parts.append('')
+            out.write('\n'.join(parts))
+            written += pending
+            parts, pending = [], 0
+    if parts:
+        parts.append('')
+        out.write('\n'.join(parts))
+        written += pending
+    return written
+
+
+def write_frame(canvas, out, chunk_size: int = WRITE_CHUNK_SIZE) -> int:
+    """Stream the framed canvas to the text file out, holding about chunk_size characters at a time.
+
+    Writes what ``Renderer.render`` returns followed by a newline, without
+    building the frame: memory stays bounded by the chunk size and a row, and
+    the first rows are written before the last are read.
+    """
+    return write_chunks(iter_frame(canvas), out, chunk_size)
+
+
+class Viewport:
+    """A window of width x height pixels whose top-left pixel is the 1-based (x, y).
+
+    The window is clipped to the canvas when rendered, so it stays valid when
+    the canvas is replaced by a smaller one.
+    """
+
+    def __init__(self, x: int, y: int, width: int, height: int):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    def bounds(self, canvas) -> tuple:
+        """The visible 1-based left, top, right and bottom pixels (inclusive)."""
+        left, top = min(self.x, canvas.width), min(self.y, canvas.height)
+        return left, top, min(left + self.width - 1, canvas.width), min(top + self.height - 1, canvas.height)
+
+    def scroll(self, dx: int, dy: int, canvas):
+        """Move the window, stopping at the canvas edges."""
+        self.x = max(1, min(self.x + dx, canvas.width - self.width + 1))
+        self.y = max(1, min(self.y + dy, canvas.height - self.height + 1))
+
+
+def render_viewport(canvas, viewport: Viewport) -> str:
+    """Render the part of the canvas inside viewport, with its coordinates.
+
+    Only the visible row slices are read, so the cost follows the viewport
+    area rather than the canvas size.
+    """
+    left, top, right, bottom = viewport.bounds(canvas)
+    margin = len(str(bottom))
+    border = ' ' * margin + '-' * (right - left + 3)
+    lines = [f"({left},{top})-({right},{bottom}) of {canvas.width}x{canvas.height}", border]
+    for y in range(top, bottom + 1):
+        lines.append(f"{y:>{margin}}|{canvas.row_slice(y, left, right)}|")
+    lines.append(border)
+    return '\n'.join(lines)
+
+
+class Renderer:
+    """Renders a canvas, caching one framed line per canvas row.
+
+    Only rows reported dirty by the canvas since the previous render are
+    joined again; switching to another canvas rebuilds the whole cache.
+    """
+
+    def __init__(self):
+        self.canvas = None
+        self.lines = []
+        self.frame = None
+
+    def _sync(self, canvas) -> list:
+        """Bring the row cache up to date and return the 0-based rows that changed.
+
+        Returns None when the whole frame was rebuilt.
+        """
+        if canvas is not self.canvas:
+            canvas.take_dirty()
+            self.canvas = canvas
+            self.lines = ['|' + row + '|' for row in canvas.iter_rows()]
+            self.frame = None
+            return None
+
+        dirty_rows, _ = canvas.take_dirty()
+        changed = sorted(dirty_rows)
+        for y in changed:
+            self.lines[y] = '|' + canvas.storage.row_text(y) + '|'
+        if changed:
+            self.frame = None
+        return changed
+
+    def rebind(self, canvas):
+        """Keep the cache for canvas, a copy of the cached canvas reporting its differences as dirty."""
+        self.canvas = canvas
+
+    def render(self, canvas) -> str:
+        """Return the full framed canvas."""
+        self._sync(canvas)
+        if self.frame is None:
+            border = '-' * (canvas.width + 2)
+            self.frame = '\n'.join([border] + self.lines + [border])
+        return self.frame
+
+    def render_diff(self, canvas) -> str:
+        """Return ANSI output updating a terminal that shows the previous frame.
+
+        The frame is drawn from the top-left corner of the terminal. Only rows
+        changed since the previous render are rewritten, then the cursor is
+        left on the line below the frame.
+        """
+        changed = self._sync(canvas)
+        if changed is None:
+            return ANSI_HOME_AND_CLEAR + self.render(canvas) + '\n'
+
+        # Terminal row 1 holds the top border, so canvas row y is on row y + 2
+        parts = [ansi_move(y + 2) + self.lines[y] for y in changed]
+        parts.append(ansi_move(canvas.height + 3) + ANSI_CLEAR_BELOW)
+        return ''.join(parts)
+
+
+class Snapshot:
+    """A fork of the canvas a board showed, the canvas it was forked from and the viewport.
+
+    The fork's dirty rows hold the rows of the source changed since the previous
+    snapshot of it (see ``DrawingBoard.snapshot``).
+    """
+
+    def __init__(self, canvas, source, viewport: Viewport = None):
+        self.canvas = canvas
+        self.source = source
+        self.viewport = viewport
+
+
+class SnapshotRenderer:
+    """Renders a sequence of snapshots, some of which may be skipped.
+
+    Successive snapshots of one source are rendered incrementally: the rows
+    changed since the last rendered snapshot, including those reported by
+    skipped ones, are the only rows joined again.
+    """
+
+    def __init__(self, diff: bool = False):
+        self.diff = diff
+        self.renderer = Renderer()
+        # The source of the snapshot in the renderer cache, None when it must be rebuilt
+        self.source = None
+        self.changed = set()
+
+    def skip(self, snapshot: Snapshot):
+        if snapshot.source is self.source:
+            self.changed |= snapshot.canvas.dirty_rows
+        else:
+            self.source = None
+
+    def render(self, snapshot: Snapshot) -> str:
+        """The frame of snapshot, or with ``diff`` the ANSI output updating the previous one."""
+        self.skip(snapshot)
+        canvas = snapshot.canvas
+        if snapshot.viewport is not None:
+            # The terminal no longer shows the cached frame
+            self.source = None
+            frame = render_viewport(canvas, snapshot.viewport)
+            return ANSI_HOME_AND_CLEAR + frame + '\n' if self.diff else frame + '\n'
+
+        if self.source is not None:
+            canvas.dirty_rows, canvas.dirty_rect = self.changed, None
+            self.renderer.rebind(canvas)
+        self.source, self.changed = snapshot.source, set()
+        if self.diff:
+            return self.renderer.render_diff(canvas)
+        return self.renderer.render(canvas) + '\n'
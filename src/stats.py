@@ -0,0 +1,193 @@
+"""Opt-in instrumentation of a drawing session.
+
+A ``Stats`` object given to ``DrawingBoard(stats=...)`` records, per board
+operation, a latency histogram and the number of pixels written, plus the
+pixels visited and the peak stack depth of bucket fills and the size of
+rendered frames. Boards without stats skip all of it.
+
+Every ``profile_every``-th top-level operation can also be run under ``cProfile``
+(accumulated into ``profile``) and, with ``trace_memory``, under
+``tracemalloc`` to record its peak allocation.
+"""
+import cProfile
+import json
+import pstats
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+
+class LatencyHistogram:
+    """Latencies in power-of-two microsecond buckets: bucket k holds [2**(k-1), 2**k) us."""
+
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds: float):
+        self.buckets[int(seconds * 1e6).bit_length()] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, percent: float) -> float:
+        """Upper bound, in seconds, of the bucket holding the given percentile."""
+        rank = percent / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min((1 << bucket) / 1e6, self.max)
+        return self.max or 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'total_ms': round(self.total * 1e3, 3),
+            'mean_us': round(self.total / self.count * 1e6, 1) if self.count else 0,
+            'min_us': round((self.min or 0) * 1e6, 1),
+            'max_us': round((self.max or 0) * 1e6, 1),
+            'p50_us': round(self.percentile(50) * 1e6, 1),
+            'p99_us': round(self.percentile(99) * 1e6, 1),
+            'buckets_us': {f'<{1 << bucket}': count for bucket, count in sorted(self.buckets.items())},
+        }
+
+
+class FillStats:
+    """Counters updated by the fill engines."""
+
+    def __init__(self):
+        self.fills = 0
+        self.visited = 0
+        self.peak_depth = 0
+
+
+class Stats:
+
+    def __init__(self, profile_every: int = 0, trace_memory: bool = False):
+        self.profile_every = profile_every
+        self.trace_memory = trace_memory
+        self.latency = {}
+        self.pixels = Counter()
+        self.fill = FillStats()
+        self.render_bytes = 0
+        self.memory_peaks = {}
+        self.profile = None
+        self.measured = 0
+        self.depth = 0
+        self.started_tracing = False
+
+    @contextmanager
+    def measure(self, name: str, canvas=None):
+        """Time the block as one name operation and count the pixels it writes to canvas.
+
+        The pixels written by a block that raises are not counted: a failed
+        command's writes are rolled back when it keeps history.
+        """
+        counter = None
+        if canvas is not None:
+            counter = _PixelCounter()
+            canvas.observers.append(counter)
+        self.depth += 1
+        sampled = False
+        if self.depth == 1:
+            # Only top-level operations count towards the sampling interval
+            self.measured += 1
+            sampled = self.profile_every and self.measured % self.profile_every == 0
+        if sampled:
+            profiler = self._start_sample()
+        start = time.perf_counter()
+        completed = False
+        try:
+            yield
+            completed = True
+        finally:
+            elapsed = time.perf_counter() - start
+            if sampled:
+                self._stop_sample(name, profiler)
+            self.depth -= 1
+            if counter is not None:
+                canvas.observers.remove(counter)
+                if completed:
+                    self.pixels[name] += counter.pixels
+            self.latency.setdefault(name, LatencyHistogram()).record(elapsed)
+
+    def _start_sample(self) -> cProfile.Profile:
+        if self.trace_memory:
+            # Leave tracing started by someone else running
+            self.started_tracing = not tracemalloc.is_tracing()
+            if self.started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _stop_sample(self, name: str, profiler: cProfile.Profile):
+        profiler.disable()
+        if self.profile is None:
+            self.profile = pstats.Stats(profiler)
+        else:
+            self.profile.add(profiler)
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            if self.started_tracing:
+                tracemalloc.stop()
+            self.memory_peaks[name] = max(self.memory_peaks.get(name, 0), peak)
+
+    def record_render(self, frame: str):
+        self.render_bytes += len(frame.encode('utf-8'))
+
+    def profile_rows(self, limit: int = 20) -> list:
+        """The sampled functions with the most cumulative time."""
+        if self.profile is None:
+            return []
+        rows = sorted(self.profile.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return [{'function': f'{filename}:{line}({function})', 'calls': calls,
+                 'total_ms': round(total * 1e3, 3), 'cumulative_ms': round(cumulative * 1e3, 3)}
+                for (filename, line, function), (_, calls, total, cumulative, _) in rows]
+
+    def to_dict(self) -> dict:
+        return {
+            'operations': {name: {**histogram.to_dict(), 'pixels_written': self.pixels[name]}
+                           for name, histogram in sorted(self.latency.items())},
+            'pixels_written': sum(self.pixels.values()),
+            'fill': {'fills': self.fill.fills, 'pixels_visited': self.fill.visited,
+                     'peak_stack_depth': self.fill.peak_depth},
+            'render_bytes': self.render_bytes,
+            'memory_peak_bytes': dict(sorted(self.memory_peaks.items())),
+            'profile': self.profile_rows(),
+        }
+
+    def dump(self, path: str):
+        with open(path, 'w', encoding='utf-8') as stats_file:
+            json.dump(self.to_dict(), stats_file, indent=2)
+
+    def report(self) -> str:
+        """A human readable summary, one operation per line."""
+        lines = [f"{'operation':<16}{'count':>8}{'mean us':>11}{'p50 us':>10}{'p99 us':>10}{'max us':>11}{'pixels':>12}"]
+        for name, histogram in sorted(self.latency.items()):
+            summary = histogram.to_dict()
+            lines.append(f"{name:<16}{summary['count']:>8}{summary['mean_us']:>11}{summary['p50_us']:>10}"
+                         f"{summary['p99_us']:>10}{summary['max_us']:>11}{self.pixels[name]:>12}")
+        lines.append(f"fills: {self.fill.fills}, pixels visited: {self.fill.visited}, "
+                     f"peak stack depth: {self.fill.peak_depth}")
+        lines.append(f"rendered bytes: {self.render_bytes}")
+        for name, peak in sorted(self.memory_peaks.items()):
+            lines.append(f"peak memory of sampled {name}: {peak} bytes")
+        return '\n'.join(lines)
+
+
+class _PixelCounter:
+    """Canvas observer counting the pixels written."""
+
+    def __init__(self):
+        self.pixels = 0
+
+    def before_write(self, left: int, top: int, right: int, bottom: int, char: str):
+        self.pixels += (right - left) * (bottom - top)
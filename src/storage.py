@@ -0,0 +1,825 @@
+"""Pixel storage backends for Canvas.
+
+Backends use 0-based coordinates and perform no bounds checks; Canvas
+validates points before delegating to them.
+
+Each backend exposes its rows in two forms:
+
+* ``pixels`` - a row-major sequence of mutable rows of one-character strings,
+  the historical ``Canvas.pixels`` layout.
+* ``cells(y)`` - the raw values of row ``y`` as stored by the backend, with
+  ``encode`` converting a character to a raw value. Hot loops such as the
+  flood fill compare raw values to avoid building strings per pixel.
+  Backends without contiguous rows do not provide ``cells`` and implement
+  ``span_fill(canvas, x, y, target, char)`` instead.
+
+``fill_span(y, start, stop, char)``, ``fill_column(x, start, stop, char)`` and
+``fill_rect(left, top, right, bottom, char)`` write a horizontal run, a
+vertical run or a rectangle of one character in a single operation; ``stop``,
+``right`` and ``bottom`` are exclusive. ``row_text(y, start, stop)`` reads a row, or a slice
+of it, as a string.
+
+``fork()`` returns a storage holding the same pixels that shares rows, tiles
+or the whole buffer with this one; whichever storage writes to a shared part
+first copies it, so the two stay independent. Forking costs O(height) at most
+and no pixel memory until writes happen.
+"""
+import copy
+import sys
+import weakref
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
+
+from src.exceptions import UnsupportedCharacterError
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional, the 'numpy' backend falls back to WideStorage
+    numpy = None
+
+# Pixels decoded at once by backends that convert whole blocks of rows
+ROW_BLOCK_CELLS = 1 << 20
+
+
+class ListStorage:
+    """One list of single-character strings per row."""
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.rows = [[' '] * width for _ in range(height)]
+        # One flag per row still shared with a fork, None if never forked
+        self.shared = None
+
+    @property
+    def pixels(self) -> list:
+        # Writes through the rows can not be tracked, so shared rows are copied first
+        if self.shared is not None:
+            self.rows = [row[:] if shared else row for row, shared in zip(self.rows, self.shared)]
+            self.shared = None
+        return self.rows
+
+    def fork(self) -> 'ListStorage':
+        fork = copy.copy(self)
+        fork.rows = list(self.rows)
+        self.shared = bytearray(b'\x01') * self.height
+        fork.shared = bytearray(self.shared)
+        return fork
+
+    def _row(self, y: int) -> list:
+        """Row y, copied first if it is shared with a fork."""
+        if self.shared is not None and self.shared[y]:
+            self.shared[y] = 0
+            self.rows[y] = self.rows[y][:]
+        return self.rows[y]
+
+    def encode(self, char: str) -> str:
+        return char
+
+    def cells(self, y: int) -> list:
+        return self.rows[y]
+
+    def get(self, x: int, y: int) -> str:
+        return self.rows[y][x]
+
+    def set(self, x: int, y: int, char: str):
+        self._row(y)[x] = char
+
+    def fill_span(self, y: int, start: int, stop: int, char: str):
+        self._row(y)[start:stop] = [char] * (stop - start)
+
+    def fill_column(self, x: int, start: int, stop: int, char: str):
+        rows = self.rows[start:stop] if self.shared is None else map(self._row, range(start, stop))
+        for row in rows:
+            row[x] = char
+
+    def fill_rect(self, left: int, top: int, right: int, bottom: int, char: str):
+        run = [char] * (right - left)
+        rows = self.rows[top:bottom] if self.shared is None else map(self._row, range(top, bottom))
+        for row in rows:
+            row[left:right] = run
+
+    def row_text(self, y: int, start: int = 0, stop: int = None) -> str:
+        return ''.join(self.rows[y][start:stop])
+
+
+def _share(storage, owners: list):
+    """Count storage among the users of a buffer until it copies it or is collected."""
+    owners[0] += 1
+    storage.owners = owners
+    storage.release = weakref.finalize(storage, _drop_owner, owners)
+
+
+def _drop_owner(owners: list):
+    owners[0] -= 1
+
+
+class _BufferStorage:
+    """Row-major pixels in one contiguous buffer of fixed-size cells.
+
+    An existing buffer, such as a memory-mapped file, can be passed in instead
+    of allocating one; it must hold exactly width * height cells.
+
+    Forks share the whole buffer, counting its users in ``owners``; a storage
+    writing to a buffer it does not own alone copies it first, and a storage
+    that is dropped, or copies the buffer, stops counting. Writes to an
+    external buffer have to stay in place, so forking one copies it at once.
+    """
+
+    encoding = None
+
+    def __init__(self, width: int, height: int, buffer=None):
+        self.width = width
+        self.height = height
+        self.external = buffer is not None
+        self.buffer = self._allocate(width * height) if buffer is None else buffer
+        self.view = memoryview(self.buffer)
+        if len(self.view) != width * height:
+            raise ValueError(f"Buffer holds {len(self.view)} cells, expected {width * height}")
+        _share(self, [0])
+
+    def _allocate(self, size: int):
+        raise NotImplementedError
+
+    def fork(self) -> '_BufferStorage':
+        fork = copy.copy(self)
+        fork.external = False
+        if self.external:
+            fork._copy_buffer()
+        else:
+            _share(fork, self.owners)
+        return fork
+
+    def _own(self):
+        """Copy the buffer if a fork still uses it."""
+        if self.owners[0] > 1:
+            self.release()
+            self._copy_buffer()
+
+    def _copy_buffer(self):
+        buffer = self._allocate(self.width * self.height)
+        memoryview(buffer)[:] = self.view
+        self.buffer, self.view = buffer, memoryview(buffer)
+        _share(self, [0])
+
+    @property
+    def pixels(self) -> 'RowsView':
+        return RowsView(self)
+
+    def encode(self, char: str) -> int:
+        return ord(char)
+
+    def cells(self, y: int) -> memoryview:
+        return self.view[y * self.width:(y + 1) * self.width]
+
+    def get(self, x: int, y: int) -> str:
+        return chr(self.view[y * self.width + x])
+
+    def set(self, x: int, y: int, char: str):
+        code = self.encode(char)
+        self._own()
+        self.view[y * self.width + x] = code
+
+    def fill_span(self, y: int, start: int, stop: int, char: str):
+        run = self._repeat(self.encode(char), stop - start)
+        self._own()
+        offset = y * self.width
+        self.view[offset + start:offset + stop] = run
+
+    def fill_column(self, x: int, start: int, stop: int, char: str):
+        run = self._repeat(self.encode(char), stop - start)
+        self._own()
+        width = self.width
+        self.view[start * width + x:(stop - 1) * width + x + 1:width] = run
+
+    def fill_rect(self, left: int, top: int, right: int, bottom: int, char: str):
+        run = self._repeat(self.encode(char), right - left)
+        self._own()
+        for offset in range(top * self.width, bottom * self.width, self.width):
+            self.view[offset + left:offset + right] = run
+
+    def _repeat(self, code: int, count: int):
+        raise NotImplementedError
+
+    def row_text(self, y: int, start: int = 0, stop: int = None) -> str:
+        return self.cells(y)[start:stop].tobytes().decode(self.encoding)
+
+
+class ByteStorage(_BufferStorage):
+    """One byte per pixel, limited to Latin-1 characters."""
+
+    encoding = 'latin-1'
+
+    def _allocate(self, size: int) -> bytearray:
+        return bytearray(b' ') * size
+
+    def _repeat(self, code: int, count: int) -> bytes:
+        return bytes((code,)) * count
+
+    def encode(self, char: str) -> int:
+        code = ord(char)
+        if code > 0xFF:
+            raise UnsupportedCharacterError(f"Character {char!r} can not be stored in a byte canvas")
+        return code
+
+
+class WideStorage(_BufferStorage):
+    """One unsigned 32-bit code point per pixel, for any character."""
+
+    encoding = 'utf-32-le' if sys.byteorder == 'little' else 'utf-32-be'
+
+    def _allocate(self, size: int) -> array:
+        return array('I', [ord(' ')]) * size
+
+    def _repeat(self, code: int, count: int) -> array:
+        return array('I', [code]) * count
+
+
+class TiledStorage:
+    """Square tiles allocated lazily, for huge and mostly uniform canvases.
+
+    A tile is either a single character shared by all of its pixels (a uniform
+    tile, blank tiles are not stored at all) or a list of character rows once
+    pixels with different characters are written to it. Rectangles covering
+    whole tiles and flood fills over uniform tiles only replace the tile entry.
+    Forks share the character rows of the tiles in ``shared`` until written.
+    """
+
+    def __init__(self, width: int, height: int, tile_size: int = 64):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.tiles = {}
+        self.shared = set()
+
+    def fork(self) -> 'TiledStorage':
+        fork = copy.copy(self)
+        fork.tiles = dict(self.tiles)
+        self.shared = {key for key, tile in self.tiles.items() if not isinstance(tile, str)}
+        fork.shared = set(self.shared)
+        return fork
+
+    @property
+    def pixels(self) -> 'RowsView':
+        return RowsView(self)
+
+    def encode(self, char: str) -> str:
+        return char
+
+    def _bounds(self, tx: int, ty: int) -> tuple:
+        """The 0-based left, top, right and bottom (exclusive) pixels of a tile."""
+        size = self.tile_size
+        return tx * size, ty * size, min((tx + 1) * size, self.width), min((ty + 1) * size, self.height)
+
+    def _tile(self, tx: int, ty: int):
+        return self.tiles.get((tx, ty), ' ')
+
+    def _materialize(self, tx: int, ty: int) -> list:
+        tile = self._tile(tx, ty)
+        if isinstance(tile, str):
+            left, top, right, bottom = self._bounds(tx, ty)
+            tile = [[tile] * (right - left) for _ in range(bottom - top)]
+            self.tiles[tx, ty] = tile
+        elif (tx, ty) in self.shared:
+            self.shared.discard((tx, ty))
+            tile = [row[:] for row in tile]
+            self.tiles[tx, ty] = tile
+        return tile
+
+    def _set_uniform(self, tx: int, ty: int, char: str):
+        if char == ' ':
+            self.tiles.pop((tx, ty), None)
+        else:
+            self.tiles[tx, ty] = char
+
+    def _segments(self, start: int, stop: int):
+        """Split [start, stop) at tile boundaries into (tile index, start, stop) triples."""
+        size = self.tile_size
+        while start < stop:
+            index = start // size
+            end = min(stop, (index + 1) * size)
+            yield index, start, end
+            start = end
+
+    def get(self, x: int, y: int) -> str:
+        size = self.tile_size
+        tile = self._tile(x // size, y // size)
+        if isinstance(tile, str):
+            return tile
+        return tile[y % size][x % size]
+
+    def set(self, x: int, y: int, char: str):
+        size = self.tile_size
+        tile = self._tile(x // size, y // size)
+        if tile != char:
+            self._materialize(x // size, y // size)[y % size][x % size] = char
+
+    def fill_span(self, y: int, start: int, stop: int, char: str):
+        size = self.tile_size
+        ty = y // size
+        for tx, seg_start, seg_stop in self._segments(start, stop):
+            if self._tile(tx, ty) != char:
+                offset = tx * size
+                self._materialize(tx, ty)[y % size][seg_start - offset:seg_stop - offset] = [char] * (seg_stop - seg_start)
+
+    def fill_column(self, x: int, start: int, stop: int, char: str):
+        size = self.tile_size
+        tx = x // size
+        for ty, seg_start, seg_stop in self._segments(start, stop):
+            if self._tile(tx, ty) != char:
+                tile = self._materialize(tx, ty)
+                for y in range(seg_start, seg_stop):
+                    tile[y % size][x % size] = char
+
+    def fill_rect(self, left: int, top: int, right: int, bottom: int, char: str):
+        for ty, seg_top, seg_bottom in self._segments(top, bottom):
+            for tx, seg_left, seg_right in self._segments(left, right):
+                tile_left, tile_top, tile_right, tile_bottom = self._bounds(tx, ty)
+                if (seg_left, seg_top, seg_right, seg_bottom) == (tile_left, tile_top, tile_right, tile_bottom):
+                    self._set_uniform(tx, ty, char)
+                    continue
+                for y in range(seg_top, seg_bottom):
+                    self.fill_span(y, seg_left, seg_right, char)
+
+    def row_text(self, y: int, start: int = 0, stop: int = None) -> str:
+        size = self.tile_size
+        ty = y // size
+        stop = self.width if stop is None else stop
+        parts = []
+        for tx, seg_start, seg_stop in self._segments(start, stop):
+            tile = self._tile(tx, ty)
+            if isinstance(tile, str):
+                parts.append(tile * (seg_stop - seg_start))
+            else:
+                offset = tx * size
+                parts.append(''.join(tile[y % size][seg_start - offset:seg_stop - offset]))
+        return ''.join(parts)
+
+    def span_fill(self, canvas, x: int, y: int, target: str, char: str):
+        """Scanline fill working tile by tile.
+
+        A uniform tile of the target character is filled with a single tile
+        write; spans inside materialized tiles stop at the tile edges.
+        """
+        size = self.tile_size
+        stack = [(x, y)]
+        while stack:
+            x, y = stack.pop()
+            tx, ty = x // size, y // size
+            tile = self._tile(tx, ty)
+            left, top, right, bottom = self._bounds(tx, ty)
+
+            if isinstance(tile, str):
+                if tile != target:
+                    continue
+                canvas._write_rect(left, top, right, bottom, char)
+                self._seed_row(stack, top - 1, left, right, target)
+                self._seed_row(stack, bottom, left, right, target)
+                self._seed_column(stack, left - 1, top, bottom, target)
+                self._seed_column(stack, right, top, bottom, target)
+                continue
+
+            row = tile[y - top]
+            if row[x - left] != target:
+                continue
+            start = x - left
+            while start > 0 and row[start - 1] == target:
+                start -= 1
+            stop = x - left + 1
+            while stop < right - left and row[stop] == target:
+                stop += 1
+            canvas._write_span(y, left + start, left + stop, char)
+
+            if start == 0 and left > 0:
+                stack.append((left - 1, y))
+            if stop == right - left and right < self.width:
+                stack.append((right, y))
+            self._seed_row(stack, y - 1, left + start, left + stop, target)
+            self._seed_row(stack, y + 1, left + start, left + stop, target)
+
+    def _seed_row(self, stack: list, y: int, start: int, stop: int, target: str):
+        """Push one seed per run of target on row y within [start, stop)."""
+        if not 0 <= y < self.height:
+            return
+        size = self.tile_size
+        ty = y // size
+        for tx, seg_start, seg_stop in self._segments(start, stop):
+            tile = self._tile(tx, ty)
+            if isinstance(tile, str):
+                if tile == target:
+                    stack.append((seg_start, y))
+                continue
+            row, offset = tile[y % size], tx * size
+            previous = None
+            for nx in range(seg_start, seg_stop):
+                current = row[nx - offset]
+                if current == target and previous != target:
+                    stack.append((nx, y))
+                previous = current
+
+    def _seed_column(self, stack: list, x: int, start: int, stop: int, target: str):
+        """Push a seed for every target pixel on column x within [start, stop).
+
+        Pixels of a uniform target tile only need one seed.
+        """
+        if not 0 <= x < self.width:
+            return
+        size = self.tile_size
+        tx = x // size
+        for ty, seg_start, seg_stop in self._segments(start, stop):
+            tile = self._tile(tx, ty)
+            if isinstance(tile, str):
+                if tile == target:
+                    stack.append((x, seg_start))
+                continue
+            for ny in range(seg_start, seg_stop):
+                if tile[ny % size][x % size] == target:
+                    stack.append((x, ny))
+
+
+class RunStorage:
+    """One sorted run list per row, for wide canvases made of long runs.
+
+    Row y is held as ``starts[y]``, the sorted x where each run begins (the
+    first is always 0), and ``chars[y]``, the character of each run; a run
+    ends where the next one begins. Adjacent runs always hold different
+    characters. Lookups bisect the run starts and writes splice the run
+    lists, so memory and time follow the number of runs, not the width.
+    """
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.starts = [[0] for _ in range(height)]
+        self.chars = [[' '] for _ in range(height)]
+        # One flag per row still shared with a fork, None if never forked
+        self.shared = None
+
+    def fork(self) -> 'RunStorage':
+        fork = copy.copy(self)
+        fork.starts, fork.chars = list(self.starts), list(self.chars)
+        self.shared = bytearray(b'\x01') * self.height
+        fork.shared = bytearray(self.shared)
+        return fork
+
+    @property
+    def pixels(self) -> 'RowsView':
+        return RowsView(self)
+
+    def encode(self, char: str) -> str:
+        return char
+
+    def get(self, x: int, y: int) -> str:
+        return self.chars[y][bisect_right(self.starts[y], x) - 1]
+
+    def set(self, x: int, y: int, char: str):
+        self.fill_span(y, x, x + 1, char)
+
+    def run_at(self, x: int, y: int) -> tuple:
+        """The (start, stop, char) of the run holding pixel (x, y)."""
+        starts = self.starts[y]
+        index = bisect_right(starts, x) - 1
+        stop = starts[index + 1] if index + 1 < len(starts) else self.width
+        return starts[index], stop, self.chars[y][index]
+
+    def fill_span(self, y: int, start: int, stop: int, char: str):
+        if self.shared is not None and self.shared[y]:
+            self.shared[y] = 0
+            self.starts[y], self.chars[y] = self.starts[y][:], self.chars[y][:]
+        starts, chars = self.starts[y], self.chars[y]
+        first = bisect_left(starts, start)
+        last = bisect_right(starts, stop)
+        new_starts, new_chars = [], []
+        if not first or chars[first - 1] != char:
+            new_starts.append(start)
+            new_chars.append(char)
+        # The run holding stop keeps its character from stop on
+        if stop < self.width and chars[last - 1] != char:
+            new_starts.append(stop)
+            new_chars.append(chars[last - 1])
+        starts[first:last] = new_starts
+        chars[first:last] = new_chars
+
+    def fill_column(self, x: int, start: int, stop: int, char: str):
+        for y in range(start, stop):
+            self.fill_span(y, x, x + 1, char)
+
+    def fill_rect(self, left: int, top: int, right: int, bottom: int, char: str):
+        for y in range(top, bottom):
+            self.fill_span(y, left, right, char)
+
+    def row_text(self, y: int, start: int = 0, stop: int = None) -> str:
+        stop = self.width if stop is None else stop
+        starts, chars = self.starts[y], self.chars[y]
+        first = bisect_right(starts, start) - 1
+        last = bisect_left(starts, stop)
+        bounds = [start, *starts[first + 1:last], stop]
+        return ''.join(char * (end - begin) for char, begin, end in zip(chars[first:last], bounds, bounds[1:]))
+
+    def span_fill(self, canvas, x: int, y: int, target: str, char: str):
+        """Scanline fill where every run of target is one span, found by bisection."""
+        height = self.height
+        stack = [(x, y)]
+        while stack:
+            seed_x, seed_y = stack.pop()
+            start, stop, current = self.run_at(seed_x, seed_y)
+            if current != target:
+                continue
+            canvas._write_span(seed_y, start, stop, char)
+            for ny in (seed_y - 1, seed_y + 1):
+                if not 0 <= ny < height:
+                    continue
+                starts, chars = self.starts[ny], self.chars[ny]
+                for index in range(bisect_right(starts, start) - 1, bisect_left(starts, stop)):
+                    if chars[index] == target:
+                        stack.append((max(starts[index], start), ny))
+
+
+class NumpyStorage:
+    """A 2-D NumPy array of uint32 code points, written with slice assignments.
+
+    Only available when NumPy is installed. Flood fills grow the region with
+    whole-array operations instead of visiting pixels one by one. Forks share
+    the array like the buffer storages share their buffer.
+    """
+
+    encoding = WideStorage.encoding
+    max_passes = 16
+    window_margin = 32
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.array = numpy.full((height, width), ord(' '), dtype=numpy.uint32)
+        _share(self, [0])
+
+    def fork(self) -> 'NumpyStorage':
+        fork = copy.copy(self)
+        _share(fork, self.owners)
+        return fork
+
+    def _own(self):
+        """Copy the array if a fork still uses it."""
+        if self.owners[0] > 1:
+            self.release()
+            self.array = self.array.copy()
+            _share(self, [0])
+
+    @property
+    def pixels(self) -> 'RowsView':
+        return RowsView(self)
+
+    def encode(self, char: str) -> int:
+        return ord(char)
+
+    def get(self, x: int, y: int) -> str:
+        return chr(self.array[y, x])
+
+    def set(self, x: int, y: int, char: str):
+        self._own()
+        self.array[y, x] = ord(char)
+
+    def fill_span(self, y: int, start: int, stop: int, char: str):
+        self._own()
+        self.array[y, start:stop] = ord(char)
+
+    def fill_column(self, x: int, start: int, stop: int, char: str):
+        self._own()
+        self.array[start:stop, x] = ord(char)
+
+    def fill_rect(self, left: int, top: int, right: int, bottom: int, char: str):
+        self._own()
+        self.array[top:bottom, left:right] = ord(char)
+
+    def row_text(self, y: int, start: int = 0, stop: int = None) -> str:
+        return self.array[y, start:stop].tobytes().decode(self.encoding)
+
+    def iter_rows(self):
+        """Decode the canvas with one bytes conversion per block of about ``ROW_BLOCK_CELLS`` pixels."""
+        block = max(1, ROW_BLOCK_CELLS // self.width)
+        for top in range(0, self.height, block):
+            text = self.array[top:top + block].tobytes().decode(self.encoding)
+            for offset in range(0, len(text), self.width):
+                yield text[offset:offset + self.width]
+
+    def span_fill(self, canvas, x: int, y: int, target: str, char: str):
+        """Grow the region by alternating row-wise and column-wise run propagation.
+
+        Each pass marks every run of target pixels that already touches the
+        region, so the number of passes follows the number of turns in the
+        region, not its area. The region is first looked for with a scanline
+        fill in a window ``window_margin`` pixels around the seed; while it
+        reaches the edge of its window, the window is widened towards that
+        edge by a margin that doubles every time and the passes carry on over
+        it, so small regions cost little on large canvases. Regions that need
+        more than ``max_passes``
+        passes in one window, such as spirals and mazes, are finished with a
+        scanline fill over a list copy of the target mask.
+        """
+        code = ord(target)
+        margin = self.window_margin
+        w_left, w_top = max(x - margin, 0), max(y - margin, 0)
+        w_right, w_bottom = min(x + 1 + margin, self.width), min(y + 1 + margin, self.height)
+        # The region, as a boolean array over the rows top:bottom and columns left:right
+        left, top, right, bottom = x, y, x + 1, y + 1
+        region = None
+        while True:
+            window = w_left, w_top, w_right, w_bottom
+            mask = self.array[w_top:w_bottom, w_left:w_right] == code
+            if region is None:
+                # The first window is small enough for a scanline fill, which finds small regions at once
+                region = _scanline_region(mask, x - w_left, y - w_top)
+                rows, columns, reached = self._reach(region, window)
+            else:
+                row_runs, column_runs = _runs(mask), _runs(mask.T)
+                grown = numpy.zeros_like(mask)
+                grown[top - w_top:bottom - w_top, left - w_left:right - w_left] = region
+                region, size = grown, int(numpy.count_nonzero(grown))
+                for _ in range(self.max_passes):
+                    region = _spread(region, row_runs)
+                    region = _spread(region.T, column_runs).T
+                    rows, columns, reached = self._reach(region, window)
+                    grown = int(numpy.count_nonzero(region))
+                    if any(reached) or grown == size:
+                        break
+                    size = grown
+                else:
+                    left, top, right, bottom = 0, 0, self.width, self.height
+                    region = _scanline_region(self.array == code, x, y)
+                    break
+            region = region[rows[0]:rows[-1] + 1, columns[0]:columns[-1] + 1]
+            left, top = w_left + int(columns[0]), w_top + int(rows[0])
+            right, bottom = w_left + int(columns[-1]) + 1, w_top + int(rows[-1]) + 1
+            if not any(reached):
+                break
+            # Widen the window only towards the edges the region reached
+            margin *= 2
+            reached_left, reached_top, reached_right, reached_bottom = reached
+            if reached_left:
+                w_left = max(w_left - margin, 0)
+            if reached_top:
+                w_top = max(w_top - margin, 0)
+            if reached_right:
+                w_right = min(w_right + margin, self.width)
+            if reached_bottom:
+                w_bottom = min(w_bottom + margin, self.height)
+
+        if canvas.observers:
+            for row, start, stop in _region_spans(region):
+                canvas._write_span(top + row, left + start, left + stop, char)
+            return
+        self._own()
+        if region.all():
+            self.array[top:bottom, left:right] = ord(char)
+        else:
+            self.array[top:bottom, left:right][region] = ord(char)
+        canvas.mark_dirty(left + 1, top + 1, right, bottom)
+
+    def _reach(self, region, window: tuple) -> tuple:
+        """The rows and columns of window holding region pixels, and which edges of window they reach.
+
+        Only edges the canvas goes on past count as reached, as (left, top,
+        right, bottom) flags.
+        """
+        w_left, w_top, w_right, w_bottom = window
+        rows = numpy.flatnonzero(region.any(axis=1))
+        columns = numpy.flatnonzero(region.any(axis=0))
+        return rows, columns, (columns[0] == 0 < w_left, rows[0] == 0 < w_top,
+                               columns[-1] == w_right - w_left - 1 and w_right < self.width,
+                               rows[-1] == w_bottom - w_top - 1 and w_bottom < self.height)
+
+
+def _runs(mask) -> tuple:
+    """The horizontal runs of mask, for ``_spread``.
+
+    Returns the offsets of the runs in the flattened mask and the lengths of
+    the segments alternating between gaps and runs that make it up, starting
+    and ending with a gap.
+    """
+    width = mask.shape[1]
+    rows, starts, stops = _run_bounds(mask)
+    bounds = numpy.empty(2 * len(rows) + 2, dtype=numpy.intp)
+    bounds[0], bounds[-1] = 0, mask.size
+    bounds[1:-1:2] = rows * width + starts
+    bounds[2:-1:2] = rows * width + stops
+    return bounds[1:-1:2], numpy.diff(bounds)
+
+
+def _spread(region, runs):
+    """Extend region to every horizontal run of mask it intersects, with runs the ``_runs`` of mask."""
+    starts, lengths = runs
+    values = numpy.zeros(len(lengths), dtype=bool)
+    # A run is followed by a gap, which holds no region pixels
+    values[1::2] = numpy.logical_or.reduceat(region.ravel(), starts)
+    return numpy.repeat(values, lengths).reshape(region.shape)
+
+
+def _scanline_region(mask, x: int, y: int):
+    """The 4-connected region of mask containing (x, y), found with a scanline fill."""
+    rows = mask.tolist()
+    width, height = mask.shape[1], mask.shape[0]
+    stack = [(x, y)]
+    while stack:
+        seed_x, seed_y = stack.pop()
+        row = rows[seed_y]
+        if not row[seed_x]:
+            continue
+        left = seed_x
+        while left > 0 and row[left - 1]:
+            left -= 1
+        right = seed_x + 1
+        while right < width and row[right]:
+            right += 1
+        row[left:right] = [False] * (right - left)
+        for ny in (seed_y - 1, seed_y + 1):
+            if not 0 <= ny < height:
+                continue
+            neighbour = rows[ny]
+            nx = left
+            while nx < right:
+                if neighbour[nx]:
+                    stack.append((nx, ny))
+                    nx += 1
+                    while nx < right and neighbour[nx]:
+                        nx += 1
+                nx += 1
+    return mask & ~numpy.array(rows, dtype=bool)
+
+
+def _run_bounds(region) -> tuple:
+    """The rows, starts and exclusive stops of the horizontal runs of a boolean array."""
+    padded = numpy.zeros((region.shape[0], region.shape[1] + 2), dtype=numpy.int8)
+    padded[:, 1:-1] = region
+    edges = numpy.diff(padded, axis=1).ravel()
+    starts, stops = numpy.flatnonzero(edges > 0), numpy.flatnonzero(edges < 0)
+    stride = region.shape[1] + 1
+    return starts // stride, starts % stride, stops % stride
+
+
+def _region_spans(region):
+    """Yield (row, start, stop) for every horizontal run of a boolean region."""
+    return zip(*(bounds.tolist() for bounds in _run_bounds(region)))
+
+
+class RowView(Sequence):
+    """A mutable, fixed-length view of one row of a storage without row lists."""
+
+    def __init__(self, storage, y: int):
+        self.storage = storage
+        self.y = y
+
+    def __len__(self) -> int:
+        return self.storage.width
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            positions = range(self.storage.width)[index]
+            if positions.step == 1:
+                return list(self.storage.row_text(self.y, positions.start, positions.stop))
+            return [self.storage.get(x, self.y) for x in positions]
+        return self.storage.get(range(self.storage.width)[index], self.y)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            positions = range(self.storage.width)[index]
+            value = list(value)
+            if len(value) != len(positions):
+                raise ValueError(f"Can not resize a canvas row: {len(value)} values for {len(positions)} pixels")
+            for x, char in zip(positions, value):
+                self.storage.set(x, self.y, char)
+        else:
+            self.storage.set(range(self.storage.width)[index], self.y, value)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, RowView)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class RowsView(Sequence):
+    """The ``pixels`` sequence of rows of a storage without row lists."""
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def __len__(self) -> int:
+        return self.storage.height
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [RowView(self.storage, y) for y in range(self.storage.height)[index]]
+        return RowView(self.storage, range(self.storage.height)[index])
+
+
+STORAGE_BACKENDS = {
+    'list': ListStorage,
+    'bytes': ByteStorage,
+    'wide': WideStorage,
+    'tiled': TiledStorage,
+    'rle': RunStorage,
+    'numpy': NumpyStorage if numpy is not None else WideStorage,
+}
@@ -0,0 +1,35 @@
+from unittest import TestCase
+
+from benchmarks.bench_drawing import WORKLOADS, compare, run_suite, speedups
+
+
+class TestBenchmarks(TestCase):
+
+    def test_run_suite_records_every_workload(self):
+        report = run_suite(sizes=[(6, 5)], repeat=1)
+        self.assertEqual([r['name'] for r in report['results']], list(WORKLOADS))
+        for result in report['results']:
+            self.assertGreaterEqual(result['seconds'], 0)
+            self.assertGreaterEqual(result['peak_bytes'], 0)
+
+    def test_compare_flags_regressions(self):
+        baseline = {'results': [{'name': 'lines', 'width': 5, 'height': 5, 'seconds': 1.0, 'peak_bytes': 100}]}
+        current = {'results': [{'name': 'lines', 'width': 5, 'height': 5, 'seconds': 1.1, 'peak_bytes': 200}]}
+        regressions = compare(current, baseline, threshold=0.2)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('peak_bytes', regressions[0])
+        self.assertEqual(compare(current, baseline, threshold=1.5), [])
+
+    def test_compare_refuses_other_settings(self):
+        results = [{'name': 'lines', 'width': 5, 'height': 5, 'seconds': 1.0, 'peak_bytes': 100}]
+        baseline = {'meta': {'storage': 'list', 'fill_engine': 'span'}, 'results': results}
+        for meta in ({'storage': 'bytes', 'fill_engine': 'span'}, {'storage': 'list', 'fill_engine': 'naive'}):
+            with self.assertRaisesRegex(ValueError, "The baseline was recorded with"):
+                compare({'meta': meta, 'results': results}, baseline)
+        self.assertEqual(compare({'meta': dict(baseline['meta']), 'results': results}, baseline), [])
+
+    def test_speedups(self):
+        fast = {'results': [{'name': 'fill_empty', 'width': 5, 'height': 5, 'seconds': 0.5, 'peak_bytes': 0}]}
+        slow = {'results': [{'name': 'fill_empty', 'width': 5, 'height': 5, 'seconds': 6.0, 'peak_bytes': 0}]}
+        self.assertEqual(speedups(fast, slow), ['fill_empty 5x5: 12.00x'])
+        self.assertEqual(speedups(fast, {'results': []}), [])
@@ -60,3 +60,18 @@ class TestCanvas(TestCase):
                 canvas.draw_pixel(x, y, '*')
             with self.assertRaises(OutOfCanvasError):
                 canvas.get_pixel(x, y)
+
+    def test_bulk_writes(self):
+        for storage in ('list', 'bytes', 'wide'):
+            canvas = Canvas(5, 4, storage=storage)
+            canvas.fill_horizontal(4, 2, 1, '-')
+            canvas.fill_vertical(5, 4, 2, '|')
+            canvas.fill_rect(1, 3, 3, 4, '#')
+            self.assertEqual(list(canvas.iter_rows()), [' --- ', '    |', '### |', '### |'])
+
+            with self.assertRaises(OutOfCanvasError):
+                canvas.fill_horizontal(1, 6, 1, '-')
+            with self.assertRaises(OutOfCanvasError):
+                canvas.fill_vertical(1, 0, 2, '|')
+            with self.assertRaises(OutOfCanvasError):
+                canvas.fill_rect(1, 1, 5, 5, '#')
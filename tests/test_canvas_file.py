@@ -0,0 +1,73 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from src.canvas import Canvas
+from src.canvas_file import HEADER, MAGIC, VERSION, CanvasFile, create_canvas_file, save_canvas
+from src.drawing_board import DrawingBoard
+from src.exceptions import CanvasError
+
+
+class TestCanvasFile(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'canvas.drw')
+
+    def test_create_and_draw_in_place(self):
+        for encoding, cell_size in (('bytes', 1), ('wide', 4)):
+            create_canvas_file(self.path, 7, 5, encoding)
+            self.assertEqual(os.path.getsize(self.path), HEADER.size + 7 * 5 * cell_size)
+
+            with CanvasFile(self.path) as canvas_file:
+                board = DrawingBoard(canvas_file.canvas)
+                board.draw_rectangle(1, 1, 7, 5, '#')
+                board.draw_line(4, 1, 4, 5, '|')
+                board.bucket_fill(2, 2, '.')
+                expected = str(board)
+
+            with CanvasFile(self.path, writable=False) as canvas_file:
+                self.assertEqual(str(DrawingBoard(canvas_file.canvas)), expected)
+                self.assertEqual(canvas_file.canvas.get_pixel(2, 2), '.')
+                with self.assertRaises(TypeError):
+                    canvas_file.canvas.draw_pixel(1, 1, 'x')
+
+    def test_fork_copies_mapped_pixels(self):
+        create_canvas_file(self.path, 3, 1, 'bytes')
+        with CanvasFile(self.path) as canvas_file:
+            fork = canvas_file.canvas.fork()
+            canvas_file.canvas.draw_pixel(1, 1, 'x')
+            fork.draw_pixel(2, 1, 'o')
+        with CanvasFile(self.path) as canvas_file:
+            self.assertEqual(next(canvas_file.canvas.iter_rows()), 'x  ')
+        self.assertEqual(next(fork.iter_rows()), ' o ')
+
+    def test_save_canvas(self):
+        canvas = Canvas(4, 2)
+        canvas.fill_horizontal(1, 4, 2, '█')
+        save_canvas(canvas, self.path, 'wide')
+        with CanvasFile(self.path) as canvas_file:
+            self.assertEqual(list(canvas_file.canvas.iter_rows()), ['    ', '████'])
+
+        with self.assertRaises(CanvasError):
+            save_canvas(canvas, self.path, 'bytes')
+
+    def test_rejects_other_files(self):
+        with open(self.path, 'wb') as other:
+            other.write(b'\0' * HEADER.size)
+        with self.assertRaises(CanvasError):
+            CanvasFile(self.path)
+
+    def test_rejects_truncated_files(self):
+        create_canvas_file(self.path, 7, 5, 'wide')
+        os.truncate(self.path, HEADER.size + 7 * 5 * 4 - 1)
+        with self.assertRaisesRegex(CanvasError, "is truncated"):
+            CanvasFile(self.path)
+
+    def test_rejects_short_and_empty_headers(self):
+        for header in (b'', b'DRWC', HEADER.pack(MAGIC, VERSION, 1, 0, 5), HEADER.pack(MAGIC, VERSION, 1, 5, 0)):
+            with open(self.path, 'wb') as other:
+                other.write(header)
+            with self.assertRaises(CanvasError):
+                CanvasFile(self.path)
@@ -0,0 +1,111 @@
+import random
+import threading
+from unittest import TestCase
+
+from src.canvas import Canvas
+from src.concurrent_board import BandLocks, ConcurrentBoard, _HeldBands
+from src.drawing_board import DrawingBoard
+from src.exceptions import CanvasNotReadyError, LayerError, OutOfCanvasError
+
+
+def run_threads(targets: list, timeout: float = 30):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout)
+        if thread.is_alive():
+            raise AssertionError("Thread did not finish, possible deadlock")
+
+
+class TestConcurrentBoard(TestCase):
+
+    def test_matches_drawing_board(self):
+        rng = random.Random(7)
+        for storage in ('list', 'bytes', 'tiled', 'rle'):
+            boards = [DrawingBoard(storage=storage), ConcurrentBoard(storage=storage, band_height=3)]
+            for board in boards:
+                board.new_canvas(30, 20)
+            for _ in range(60):
+                x1, x2, y1, y2 = rng.randint(1, 30), rng.randint(1, 30), rng.randint(1, 20), rng.randint(1, 20)
+                c = rng.choice('#o.')
+                for board in boards:
+                    match (x1 + y1) % 3:
+                        case 0:
+                            board.draw_line(x1, y1, x1, y2, c)
+                        case 1:
+                            board.draw_rectangle(x1, y1, x2, y2, c)
+                        case 2:
+                            board.bucket_fill(x1, y1, c)
+            self.assertEqual(str(boards[1]), str(boards[0]), storage)
+
+    def test_disjoint_writers_and_consistent_renders(self):
+        board = ConcurrentBoard(band_height=4)
+        board.new_canvas(40, 32)
+        frames = []
+
+        def writer(index: int):
+            def draw():
+                for step in range(200):
+                    board.draw_rectangle(1, index * 8 + 1, 40, index * 8 + 8, 'abcd'[index] if step % 2 else 'ABCD'[index])
+            return draw
+
+        def render():
+            for _ in range(30):
+                frames.append(str(board))
+
+        run_threads([writer(index) for index in range(4)] + [render])
+        for frame in frames:
+            rows = frame.split('\n')[1:-1]
+            for index in range(4):
+                # A rectangle spans two bands and is never seen half drawn
+                edges = {rows[index * 8][1], rows[index * 8 + 7][1], rows[index * 8 + 3][1], rows[index * 8 + 3][40]}
+                self.assertLessEqual(len(edges - {' '}), 1)
+
+    def test_concurrent_fills_do_not_deadlock(self):
+        board = ConcurrentBoard(band_height=1)
+        board.new_canvas(30, 30)
+        for x in range(2, 30, 4):
+            board.draw_line(x, 1, x, 29, '#')
+            board.draw_line(x + 2, 2, x + 2, 30, '#')
+
+        def fill(x: int, y: int, chars: str):
+            def run():
+                for step in range(10):
+                    board.bucket_fill(x, y, chars[step % 2])
+            return run
+
+        walls = str(board).count('#')
+        # The three fills start in one serpentine region crossing every band
+        run_threads([fill(1, 1, 'ab'), fill(1, 30, 'xy'), fill(30, 15, 'pq')])
+        self.assertEqual(str(board).count('#'), walls)
+        self.assertFalse(any(lock.locked() for lock in board.bands.locks))
+
+    def test_held_bands_stay_ordered(self):
+        bands = BandLocks(Canvas(10, 8), 2)
+        held = _HeldBands(bands)
+        held.need(5)
+        held.need(1)
+        self.assertEqual(held.held, [0, 2])
+        bands.locks[1].acquire()
+        threading.Timer(0.05, bands.locks[1].release).start()
+        held.need(3)
+        self.assertEqual(held.held, [0, 1, 2])
+        held.release()
+        self.assertFalse(any(lock.locked() for lock in bands.locks))
+
+    def test_board_api(self):
+        board = ConcurrentBoard()
+        with self.assertRaises(CanvasNotReadyError):
+            board.draw_line(1, 1, 1, 1, 'x')
+        board.new_canvas(4, 2)
+        with self.assertRaises(OutOfCanvasError):
+            board.draw_rectangle(1, 1, 5, 2, 'x')
+        with self.assertRaises(LayerError):
+            board.select_layer('top')
+        board.draw_line(1, 1, 4, 1, 'x')
+        fork = board.fork()
+        fork.draw_line(1, 2, 4, 2, 'o')
+        self.assertEqual(str(board), '------\n|xxxx|\n|    |\n------')
+        self.assertEqual(str(fork), '------\n|xxxx|\n|oooo|\n------')
+        self.assertEqual(board.render_diff(), '\x1b[5;1H\x1b[J')
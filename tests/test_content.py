@@ -0,0 +1,145 @@
+import io
+import random
+from collections import Counter
+from unittest import TestCase
+from unittest.mock import patch
+
+from runner import run_batch, validate_params
+from src.canvas import Canvas
+from src.content import _digest
+from src.drawing_board import DrawingBoard
+from src.exceptions import CanvasError, CommandError, UnsupportedCharacterError
+from src.fill import FILL_ENGINES
+from src.history import History
+
+
+def draw_randomly(canvases: list, count: int, seed: int):
+    """Apply the same random lines, rectangles and fills to every canvas."""
+    rng = random.Random(seed)
+    width, height = canvases[0].width, canvases[0].height
+    for _ in range(count):
+        x1, x2 = sorted((rng.randint(1, width), rng.randint(1, width)))
+        y1, y2 = sorted((rng.randint(1, height), rng.randint(1, height)))
+        char = rng.choice('xo#.')
+        kind = rng.random()
+        for canvas in canvases:
+            if kind < 0.4:
+                canvas.fill_horizontal(x1, x2, y1, char)
+            elif kind < 0.7:
+                canvas.fill_vertical(x1, y1, y2, char)
+            elif kind < 0.9:
+                canvas.fill_rect(x1, y1, x2, y2, char)
+            else:
+                FILL_ENGINES['span'](canvas, x1, y1, char)
+
+
+class TestContentIndex(TestCase):
+
+    def test_follows_writes(self):
+        for storage in ('list', 'bytes', 'wide', 'tiled', 'rle', 'numpy'):
+            canvas, replay = Canvas(30, 17, storage), Canvas(30, 17)
+            content = canvas.content
+            self.assertEqual(content.histogram, {' ': 30 * 17})
+            for seed in range(4):
+                draw_randomly([canvas, replay], 60, seed)
+                self.assertEqual(content.histogram, dict(Counter(''.join(canvas.iter_rows()))), storage)
+                # A canvas indexed only now, from its pixels, hashes the same
+                self.assertEqual(content.digest, Canvas(30, 17, replay.storage.fork()).content.digest, storage)
+
+    def test_differing_rows(self):
+        first, second = Canvas(10, 37), Canvas(10, 37, 'rle')
+        draw_randomly([first, second], 50, 1)
+        self.assertEqual(first.content.differing_rows(second.content), [])
+        second.draw_pixel(4, 9, '!')
+        second.draw_pixel(10, 37, '!')
+        self.assertEqual(first.content.differing_rows(second.content), [8, 36])
+        self.assertNotEqual(first.content.digest, second.content.digest)
+        with self.assertRaises(CanvasError):
+            first.content.differing_rows(Canvas(10, 36).content)
+        self.assertNotEqual(Canvas(4, 1).content.digest, Canvas(2, 2).content.digest)
+
+    def test_fork_copies_the_index(self):
+        canvas = Canvas(8, 8)
+        canvas.fill_rect(1, 1, 4, 4, '#')
+        self.assertEqual(canvas.content.count('#'), 16)
+        fork = canvas.fork()
+        self.assertIsNotNone(fork._content)
+        fork.draw_pixel(8, 8, 'x')
+        self.assertEqual(fork.content.histogram, {'#': 16, ' ': 47, 'x': 1})
+        self.assertEqual(canvas.content.histogram, {'#': 16, ' ': 48})
+        self.assertEqual(fork.content.differing_rows(canvas.content), [7])
+
+    def test_writes_reported_with_mark_dirty(self):
+        canvas = Canvas(5, 5, 'numpy')
+        content = canvas.content
+        canvas.fill_vertical(3, 1, 5, '|')
+        # The NumPy fill writes the array directly and marks the area dirty
+        FILL_ENGINES['span'](canvas, 1, 1, '.')
+        self.assertEqual(content.histogram, {'.': 10, '|': 5, ' ': 10})
+        replay = Canvas(5, 5)
+        replay.fill_vertical(3, 1, 5, '|')
+        replay.fill_rect(1, 1, 2, 5, '.')
+        self.assertEqual(content.differing_rows(replay.content), [])
+
+    def test_failed_writes_are_not_counted(self):
+        canvas = Canvas(3, 3, 'bytes')
+        content = canvas.content
+        with self.assertRaises(UnsupportedCharacterError):
+            canvas.fill_horizontal(1, 3, 1, '█')
+        self.assertEqual(content.histogram, {' ': 9})
+
+    def test_query_cost_follows_changes(self):
+        canvas = Canvas(2000, 2000)
+        reference = canvas.fork()
+        # Build both indexes first
+        self.assertEqual(canvas.content.differing_rows(reference.content), [])
+        self.assertEqual(canvas.content.count(' '), 2000 * 2000)
+        canvas.draw_pixel(1000, 1000, 'x')
+        content = canvas.content
+        with patch.object(canvas.storage, 'row_text', wraps=canvas.storage.row_text) as row_text, \
+                patch('src.content._digest', wraps=_digest) as digest:
+            self.assertEqual(content.count('x'), 1)
+            self.assertEqual(content.differing_rows(reference.content), [999])
+        # Only the written row is hashed again, then its ancestors up to the root
+        self.assertEqual([call.args for call in row_text.call_args_list], [(999,)])
+        self.assertEqual(digest.call_count, 1 + (content.leaves.bit_length() - 1))
+
+
+class TestBoardContent(TestCase):
+
+    def test_compare_boards(self):
+        board = DrawingBoard(history=History())
+        board.new_canvas(6, 4)
+        board.draw_rectangle(1, 1, 6, 4, '#')
+        other = board.fork()
+        self.assertTrue(board.same_content(other))
+        other.bucket_fill(2, 2, 'o')
+        self.assertFalse(board.same_content(other))
+        self.assertEqual(board.differing_rows(other), [2, 3])
+        self.assertEqual(other.content().histogram, {'#': 16, 'o': 8})
+        other.undo()
+        self.assertTrue(board.same_content(other))
+
+    def test_layered_board_counts_the_composite(self):
+        board = DrawingBoard()
+        board.new_canvas(4, 1)
+        board.draw_line(1, 1, 2, 1, 'x')
+        board.select_layer('top')
+        board.draw_line(2, 1, 3, 1, 'o')
+        self.assertEqual(board.content().histogram, {'x': 1, 'o': 2, ' ': 1})
+        board.set_layer_visible('top', False)
+        self.assertEqual(board.content().histogram, {'x': 2, ' ': 2})
+
+    def test_query_command(self):
+        self.assertEqual(validate_params('H', []), ())
+        self.assertEqual(validate_params('H', ['#']), ('#',))
+        with self.assertRaisesRegex(CommandError, "Parameter c must be a character"):
+            validate_params('H', ['##'])
+        with self.assertRaisesRegex(CommandError, "H takes at most 1 parameter: c"):
+            validate_params('H', ['#', '#'])
+        out, err = io.StringIO(), io.StringIO()
+        run_batch(['C 3 2', 'L 1 1 3 1 #', 'H', 'H #', 'H o'], DrawingBoard(), out, err)
+        lines = out.getvalue().splitlines()
+        self.assertRegex(lines[0], '^Hash: [0-9a-f]{16}$')
+        self.assertEqual(lines[1:6], ["' ': 3", "'#': 3", "'#': 3", "'o': 0", '-----'])
+        self.assertEqual(err.getvalue(), '')
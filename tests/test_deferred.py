@@ -0,0 +1,95 @@
+import io
+import random
+from unittest import TestCase
+
+from runner import run_batch
+from src.deferred import optimize
+from src.drawing_board import DrawingBoard
+from src.exceptions import OutOfCanvasError, UnsupportedCharacterError
+from src.history import History
+from src.stats import Stats
+
+
+def random_script(width: int, height: int, count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    lines = [f'C {width} {height}']
+    for _ in range(count):
+        x1, x2 = rng.randint(1, width), rng.randint(1, width)
+        y1, y2 = rng.randint(1, height), rng.randint(1, height)
+        c = rng.choice('xo#')
+        match rng.choice('LLLRRBP'):
+            case 'L':
+                x2 = min(x1 + rng.randint(0, 4), width)
+                lines.append(f'L {x1} {y1} {x2} {y1} {c}' if rng.random() < 0.7 else f'L {x1} {y1} {x1} {y2} {c}')
+            case 'R':
+                lines.append(f'R {x1} {y1} {x2} {y2} {c}')
+            case 'B':
+                lines.append(f'B {x1} {y1} {c}')
+            case 'P':
+                lines.append('P')
+    lines.append('L 0 1 3 1 x')
+    return lines
+
+
+class TestOptimize(TestCase):
+
+    def test_drops_covered_writes(self):
+        writes = [(0, 0, 4, 1, 'x'), (1, 1, 3, 3, 'o'), (0, 0, 2, 1, 'y'), (2, 0, 4, 1, 'z')]
+        self.assertEqual(optimize(writes), [(1, 1, 3, 3, 'o'), (0, 0, 2, 1, 'y'), (2, 0, 4, 1, 'z')])
+
+    def test_merges_adjacent_spans(self):
+        writes = [(0, 0, 3, 1, 'x'), (5, 4, 6, 9, 'o'), (3, 0, 5, 1, 'x'), (5, 0, 7, 1, 'x')]
+        self.assertEqual(optimize(writes), [(0, 0, 7, 1, 'x'), (5, 4, 6, 9, 'o')])
+
+    def test_does_not_merge_across_overlapping_writes(self):
+        writes = [(0, 0, 3, 1, 'x'), (3, 0, 6, 1, 'o'), (3, 0, 5, 1, 'x')]
+        self.assertEqual(optimize(writes), writes)
+
+    def test_merges_stacked_rows(self):
+        writes = [(2, 3, 6, 4, '#'), (2, 4, 6, 5, '#'), (2, 5, 6, 6, '#')]
+        self.assertEqual(optimize(writes), [(2, 3, 6, 6, '#')])
+
+
+class TestDeferredBoard(TestCase):
+
+    def test_matches_eager_execution(self):
+        for seed in range(15):
+            script = random_script(12 + seed, 8 + seed % 5, 150, seed)
+            outputs = []
+            for deferred in (False, True):
+                out, err = io.StringIO(), io.StringIO()
+                run_batch(script, DrawingBoard(deferred=deferred, max_pending=40), out, err)
+                outputs.append((out.getvalue(), err.getvalue()))
+            self.assertEqual(outputs[0], outputs[1], f"seed {seed}")
+
+    def test_writes_are_queued_until_rendered(self):
+        stats = Stats()
+        board = DrawingBoard(deferred=True, stats=stats)
+        board.new_canvas(10, 3)
+        for x in range(1, 11):
+            board.draw_line(x, 2, x, 2, '-')
+        self.assertEqual(board.canvas.storage.row_text(1), ' ' * 10)
+        self.assertEqual(str(board).split('\n')[2], '|' + '-' * 10 + '|')
+        self.assertEqual(stats.pixels['flush'], 10)
+        self.assertEqual(board.pending, [])
+
+    def test_new_canvas_discards_queue(self):
+        board = DrawingBoard(deferred=True)
+        board.new_canvas(5, 5)
+        board.draw_rectangle(1, 1, 5, 5, '#')
+        board.new_canvas(5, 5)
+        self.assertEqual(board.pending, [])
+        self.assertEqual(str(board).split('\n')[1], '|     |')
+
+    def test_validation_is_not_deferred(self):
+        board = DrawingBoard(deferred=True, storage='bytes')
+        board.new_canvas(5, 5)
+        with self.assertRaises(OutOfCanvasError):
+            board.draw_line(1, 1, 6, 1, 'x')
+        with self.assertRaises(UnsupportedCharacterError):
+            board.draw_rectangle(1, 1, 2, 2, '█')
+        self.assertEqual(board.pending, [])
+
+    def test_deferred_boards_keep_no_history(self):
+        with self.assertRaises(ValueError):
+            DrawingBoard(deferred=True, history=History())
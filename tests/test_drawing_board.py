@@ -2,7 +2,8 @@ import random
 from unittest import TestCase
 
 from src.drawing_board import DrawingBoard
-from src.exceptions import CanvasNotReadyError, WrongOrientationError
+from src.exceptions import CanvasNotReadyError, HistoryError, WrongOrientationError
+from src.history import History
 
 
 class TestDrawingBoard(TestCase):
@@ -250,3 +251,31 @@ class TestDrawingBoard(TestCase):
                 board.canvas.get_pixel(x, y), '*',
                 f"Interior point ({x},{y}) should be filled with '*'"
             )
+
+    def test_fork(self):
+        board = DrawingBoard(history=History())
+        with self.assertRaises(CanvasNotReadyError):
+            board.fork()
+        board.new_canvas(6, 4)
+        board.draw_rectangle(1, 1, 4, 4, '#')
+        branches = [board.fork() for _ in range(2)]
+        branches[0].bucket_fill(2, 2, '.')
+        branches[1].bucket_fill(2, 2, 'o')
+        branches[1].bucket_fill(6, 1, '~')
+        self.assertEqual(str(board).split('\n')[2], '|#  #  |')
+        self.assertEqual(str(branches[0]).split('\n')[2], '|#..#  |')
+        self.assertEqual(str(branches[1]).split('\n')[2], '|#oo#~~|')
+        self.assertEqual(branches[1].history.undo_steps, 2)
+        branches[1].undo(2)
+        self.assertEqual(str(branches[1]), str(board))
+        with self.assertRaises(HistoryError):
+            branches[1].undo()
+
+    def test_fork_of_deferred_board(self):
+        board = DrawingBoard(deferred=True)
+        board.new_canvas(3, 1)
+        board.draw_line(1, 1, 3, 1, 'x')
+        fork = board.fork()
+        fork.draw_line(2, 1, 2, 1, 'o')
+        self.assertEqual(str(board), '-----\n|xxx|\n-----')
+        self.assertEqual(str(fork), '-----\n|xox|\n-----')
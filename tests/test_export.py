@@ -0,0 +1,143 @@
+import gzip
+import io
+import os
+import tempfile
+import tracemalloc
+from unittest import TestCase
+
+from runner import run_batch, validate_params
+from src.canvas import Canvas
+from src.drawing_board import DrawingBoard
+from src.exceptions import CommandError
+from src.export import export_canvas, export_gzip, export_pgm, export_ppm, export_text
+from src.renderer import Renderer, write_frame
+from src.stats import Stats
+
+
+class Sink:
+    """A binary or text file that keeps nothing but the number of writes."""
+
+    def __init__(self):
+        self.writes = 0
+
+    def write(self, data) -> int:
+        self.writes += 1
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def sample_canvas(storage: str = 'list') -> Canvas:
+    canvas = Canvas(6, 4, storage)
+    canvas.fill_horizontal(1, 6, 1, '#')
+    canvas.fill_vertical(3, 2, 4, 'o')
+    return canvas
+
+
+class TestWriteFrame(TestCase):
+
+    def test_matches_render(self):
+        for storage in ('list', 'bytes', 'wide', 'tiled', 'rle', 'numpy'):
+            canvas = sample_canvas(storage)
+            out = io.StringIO()
+            write_frame(canvas, out, chunk_size=10)
+            self.assertEqual(out.getvalue(), Renderer().render(canvas) + '\n', storage)
+
+    def test_writes_in_chunks(self):
+        sink = Sink()
+        write_frame(Canvas(10, 100), sink, chunk_size=120)
+        self.assertEqual(sink.writes, 11)
+
+    def test_board_write_frame(self):
+        stats = Stats()
+        board = DrawingBoard(stats=stats)
+        board.new_canvas(4, 2)
+        board.draw_line(1, 1, 4, 1, 'x')
+        out = io.StringIO()
+        board.write_frame(out)
+        self.assertEqual(out.getvalue(), str(board) + '\n')
+        self.assertEqual(stats.render_bytes, 2 * len(str(board)) + 1)
+        board.set_viewport(2, 2, 1, 1)
+        out = io.StringIO()
+        board.write_frame(out)
+        self.assertEqual(out.getvalue(), str(board) + '\n')
+
+    def test_run_batch_stream(self):
+        script = ['C 3 2', 'L 1 1 3 1 x', 'P', 'B 1 2 o']
+        outputs = []
+        for stream in (False, True):
+            out = io.StringIO()
+            run_batch(script, DrawingBoard(), out, render_every=1, stream=stream)
+            outputs.append(out.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+
+
+class TestExport(TestCase):
+
+    def test_text(self):
+        out = io.StringIO()
+        export_text(sample_canvas(), out)
+        self.assertEqual(out.getvalue(), '######\n  o   \n  o   \n  o   \n')
+
+    def test_gzip(self):
+        out = io.BytesIO()
+        export_gzip(sample_canvas('rle'), out, chunk_size=8)
+        self.assertEqual(gzip.decompress(out.getvalue()).decode(), '######\n  o   \n  o   \n  o   \n')
+        self.assertFalse(out.closed)
+
+    def test_pgm(self):
+        out = io.BytesIO()
+        export_pgm(sample_canvas(), out, greys={' ': 200, 'o': 100}, default=7)
+        self.assertEqual(out.getvalue(), b'P5\n6 4\n255\n' + b'\7' * 6 + b'\xc8\xc8d\xc8\xc8\xc8' * 3)
+
+    def test_ppm(self):
+        out = io.BytesIO()
+        export_ppm(Canvas(2, 1), out)
+        self.assertEqual(out.getvalue(), b'P6\n2 1\n255\n' + b'\xff' * 6)
+        canvas = Canvas(2, 1)
+        canvas.draw_pixel(1, 1, 'x')
+        canvas.draw_pixel(2, 1, 'y')
+        out = io.BytesIO()
+        export_ppm(canvas, out, colours={'x': (1, 2, 3)})
+        self.assertEqual(out.getvalue()[-6:-3], b'\1\2\3')
+        self.assertEqual(len(out.getvalue()), 11 + 6)
+
+    def test_memory_does_not_grow_with_height(self):
+        canvas = Canvas(200, 20_000, 'rle')
+        canvas.fill_vertical(100, 1, 20_000, '|')
+        for exporter in (write_frame, export_text, export_gzip, export_pgm, export_ppm):
+            tracemalloc.start()
+            exporter(canvas, Sink())
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            # The canvas alone is 4 MB of text
+            self.assertLess(peak, 1_000_000, exporter.__name__)
+
+    def test_export_canvas_by_extension(self):
+        canvas = sample_canvas()
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ('canvas.txt', 'canvas.PGM', 'canvas.ppm', 'canvas.txt.gz'):
+                export_canvas(canvas, os.path.join(directory, name))
+            with open(os.path.join(directory, 'canvas.txt')) as text:
+                self.assertEqual(text.read(), '######\n  o   \n  o   \n  o   \n')
+            with open(os.path.join(directory, 'canvas.PGM'), 'rb') as image:
+                self.assertTrue(image.read().startswith(b'P5\n6 4\n'))
+            with gzip.open(os.path.join(directory, 'canvas.txt.gz'), 'rt') as text:
+                self.assertEqual(text.readline(), '######\n')
+            with self.assertRaisesRegex(ValueError, "Unknown export format: .png"):
+                export_canvas(canvas, os.path.join(directory, 'canvas.png'))
+
+    def test_export_command(self):
+        self.assertEqual(validate_params('E', ['out.ppm']), ('out.ppm',))
+        with self.assertRaisesRegex(CommandError, "Export file must end with one of .txt, .pgm, .ppm, .gz"):
+            validate_params('E', ['out.png'])
+        with self.assertRaisesRegex(CommandError, "E requires 1 parameter: file"):
+            validate_params('E', [])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'layers.txt')
+            out = io.StringIO()
+            run_batch(['C 3 1', 'Y top', 'L 2 1 2 1 x', f'E {path}'], DrawingBoard(), out)
+            with open(path) as text:
+                self.assertEqual(text.read(), ' x \n')
+            self.assertEqual(out.getvalue(), '-----\n| x |\n-----\n')
@@ -0,0 +1,53 @@
+import random
+from unittest import TestCase
+
+from src.drawing_board import DrawingBoard
+from src.fill import FILL_ENGINES, naive_fill, span_fill
+
+
+def random_board(width: int, height: int, seed: int) -> DrawingBoard:
+    rng = random.Random(seed)
+    board = DrawingBoard(fill_engine='naive')
+    board.new_canvas(width, height)
+    for _ in range(width * height // 4):
+        board.canvas.draw_pixel(rng.randint(1, width), rng.randint(1, height), rng.choice('xo'))
+    return board
+
+
+class TestFillEngines(TestCase):
+
+    def test_engines_registered(self):
+        self.assertIs(FILL_ENGINES['naive'], naive_fill)
+        self.assertIs(FILL_ENGINES['span'], span_fill)
+        self.assertEqual(DrawingBoard().fill_engine, 'span')
+        with self.assertRaises(ValueError):
+            DrawingBoard(fill_engine='unknown')
+
+    def test_span_fill_matches_naive_fill(self):
+        for seed in range(20):
+            width, height = 4 + seed % 7, 3 + seed % 5
+            rng = random.Random(seed)
+            naive, span = random_board(width, height, seed), random_board(width, height, seed)
+            for _ in range(5):
+                x, y, c = rng.randint(1, width), rng.randint(1, height), rng.choice('xo*')
+                naive_fill(naive.canvas, x, y, c)
+                span_fill(span.canvas, x, y, c)
+                self.assertEqual(str(naive), str(span), f"seed {seed}, fill at ({x},{y}) with {c!r}")
+
+    def test_span_fill_spiral(self):
+        boards = []
+        for engine in ('naive', 'span'):
+            board = DrawingBoard(fill_engine=engine)
+            board.new_canvas(21, 21)
+            for i in range(1, 11, 2):
+                board.draw_rectangle(i, i, 22 - i, 22 - i, '#')
+                board.canvas.draw_pixel(i, i + 1, ' ')
+            board.bucket_fill(1, 2, '.')
+            boards.append(str(board))
+        self.assertEqual(boards[0], boards[1])
+
+    def test_span_fill_large_empty_canvas(self):
+        board = DrawingBoard()
+        board.new_canvas(2000, 2000)
+        board.bucket_fill(1000, 1000, '*')
+        self.assertTrue(all(''.join(row) == '*' * 2000 for row in board.canvas.pixels))
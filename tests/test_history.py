@@ -0,0 +1,137 @@
+import random
+from unittest import TestCase
+
+from src.drawing_board import DrawingBoard
+from src.exceptions import HistoryError, UnsupportedCharacterError
+from src.history import CanvasChange, History, decode_runs, encode_runs
+
+
+def random_commands(board: DrawingBoard, rng: random.Random, count: int):
+    width, height = board.canvas.width, board.canvas.height
+    for _ in range(count):
+        x1, y1 = rng.randint(1, width), rng.randint(1, height)
+        x2, y2 = rng.randint(1, width), rng.randint(1, height)
+        c = rng.choice('xo#. ')
+        match rng.choice('LRB'):
+            case 'L':
+                board.draw_line(x1, y1, x1, y2, c) if rng.random() < 0.5 else board.draw_line(x1, y1, x2, y1, c)
+            case 'R':
+                board.draw_rectangle(x1, y1, x2, y2, c)
+            case 'B':
+                board.bucket_fill(x1, y1, c)
+        yield str(board)
+
+
+class TestHistory(TestCase):
+
+    def test_runs(self):
+        self.assertEqual(encode_runs('aaab  c'), [('a', 3), ('b', 1), (' ', 2), ('c', 1)])
+        self.assertEqual(decode_runs(encode_runs('aaab  c')), 'aaab  c')
+        self.assertEqual(encode_runs(''), [])
+
+    def test_undo_redo_single_steps(self):
+        for snapshot_every in (1, 3, 100):
+            rng = random.Random(snapshot_every)
+            board = DrawingBoard(history=History(snapshot_every=snapshot_every))
+            board.new_canvas(9, 7)
+            states = {board.history.position: str(board)}
+            for frame in random_commands(board, rng, 30):
+                states[board.history.position] = frame
+
+            for position in range(board.history.position - 1, 0, -1):
+                board.undo()
+                self.assertEqual(str(board), states[position])
+            for position in range(2, max(states) + 1):
+                board.redo()
+                self.assertEqual(str(board), states[position])
+
+    def test_undo_many_steps_uses_snapshots(self):
+        rng = random.Random(7)
+        board = DrawingBoard(history=History(snapshot_every=4))
+        board.new_canvas(12, 6)
+        states = {board.history.position: str(board)}
+        for frame in random_commands(board, rng, 40):
+            states[board.history.position] = frame
+
+        end = board.history.position
+        self.assertEqual(board.undo(13), 13)
+        self.assertEqual(str(board), states[end - 13])
+        self.assertEqual(board.redo(5), 5)
+        self.assertEqual(str(board), states[end - 8])
+        board.undo(board.history.position - 1)
+        self.assertEqual(board.history.position, 1)
+        self.assertEqual(str(board), states[1])
+
+    def test_undo_new_canvas(self):
+        board = DrawingBoard(history=History())
+        board.new_canvas(3, 1)
+        board.draw_line(1, 1, 3, 1, 'x')
+        board.new_canvas(2, 2)
+        board.draw_line(1, 1, 1, 2, 'o')
+
+        board.undo(2)
+        self.assertEqual(str(board), '-----\n|xxx|\n-----')
+        board.redo(2)
+        self.assertEqual(str(board), '----\n|o |\n|o |\n----')
+        board.undo(4)
+        self.assertIsNone(board.canvas)
+        self.assertIsInstance(board.history.entries[0], CanvasChange)
+
+    def test_new_command_discards_redo(self):
+        board = DrawingBoard(history=History())
+        board.new_canvas(3, 1)
+        board.draw_line(1, 1, 3, 1, 'x')
+        board.undo()
+        board.draw_line(1, 1, 1, 1, 'o')
+        with self.assertRaisesRegex(HistoryError, 'Nothing to redo'):
+            board.redo()
+        board.undo(2)
+        with self.assertRaisesRegex(HistoryError, 'Nothing to undo'):
+            board.undo()
+
+    def test_fill_delta_is_compact(self):
+        board = DrawingBoard(history=History())
+        board.new_canvas(200, 100)
+        board.bucket_fill(1, 1, '*')
+        delta = board.history.entries[-1]
+        self.assertTrue(all(runs == [(' ', 200)] for *_, runs, _ in delta.records))
+        board.bucket_fill(5, 5, '*')
+        self.assertEqual(len(board.history.entries), 2)
+
+    def test_history_limit(self):
+        board = DrawingBoard(history=History(limit=3, snapshot_every=2))
+        board.new_canvas(3, 1)
+        for c in 'abcde':
+            board.draw_line(1, 1, 1, 1, c)
+        self.assertEqual(board.history.undo(board, 10), 3)
+        self.assertEqual(str(board), '-----\n|b  |\n-----')
+
+    def test_history_not_enabled(self):
+        board = DrawingBoard()
+        board.new_canvas(3, 1)
+        with self.assertRaises(HistoryError):
+            board.undo()
+
+    def test_failed_commands_are_not_recorded(self):
+        board = DrawingBoard(storage='bytes', history=History())
+        board.new_canvas(4, 3)
+        board.draw_line(1, 1, 4, 1, 'x')
+        with self.assertRaises(UnsupportedCharacterError):
+            board.draw_line(1, 2, 4, 2, '█')
+
+        class FailThirdWrite:
+            writes = 0
+
+            def before_write(self, *write):
+                self.writes += 1
+                if self.writes == 3:
+                    raise RuntimeError('write failed')
+
+        board.canvas.observers.append(FailThirdWrite())
+        with self.assertRaises(RuntimeError):
+            board.draw_rectangle(1, 1, 4, 3, '#')
+        # The spans written before the failure are reverted
+        self.assertEqual(str(board), '------\n|xxxx|\n|    |\n|    |\n------')
+        board.canvas.observers.pop()
+        self.assertEqual(board.undo(), 1)
+        self.assertEqual(str(board), '------\n|    |\n|    |\n|    |\n------')
@@ -0,0 +1,104 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from runner import execute
+from src.canvas import Canvas
+from src.drawing_board import DrawingBoard
+from src.journal import Journal, read_snapshot, write_snapshot
+
+COMMANDS = [
+    ('C', (6, 4)),
+    ('R', (1, 1, 6, 4, '#')),
+    ('L', (2, 2, 5, 2, '-')),
+    ('B', (3, 3, ' ')),
+    ('B', (3, 3, 'é')),
+    ('L', (4, 1, 4, 4, '|')),
+]
+
+
+class TestJournal(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def run_session(self, commands, **options) -> DrawingBoard:
+        board = DrawingBoard()
+        journal = Journal(self.directory.name, **options)
+        journal.restore(board, execute)
+        for cmd, params in commands:
+            execute(board, cmd, params)
+            journal.record(board, cmd, params)
+        journal.close()
+        return board
+
+    def restored(self, **options) -> tuple:
+        board = DrawingBoard()
+        replayed = Journal(self.directory.name, **options).restore(board, execute)
+        return board, replayed
+
+    def test_snapshot_round_trip(self):
+        path = os.path.join(self.directory.name, 'snapshot.bin')
+        canvas = Canvas(5, 3)
+        canvas.fill_horizontal(1, 5, 2, '█')
+        canvas.draw_pixel(3, 3, 'x')
+        write_snapshot(path, canvas, 42)
+        seq, restored = read_snapshot(path, 'wide')
+        self.assertEqual(seq, 42)
+        self.assertEqual(list(restored.iter_rows()), list(canvas.iter_rows()))
+
+        write_snapshot(path, None, 7)
+        self.assertEqual(read_snapshot(path), (7, None))
+
+    def test_restore_replays_journal(self):
+        expected = str(self.run_session(COMMANDS, sync='always'))
+        board, replayed = self.restored()
+        self.assertEqual(replayed, len(COMMANDS))
+        self.assertEqual(str(board), expected)
+
+    def test_restore_from_snapshot_and_tail(self):
+        expected = str(self.run_session(COMMANDS, snapshot_every=4))
+        board, replayed = self.restored()
+        self.assertEqual(replayed, 2)
+        self.assertEqual(str(board), expected)
+
+    def test_restore_continues_session(self):
+        self.run_session(COMMANDS[:3], sync='never', snapshot_every=2)
+        board = self.run_session(COMMANDS[3:], snapshot_every=2)
+        restored, _ = self.restored()
+        self.assertEqual(str(restored), str(board))
+
+    def test_restore_ignores_truncated_last_line(self):
+        expected = str(self.run_session(COMMANDS))
+        with open(os.path.join(self.directory.name, 'journal.log'), 'a') as log:
+            log.write('[7, "L", 1')
+        board, replayed = self.restored()
+        self.assertEqual(replayed, len(COMMANDS))
+        self.assertEqual(str(board), expected)
+
+    def test_restore_twice_after_truncated_line(self):
+        self.run_session(COMMANDS[:3])
+        with open(os.path.join(self.directory.name, 'journal.log'), 'a') as log:
+            log.write('[4, "L", 1')
+        # Commands recorded after the restore must not be glued to the torn line
+        board = self.run_session(COMMANDS[3:])
+        restored, replayed = self.restored()
+        self.assertEqual(replayed, len(COMMANDS))
+        self.assertEqual(str(restored), str(board))
+
+    def test_checkpoint_captures_undo(self):
+        self.run_session(COMMANDS[:3])
+        board = DrawingBoard()
+        journal = Journal(self.directory.name)
+        journal.restore(board, execute)
+        board.canvas.fill_horizontal(2, 5, 2, ' ')
+        journal.checkpoint(board)
+        journal.close()
+        restored, replayed = self.restored()
+        self.assertEqual(replayed, 0)
+        self.assertEqual(str(restored), str(board))
+
+    def test_unknown_sync_policy(self):
+        with self.assertRaises(ValueError):
+            Journal(self.directory.name, sync='sometimes')
@@ -0,0 +1,130 @@
+import io
+import tempfile
+from contextlib import ExitStack
+from unittest import TestCase
+from unittest.mock import patch
+
+from runner import run_batch, validate_params
+from src.drawing_board import DrawingBoard
+from src.exceptions import CommandError, LayerError
+from src.history import History
+from src.journal import Journal
+from src.layers import TRANSPARENT
+
+
+def rows(board: DrawingBoard) -> list:
+    return str(board).split('\n')[1:-1]
+
+
+class TestLayers(TestCase):
+
+    def setUp(self):
+        self.board = DrawingBoard(history=History())
+        self.board.new_canvas(6, 3)
+        self.board.draw_rectangle(1, 1, 4, 3, '#')
+
+    def test_upper_layers_are_transparent(self):
+        self.board.select_layer('top')
+        self.assertEqual(self.board.canvas.get_pixel(1, 1), TRANSPARENT)
+        self.board.draw_line(3, 1, 3, 3, '|')
+        self.assertEqual(rows(self.board), ['|##|#  |', '|# |#  |', '|##|#  |'])
+        self.assertEqual([layer.name for layer in self.board.layers.layers], ['base', 'top'])
+
+    def test_show_hide_and_reorder(self):
+        self.board.select_layer('top')
+        self.board.draw_rectangle(2, 2, 6, 2, '=')
+        self.board.select_layer('mid')
+        self.board.draw_line(6, 2, 6, 2, 'x')
+        self.assertEqual(rows(self.board)[1], '|#====x|')
+        self.board.move_layer('mid', 2)
+        self.assertEqual(rows(self.board)[1], '|#=====|')
+        self.board.set_layer_visible('top', False)
+        self.assertEqual(rows(self.board)[1], '|#  # x|')
+        # The base layer is opaque and hides everything below it
+        self.board.move_layer('base', 3)
+        self.assertEqual(rows(self.board)[1], '|#  #  |')
+        with self.assertRaises(LayerError):
+            self.board.move_layer('top', 4)
+        with self.assertRaises(LayerError):
+            self.board.set_layer_visible('bottom', False)
+
+    def test_bucket_fill_targets(self):
+        self.board.select_layer('top')
+        self.board.bucket_fill(2, 2, '.', view=True)
+        self.assertEqual(rows(self.board)[1], '|#..#  |')
+        self.assertEqual(self.board.canvas.get_pixel(1, 2), TRANSPARENT)
+        # On the layer alone, everything transparent is one area
+        self.board.bucket_fill(5, 2, 'o')
+        self.assertEqual(rows(self.board), ['|oooooo|', '|o..ooo|', '|oooooo|'])
+
+    def test_undo_on_layers(self):
+        self.board.select_layer('top')
+        self.board.draw_line(1, 2, 6, 2, '-')
+        self.board.select_layer('base')
+        self.board.draw_line(1, 3, 6, 3, '_')
+        self.board.undo(2)
+        self.assertEqual(rows(self.board), ['|####  |', '|#  #  |', '|####  |'])
+        self.board.redo()
+        self.assertEqual(rows(self.board)[1], '|------|')
+
+        self.board.new_canvas(2, 1)
+        self.assertIsNone(self.board.layers)
+        self.board.undo()
+        self.assertEqual(rows(self.board)[1], '|------|')
+        self.assertIs(self.board.canvas, self.board.layers.get('base').canvas)
+
+    def test_refresh_follows_changed_area(self):
+        board = DrawingBoard(storage='tiled')
+        board.new_canvas(2000, 2000)
+        for index in range(50):
+            board.select_layer(f'layer {index}')
+            board.draw_line(1, index + 1, 2000, index + 1, '-')
+        str(board)
+        board.draw_line(1000, 1000, 1000, 1000, 'x')
+        with ExitStack() as stack:
+            reads = [stack.enter_context(patch.object(layer.canvas.storage, 'row_text',
+                                                      wraps=layer.canvas.storage.row_text))
+                     for layer in board.layers.layers]
+            board.layers.refresh()
+        calls = [call.args for read in reads for call in read.call_args_list]
+        self.assertTrue(calls)
+        self.assertEqual({(y, stop - start) for y, start, stop in calls}, {(999, 1)})
+        self.assertEqual(board.layers.composite.get_pixel(1000, 1000), 'x')
+
+    def test_fork_layered_board(self):
+        self.board.select_layer('top')
+        fork = self.board.fork()
+        fork.draw_line(1, 2, 6, 2, '-')
+        self.assertEqual(rows(self.board)[1], '|#  #  |')
+        self.assertEqual(rows(fork)[1], '|------|')
+        self.assertEqual(fork.canvas.get_pixel(1, 1), TRANSPARENT)
+
+
+class TestLayerCommands(TestCase):
+
+    def test_validate_params(self):
+        self.assertEqual(validate_params('Y', ['top']), ('top',))
+        self.assertEqual(validate_params('Y', ['top', 'HIDE']), ('top', 'hide'))
+        self.assertEqual(validate_params('Y', ['top', '2']), ('top', 2))
+        self.assertEqual(validate_params('B', ['1', '2', 'x', 'view']), (1, 2, 'x', True))
+        with self.assertRaisesRegex(CommandError, "Layer action must be show, hide or a position"):
+            validate_params('Y', ['top', 'up'])
+        with self.assertRaisesRegex(CommandError, "Layer position must be a positive integer"):
+            validate_params('Y', ['top', '0'])
+        with self.assertRaisesRegex(CommandError, "Y requires a layer name"):
+            validate_params('Y', [])
+
+    def test_run_batch(self):
+        out, err = io.StringIO(), io.StringIO()
+        run_batch(['C 3 1', 'Y ink', 'L 2 1 2 1 x', 'Y ink hide', 'P', 'Y ink show', 'Y base', 'Y nope 1'],
+                  DrawingBoard(), out, err)
+        self.assertEqual(out.getvalue(), '-----\n|   |\n-----\n-----\n| x |\n-----\n')
+        self.assertEqual(err.getvalue(), 'line 8: Drawing error: No layer named nope\n')
+
+    def test_layers_are_not_journaled(self):
+        err = io.StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            journal = Journal(directory)
+            run_batch(['C 3 1', 'Y ink'], DrawingBoard(), io.StringIO(), err, journal=journal)
+            journal.close()
+        self.assertEqual(err.getvalue(), 'line 2: Command error: Layers can not be journaled, restart without --journal\n')
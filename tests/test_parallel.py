@@ -0,0 +1,97 @@
+import io
+import random
+from unittest import TestCase
+
+from runner import run_batch
+from src.drawing_board import DrawingBoard
+from src.exceptions import OutOfCanvasError, UnsupportedCharacterError
+from src.parallel import ParallelExecutor
+from src.storage import ByteStorage, ListStorage
+
+
+def random_script(width: int, height: int, count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    lines = [f'C {width} {height}']
+    for _ in range(count):
+        x1, x2 = rng.randint(1, width), rng.randint(1, width)
+        y1, y2 = rng.randint(1, height), rng.randint(1, height)
+        c = rng.choice('x#o.')
+        match rng.choice('LLRRB'):
+            case 'L' if rng.random() < 0.5:
+                lines.append(f'L {x1} {y1} {x2} {y1} {c}')
+            case 'L':
+                lines.append(f'L {x1} {y1} {x1} {y2} {c}')
+            case 'R':
+                lines.append(f'R {x1} {y1} {x2} {y2} {c}')
+            case 'B':
+                lines.append(f'B {x1} {y1} {c}')
+    lines.append(f'L 1 1 {width + 1} 1 x')
+    return lines
+
+
+class TestParallelExecutor(TestCase):
+
+    def test_matches_sequential_execution(self):
+        for seed in range(3):
+            script = random_script(60, 45, 200, seed)
+            sequential_out, sequential_err = io.StringIO(), io.StringIO()
+            run_batch(script, DrawingBoard(), sequential_out, sequential_err, render_every=50)
+
+            board = DrawingBoard()
+            parallel_out, parallel_err = io.StringIO(), io.StringIO()
+            with ParallelExecutor(workers=3) as executor:
+                run_batch(script, board, parallel_out, parallel_err, render_every=50, executor=executor)
+            self.assertEqual(parallel_out.getvalue(), sequential_out.getvalue())
+            self.assertEqual(parallel_err.getvalue(), sequential_err.getvalue())
+            self.assertIsInstance(board.canvas.storage, ListStorage)
+
+    def test_fill_is_a_barrier(self):
+        board = DrawingBoard()
+        board.new_canvas(10, 8)
+        with ParallelExecutor(workers=4) as executor:
+            executor.submit(board, 'R', (2, 2, 9, 7, '#'))
+            executor.submit(board, 'B', (5, 5, '.'))
+            executor.submit(board, 'L', (1, 4, 10, 4, '-'))
+            executor.flush()
+            self.assertEqual(board.canvas.get_pixel(5, 5), '.')
+            self.assertEqual(board.canvas.get_pixel(1, 4), '-')
+        self.assertEqual(board.canvas.storage.row_text(2), ' #......# ')
+
+    def test_errors_match_sequential_drawing(self):
+        board = DrawingBoard(storage='bytes')
+        board.new_canvas(5, 5)
+        with ParallelExecutor(workers=2) as executor:
+            with self.assertRaises(OutOfCanvasError):
+                executor.submit(board, 'L', (1, 1, 6, 1, 'x'))
+            with self.assertRaises(UnsupportedCharacterError):
+                executor.submit(board, 'R', (1, 1, 3, 3, '█'))
+            self.assertEqual(executor.pending, [])
+            with self.assertRaises(UnsupportedCharacterError):
+                executor.submit(board, 'B', (1, 1, '█'))
+            self.assertIsNone(executor.memory)
+            executor.submit(board, 'L', (1, 1, 5, 1, 'x'))
+            with self.assertRaises(UnsupportedCharacterError):
+                executor.submit(board, 'B', (1, 2, '█'))
+        self.assertEqual(board.canvas.storage.row_text(1), '     ')
+
+    def test_detach_restores_storage_on_error(self):
+        board = DrawingBoard(storage='bytes')
+        board.new_canvas(5, 5)
+        executor = ParallelExecutor(workers=2)
+        executor.submit(board, 'L', (1, 1, 5, 1, 'x'))
+        # Pixels the canvas can not hold, written around the executor
+        board.canvas.storage.fill_span(2, 0, 5, '█')
+        with self.assertRaises(UnsupportedCharacterError):
+            executor.close()
+        self.assertIsInstance(board.canvas.storage, ByteStorage)
+        self.assertIsNone(executor.memory)
+        self.assertIsNone(executor.pool)
+
+    def test_renders_track_parallel_writes(self):
+        board = DrawingBoard()
+        board.new_canvas(6, 6)
+        str(board)
+        with ParallelExecutor(workers=2) as executor:
+            executor.submit(board, 'L', (2, 1, 2, 6, 'x'))
+            executor.flush()
+            self.assertEqual(str(board).split('\n')[1:7], ['| x    |'] * 6)
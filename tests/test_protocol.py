@@ -0,0 +1,81 @@
+import io
+import re
+from unittest import TestCase
+
+from runner import encode_script, parse_command, run_batch, run_binary
+from src.drawing_board import DrawingBoard
+from src.exceptions import CommandError
+from src.history import History
+from src.protocol import HEADER, RECORD, decode_commands, encode_commands, encode_header
+
+
+def record(cmd: str, flags: int = 0, a: int = 0, b: int = 0, c: int = 0, d: int = 0, char: int = 0) -> bytes:
+    opcode = {'C': 1, 'L': 2, 'R': 3, 'B': 4, 'U': 5, 'Z': 6, 'V': 7, 'P': 8, 'S': 9, 'Q': 10}.get(cmd, cmd)
+    return RECORD.pack(opcode, flags, a, b, c, d, char)
+
+
+class TestProtocol(TestCase):
+
+    def test_round_trip(self):
+        lines = ['C 20 10', 'L 1 2 20 2 x', 'R 3 3 8 9 #', 'B 4 4 o', 'B 1 1 . VIEW', 'U', 'Z 3', 'V',
+                 'V -2 5', 'V 1 2 3 4', 'P', 'S', 'H', 'H #', 'Q', 'L 5 1 5 10 █']
+        commands = [parse_command(line) for line in lines]
+        decoded = [(cmd, params) for cmd, params, _ in decode_commands(encode_commands(commands))]
+        self.assertEqual(decoded, commands)
+
+    def test_runs_like_the_text_script(self):
+        script = ['L 1 1 1 1 x', 'C 12 6', 'R 2 2 11 5 #', 'L 1 1 13 1 x', 'B 1 1 .', 'P', 'L 3 3 3 4 |',
+                  'B 4 3 o', 'U 2', 'Z', 'Z 9', 'V 2 2 5 2', 'V 1 1', 'P', 'V', 'L 1 6 12 6 _', 'L 1 1 2 2 x']
+        text_out, text_err = io.StringIO(), io.StringIO()
+        text_failed = run_batch(script, DrawingBoard(history=History()), text_out, text_err, render_every=3)
+        data, failed = encode_script(script, io.StringIO())
+        self.assertEqual(failed, 0)
+        out, err = io.StringIO(), io.StringIO()
+        self.assertEqual(run_binary(data, DrawingBoard(history=History()), out, err, render_every=3), text_failed)
+        self.assertEqual(out.getvalue(), text_out.getvalue())
+        self.assertEqual(err.getvalue(), re.sub('^line', 'command', text_err.getvalue(), flags=re.M))
+
+    def test_validation_errors(self):
+        data = encode_header() + b''.join([
+            record('C', a=5, b=5),
+            record('V', 4, 1, 1, 0, 3),
+            record('V', 3, 1, 1),
+            record('U'),
+            record('B', 2, 1, 1, char=ord('x')),
+            record('L', a=1, b=1, c=1, d=1, char=0x110000),
+            record(42),
+            record('L', a=1, b=1, c=1, d=1, char=ord('x')),
+        ])
+        err = io.StringIO()
+        self.assertEqual(run_binary(data, DrawingBoard(), io.StringIO(), err), 6)
+        self.assertEqual(err.getvalue().splitlines(), [
+            'command 2: Command error: Viewport size must be positive integers',
+            'command 3: Command error: V takes no parameters, dx dy or x y width height',
+            'command 4: Command error: Steps must be a positive integer',
+            'command 5: Command error: B requires 3 parameters: x y c, optionally followed by view',
+            'command 6: Command error: Parameter c must be a character (length 1)',
+            'command 7: Command error: Unknown command: opcode 42',
+        ])
+
+    def test_invalid_files(self):
+        for data, message in [(b'DRW', "too short"), (b'DRWC' + bytes(4), "Not a binary command file"),
+                              (HEADER.pack(b'DRWB', 2), "version: 2"), (encode_header() + b'\1', "partial")]:
+            with self.assertRaisesRegex(CommandError, message):
+                next(decode_commands(data))
+
+    def test_encode_script_reports_what_can_not_be_encoded(self):
+        err = io.StringIO()
+        data, failed = encode_script(['C 3 3', 'Y top', 'S stats.json', 'L 1 1 1 99999999999 x', 'X'], err)
+        self.assertEqual(failed, 4)
+        self.assertEqual(err.getvalue().splitlines(), [
+            'line 2: Command error: Y name can not be encoded in a binary command file',
+            'line 3: Command error: S file can not be encoded in a binary command file',
+            'line 4: Command error: Coordinates must fit in 32-bit integers',
+            'line 5: Command error: Unknown command: X',
+        ])
+        self.assertEqual(len(data), HEADER.size + RECORD.size)
+
+    def test_decodes_long_streams(self):
+        commands = [('L', (1, 2, 30, 2, 'x')), ('R', (1, 1, 5, 5, '#')), ('B', (3, 3, 'o')), ('P', ())] * 10_000
+        decoded = [(cmd, params) for cmd, params, _ in decode_commands(encode_commands(commands))]
+        self.assertEqual(decoded, commands)
@@ -0,0 +1,116 @@
+import random
+from unittest import TestCase
+
+from src.canvas import Canvas
+from src.drawing_board import DrawingBoard
+from src.history import History
+from src.regions import RegionIndex
+
+
+def regions_of(index: RegionIndex) -> set:
+    """The regions of an index as a set of (char, frozenset of 0-based pixels)."""
+    index.region_count()
+    return {(index.chars[root], frozenset((x, y) for y, start, stop in spans for x in range(start, stop)))
+            for root, spans in index.members.items()}
+
+
+class TestRegionIndex(TestCase):
+
+    def test_labels_regions(self):
+        canvas = Canvas(5, 3)
+        canvas.fill_vertical(3, 1, 3, 'x')
+        index = canvas.regions
+        self.assertEqual(index.region_count(), 3)
+        self.assertEqual(index.region_at(0, 0), index.region_at(1, 2))
+        self.assertNotEqual(index.region_at(0, 0), index.region_at(4, 0))
+        self.assertEqual(sorted(index.spans_at(2, 1)), [(0, 2, 3), (1, 2, 3), (2, 2, 3)])
+        self.assertIs(canvas.regions, index)
+
+    def test_writes_split_and_merge_regions(self):
+        canvas = Canvas(5, 3)
+        index = canvas.regions
+        self.assertEqual(index.region_count(), 1)
+        canvas.fill_vertical(3, 1, 3, 'x')
+        self.assertEqual(index.region_count(), 3)
+        canvas.draw_pixel(3, 2, ' ')
+        self.assertEqual(index.region_count(), 3)
+        canvas.draw_pixel(3, 1, ' ')
+        self.assertEqual(index.region_count(), 2)
+
+    def test_fill_merges_with_neighbours(self):
+        canvas = Canvas(5, 1)
+        canvas.draw_pixel(2, 1, 'x')
+        canvas.draw_pixel(4, 1, 'x')
+        index = canvas.regions
+        self.assertEqual(index.region_count(), 5)
+        index.fill(2, 0, 'x')
+        self.assertEqual(index.region_count(), 3)
+        self.assertEqual(canvas.storage.row_text(0), ' xxx ')
+        self.assertEqual(sorted(index.spans_at(1, 0)), [(0, 1, 2), (0, 2, 3), (0, 3, 4)])
+
+    def test_write_only_relabels_touched_regions(self):
+        canvas = Canvas(40, 40)
+        for i in range(2, 40, 4):
+            canvas.fill_vertical(i, 1, 40, '|')
+        index = canvas.regions
+        untouched = index.members[index.region_at(30, 5)]
+        canvas.fill_horizontal(1, 5, 10, '-')
+        self.assertEqual(regions_of(index), regions_of(RegionIndex(canvas)))
+        self.assertIs(index.members[index.region_at(30, 5)], untouched)
+
+    def test_pixels_reported_with_mark_dirty(self):
+        canvas = Canvas(4, 4)
+        index = canvas.regions
+        index.region_count()
+        canvas.pixels[1][1] = 'x'
+        canvas.mark_dirty(2, 2, 2, 2)
+        self.assertEqual(index.region_count(), 2)
+
+    def test_matches_span_fill_across_random_commands(self):
+        for seed in range(10):
+            rng = random.Random(seed)
+            width, height = 6 + seed % 9, 4 + seed % 7
+            commands = []
+            for _ in range(40):
+                kind = rng.choice('LRBBU')
+                x1, x2 = rng.randint(1, width), rng.randint(1, width)
+                y1, y2 = rng.randint(1, height), rng.randint(1, height)
+                commands.append((kind, x1, y1, x2, y2, rng.choice('xo ')))
+
+            boards = {}
+            for engine in ('span', 'indexed'):
+                board = DrawingBoard(fill_engine=engine, history=History())
+                board.new_canvas(width, height)
+                boards[engine] = board
+                for kind, x1, y1, x2, y2, c in commands:
+                    if kind == 'L':
+                        board.draw_line(x1, y1, x1 if x2 % 2 else x2, y1 if x2 % 2 else y1, c)
+                    elif kind == 'R':
+                        board.draw_rectangle(x1, y1, x2, y2, c)
+                    elif kind == 'B':
+                        board.bucket_fill(x1, y1, c)
+                    elif board.history.undo_steps > 1:
+                        board.undo()
+                    if engine == 'indexed' and board.canvas._regions is not None:
+                        index = board.canvas.regions
+                        self.assertEqual(regions_of(index), regions_of(RegionIndex(board.canvas)), f"seed {seed}")
+                        # Ids of relabelled regions do not pile up in the union-find
+                        span_ids = {span[2] for row in index.rows for span in row}
+                        self.assertLessEqual(index.parent.keys(), span_ids, f"seed {seed}")
+            self.assertEqual(str(boards['span']), str(boards['indexed']), f"seed {seed}")
+
+    def test_indexed_fill_on_other_storages(self):
+        for storage in ('bytes', 'wide', 'tiled'):
+            board = DrawingBoard(fill_engine='indexed', storage=storage)
+            board.new_canvas(30, 20)
+            board.draw_rectangle(5, 5, 25, 15, '#')
+            board.bucket_fill(10, 10, '.')
+            board.bucket_fill(1, 1, 'o')
+            board.bucket_fill(10, 10, 'o')
+            expected = DrawingBoard(storage=storage)
+            expected.new_canvas(30, 20)
+            expected.draw_rectangle(5, 5, 25, 15, '#')
+            expected.bucket_fill(10, 10, '.')
+            expected.bucket_fill(1, 1, 'o')
+            expected.bucket_fill(10, 10, 'o')
+            self.assertEqual(str(board), str(expected), storage)
@@ -0,0 +1,132 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from src.canvas import Canvas
+from src.drawing_board import DrawingBoard
+from src.renderer import ANSI_HOME_AND_CLEAR, Renderer, SnapshotRenderer, Viewport, ansi_move, render_viewport
+
+
+class TestRenderer(TestCase):
+
+    def test_dirty_tracking(self):
+        canvas = Canvas(5, 4)
+        canvas.draw_pixel(2, 3, 'x')
+        canvas.fill_vertical(4, 1, 2, '|')
+        self.assertEqual(canvas.take_dirty(), ({0, 1, 2}, (1, 0, 3, 2)))
+        self.assertEqual(canvas.take_dirty(), (set(), None))
+
+        canvas.pixels[3][0] = 'z'
+        canvas.mark_dirty(1, 4, 1, 4)
+        self.assertEqual(canvas.take_dirty(), ({3}, (0, 3, 0, 3)))
+
+    def test_render_rejoins_only_dirty_rows(self):
+        board = DrawingBoard()
+        board.new_canvas(3, 3)
+        first = str(board)
+        cached_lines = list(board.renderer.lines)
+        self.assertIs(str(board), first)
+
+        board.draw_line(1, 2, 3, 2, '-')
+        self.assertEqual(str(board), '-----\n|   |\n|---|\n|   |\n-----')
+        self.assertIs(board.renderer.lines[0], cached_lines[0])
+        self.assertIs(board.renderer.lines[2], cached_lines[2])
+
+    def test_new_canvas_rebuilds_cache(self):
+        board = DrawingBoard()
+        board.new_canvas(3, 1)
+        str(board)
+        board.new_canvas(2, 2)
+        self.assertEqual(str(board), '----\n|  |\n|  |\n----')
+
+    def test_render_diff(self):
+        renderer = Renderer()
+        canvas = Canvas(3, 3)
+        self.assertEqual(renderer.render_diff(canvas),
+                         ANSI_HOME_AND_CLEAR + '-----\n|   |\n|   |\n|   |\n-----\n')
+
+        canvas.draw_pixel(2, 3, 'x')
+        canvas.draw_pixel(1, 1, 'o')
+        self.assertEqual(renderer.render_diff(canvas),
+                         ansi_move(2) + '|o  |' + ansi_move(4) + '| x |' + ansi_move(6) + '\x1b[J')
+        self.assertEqual(renderer.render_diff(canvas), ansi_move(6) + '\x1b[J')
+
+
+class TestViewport(TestCase):
+
+    def test_render_viewport(self):
+        canvas = Canvas(12, 11)
+        canvas.fill_horizontal(1, 12, 10, '-')
+        canvas.draw_pixel(9, 11, 'x')
+        self.assertEqual(render_viewport(canvas, Viewport(8, 9, 3, 5)), '\n'.join([
+            '(8,9)-(10,11) of 12x11',
+            '  -----',
+            ' 9|   |',
+            '10|---|',
+            '11| x |',
+            '  -----',
+        ]))
+
+    def test_scroll_stops_at_canvas_edges(self):
+        canvas = Canvas(10, 10)
+        viewport = Viewport(3, 3, 4, 4)
+        viewport.scroll(100, -100, canvas)
+        self.assertEqual(viewport.bounds(canvas), (7, 1, 10, 4))
+
+    def test_cost_follows_viewport_area(self):
+        for storage in ('list', 'bytes', 'tiled', 'rle'):
+            canvas = Canvas(20_000, 20_000, storage)
+            canvas.fill_vertical(15_000, 1, 20_000, '|')
+            with patch.object(canvas.storage, 'row_text', wraps=canvas.storage.row_text) as row_text:
+                frame = render_viewport(canvas, Viewport(14_990, 12_000, 20, 10))
+            # Only the 20 visible pixels of the 10 visible rows are read
+            self.assertEqual(row_text.call_count, 10, storage)
+            self.assertEqual({stop - start for _, start, stop in (call.args for call in row_text.call_args_list)}, {20})
+            self.assertEqual(frame.split('\n')[2], '12000|' + ' ' * 10 + '|' + ' ' * 9 + '|')
+
+    def test_board_viewport(self):
+        board = DrawingBoard()
+        board.new_canvas(5, 5)
+        board.draw_rectangle(1, 1, 5, 5, '#')
+        board.set_viewport(4, 4, 3, 3)
+        self.assertEqual(str(board).split('\n')[2:4], ['4| #|', '5|##|'])
+        self.assertTrue(board.render_diff().startswith(ANSI_HOME_AND_CLEAR + '(4,4)-(5,5) of 5x5\n'))
+        board.clear_viewport()
+        self.assertEqual(str(board).split('\n')[1], '|#####|')
+
+
+class TestSnapshotRenderer(TestCase):
+
+    def test_redraws_rows_of_skipped_snapshots(self):
+        board = DrawingBoard()
+        board.new_canvas(3, 4)
+        renderer = SnapshotRenderer(diff=True)
+        self.assertTrue(renderer.render(board.snapshot()).startswith(ANSI_HOME_AND_CLEAR))
+        board.draw_line(1, 1, 3, 1, 'x')
+        renderer.skip(board.snapshot())
+        board.draw_line(1, 3, 3, 3, 'o')
+        snapshot = board.snapshot()
+        board.draw_line(1, 4, 3, 4, '-')
+        self.assertEqual(renderer.render(snapshot), ansi_move(2) + '|xxx|' + ansi_move(4) + '|ooo|' +
+                         ansi_move(7) + '\x1b[J')
+
+    def test_snapshots_and_board_renders_keep_their_rows(self):
+        board = DrawingBoard()
+        board.new_canvas(3, 2)
+        renderer = SnapshotRenderer()
+        str(board)
+        board.draw_line(1, 1, 3, 1, 'x')
+        renderer.render(board.snapshot())
+        self.assertEqual(str(board).split('\n')[1], '|xxx|')
+        board.draw_line(1, 2, 3, 2, 'o')
+        str(board)
+        self.assertEqual(renderer.render(board.snapshot()), '-----\n|xxx|\n|ooo|\n-----\n')
+
+    def test_viewport_snapshots(self):
+        board = DrawingBoard()
+        board.new_canvas(3, 3)
+        renderer = SnapshotRenderer()
+        board.set_viewport(2, 2, 1, 1)
+        self.assertEqual(renderer.render(board.snapshot()), '(2,2)-(2,2) of 3x3\n ---\n2| |\n ---\n')
+        board.clear_viewport()
+        board.draw_line(1, 1, 1, 1, 'x')
+        self.assertEqual(renderer.render(board.snapshot()), '-----\n|x  |\n|   |\n|   |\n-----\n')
@@ -1,8 +1,14 @@
+import io
+import re
+import threading
+import time
 import unittest
 from unittest.mock import patch
 
 from runner import main
-from runner import validate_params
+from runner import run_batch, run_pipeline, validate_params
+from src.drawing_board import DrawingBoard
+from src.history import History
 from src.exceptions import CommandError
 
 
@@ -108,3 +114,173 @@ class TestRunner(unittest.TestCase):
                     any_error = True
                     break
         self.assertFalse(any_error, "Error Found")
+
+    @patch('builtins.input')
+    @patch('builtins.print')
+    def test_main_pipeline_does_not_prompt(self, mock_print, mock_input):
+        mock_input.side_effect = ['C 3 1', 'Q']
+        with patch('sys.stdout', new_callable=io.StringIO) as out:
+            main(pipeline=True)
+        self.assertEqual([call.args for call in mock_input.call_args_list], [('',), ('',)])
+        self.assertEqual(out.getvalue(), '-----\n|   |\n-----\n')
+        mock_print.assert_any_call('Quitting...')
+
+    def test_validate_params_print_command(self):
+        """Test validation of print command."""
+        self.assertEqual(validate_params('P', []), ())
+        with self.assertRaisesRegex(CommandError, "P takes no parameters"):
+            validate_params('P', ['1'])
+
+    def test_run_batch_renders_at_end(self):
+        """Test batch mode renders only once after the last command."""
+        out, err = io.StringIO(), io.StringIO()
+        script = ['C 3 2', 'L 1 1 3 1 x', '', '# comment', 'B 2 2 o']
+        failed = run_batch(script, DrawingBoard(), out, err)
+        self.assertEqual(failed, 0)
+        self.assertEqual(out.getvalue(), '-----\n|xxx|\n|ooo|\n-----\n')
+        self.assertEqual(err.getvalue(), '')
+
+    def test_run_batch_print_and_render_every(self):
+        """Test explicit print commands and periodic renders in batch mode."""
+        out = io.StringIO()
+        run_batch(['C 1 1', 'P', 'L 1 1 1 1 a', 'L 1 1 1 1 b', 'L 1 1 1 1 c'],
+                  DrawingBoard(), out, io.StringIO(), render_every=2)
+        self.assertEqual(out.getvalue().split('\n---\n'), ['---\n| |', '---\n|a|', '---\n|c|', ''])
+
+    def test_run_batch_reports_errors_with_line_numbers(self):
+        """Test batch mode reports errors per line and keeps going."""
+        out, err = io.StringIO(), io.StringIO()
+        failed = run_batch(['L 1 1 1 1 x', 'C 2 2', 'X', 'L 1 1 3 1 x', 'B 1 1 o', 'Q', 'C 5 5'],
+                           DrawingBoard(), out, err)
+        self.assertEqual(failed, 3)
+        self.assertEqual(err.getvalue().splitlines(), [
+            'line 1: Drawing error: Canvas not ready, please initiate a new canvas',
+            'line 3: Command error: Unknown command: X',
+            'line 4: Drawing error: The required pixel (3,1) is outside of the canvas [2, 2]',
+        ])
+        self.assertEqual(out.getvalue(), '----\n|oo|\n|oo|\n----\n')
+
+    def test_validate_params_undo_redo_commands(self):
+        """Test validation of undo and redo commands."""
+        self.assertEqual(validate_params('U', []), (1,))
+        self.assertEqual(validate_params('Z', ['3']), (3,))
+        with self.assertRaisesRegex(CommandError, "Steps must be a positive integer"):
+            validate_params('U', ['0'])
+        with self.assertRaisesRegex(CommandError, "Steps must be an integer"):
+            validate_params('Z', ['x'])
+        with self.assertRaisesRegex(CommandError, "U takes at most 1 parameter: steps"):
+            validate_params('U', ['1', '2'])
+
+    def test_run_batch_undo(self):
+        """Test undo and redo in batch mode."""
+        out = io.StringIO()
+        run_batch(['C 3 1', 'L 1 1 3 1 x', 'L 2 1 2 1 o', 'U 2', 'Z'], DrawingBoard(history=History()), out)
+        self.assertEqual(out.getvalue(), '-----\n|xxx|\n-----\n')
+
+    def test_validate_params_viewport_command(self):
+        """Test validation of viewport commands."""
+        self.assertEqual(validate_params('V', []), ())
+        self.assertEqual(validate_params('V', ['-2', '3']), (-2, 3))
+        self.assertEqual(validate_params('V', ['1', '2', '30', '10']), (1, 2, 30, 10))
+        with self.assertRaisesRegex(CommandError, "Viewport size must be positive integers"):
+            validate_params('V', ['1', '1', '0', '10'])
+        with self.assertRaisesRegex(CommandError, "V takes no parameters, dx dy or x y width height"):
+            validate_params('V', ['1'])
+
+    def test_run_batch_viewport(self):
+        """Test setting, scrolling and clearing the viewport in batch mode."""
+        out, err = io.StringIO(), io.StringIO()
+        run_batch(['C 4 3', 'V 1 1', 'L 1 3 4 3 x', 'V 1 1 2 2', 'V 5 5', 'P', 'V'], DrawingBoard(), out, err)
+        self.assertEqual(out.getvalue(), '(3,2)-(4,3) of 4x3\n ----\n2|  |\n3|xx|\n ----\n'
+                                         '------\n|    |\n|    |\n|xxxx|\n------\n')
+        self.assertEqual(err.getvalue(), 'line 2: Drawing error: No viewport to scroll, set one first\n')
+
+
+# A frame, with the header of a viewport
+FRAME = re.compile(r'(?:\(.*\n)? *-+\n(?:.*\|\n)*? *-+\n')
+
+
+class SlowOutput(io.StringIO):
+    """An output stream that takes a while to write frames."""
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+        self.frames = 0
+
+    def write(self, text: str) -> int:
+        if text.startswith('-'):
+            self.frames += 1
+            time.sleep(self.delay)
+        return super().write(text)
+
+
+def replay(output: str) -> list:
+    """The lines a terminal shows after writing diff output to it."""
+    screen, row = [], 0
+    for move, text in re.findall(r'(\x1b\[H\x1b\[2J|\x1b\[\d+;1H|\x1b\[J)?([^\x1b]*)', output):
+        if move == '\x1b[H\x1b[2J':
+            screen, row = [], 0
+        elif move == '\x1b[J':
+            del screen[row:]
+        elif move:
+            row = int(move[2:move.index(';')]) - 1
+        for line in text.split('\n')[:-1] if text.endswith('\n') else text.split('\n'):
+            screen[row:row + 1] = [line]
+            row += 1
+    return [line for line in screen if line]
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_matches_run_batch(self):
+        """Test the pipeline reports what run_batch reports and draws some of its frames, ending with the last."""
+        script = ['L 1 1 1 1 x', 'C 4 3', 'X', 'P', 'R 1 1 4 3 #', 'L 1 1 5 1 x', 'B 2 2 o', 'V 2 2 2 1',
+                  '# comment', 'L 2 2 3 2 -', 'P', 'V', 'Q', 'C 5 5']
+        for render_every in (0, 1, 2):
+            results = []
+            for run in (run_batch, run_pipeline):
+                out, err = io.StringIO(), io.StringIO()
+                failed = run(script, DrawingBoard(), out, err, render_every=render_every)
+                results.append((failed, FRAME.findall(out.getvalue()), err.getvalue()))
+            (failed, frames, errors), (pipeline_failed, pipeline_frames, pipeline_errors) = results
+            self.assertEqual((pipeline_failed, pipeline_errors), (failed, errors))
+            self.assertEqual(pipeline_frames[-1], frames[-1])
+            remaining = iter(frames)
+            self.assertTrue(all(frame in remaining for frame in pipeline_frames), f"render_every {render_every}")
+
+    def test_errors_keep_command_order(self):
+        """Test error messages are written in the order of the failing lines."""
+        err = io.StringIO()
+        script = ['C 2 2'] + [f'L 1 1 {x} 1 x' for x in range(1, 40)]
+        self.assertEqual(run_pipeline(script, DrawingBoard(), io.StringIO(), err, queue_size=2), 37)
+        self.assertEqual(err.getvalue().splitlines(), [
+            f'line {x + 1}: Drawing error: The required pixel ({x},1) is outside of the canvas [2, 2]'
+            for x in range(3, 40)
+        ])
+
+    def test_slow_output_coalesces_frames(self):
+        """Test only the latest state is drawn when frames are written slower than commands run."""
+        out = SlowOutput(0.02)
+        script = ['C 30 3'] + [f'L {x} 2 {x} 2 x' for x in range(1, 31)]
+        run_pipeline(script, DrawingBoard(), out, io.StringIO(), render_every=1)
+        self.assertLess(out.frames, 31)
+        self.assertEqual(FRAME.findall(out.getvalue())[-1].split('\n')[2], '|' + 'x' * 30 + '|')
+
+    def test_diff_frames_follow_skipped_changes(self):
+        """Test diff output redraws the rows changed in frames that were skipped."""
+        out = SlowOutput(0.02)
+        script = ['C 3 20'] + [f'L 1 {y} 3 {y} x' for y in range(1, 21)]
+        run_pipeline(script, DrawingBoard(), out, io.StringIO(), render_every=1, diff=True)
+        self.assertEqual(replay(out.getvalue()), ['-----'] + ['|xxx|'] * 20 + ['-----'])
+
+    def test_failing_output_stops_the_pipeline(self):
+        """Test an output error is raised once every stage has stopped."""
+        class Broken(io.StringIO):
+            def write(self, text):
+                raise OSError('disk full')
+
+        with self.assertRaisesRegex(OSError, 'disk full'):
+            run_pipeline(['C 2 2'] + ['L 1 1 2 1 x'] * 100, DrawingBoard(), Broken(), io.StringIO(),
+                         render_every=1, queue_size=1)
+        self.assertEqual([thread for thread in threading.enumerate() if thread.daemon], [])
@@ -0,0 +1,180 @@
+import asyncio
+import os
+import socket
+import tempfile
+import threading
+from unittest import IsolatedAsyncioTestCase, skipUnless
+
+from server import DrawingServer
+
+
+class Client:
+    """A loopback client reading responses up to their status line."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    async def send(self, command: str) -> list:
+        self.writer.write((command + '\n').encode())
+        await self.writer.drain()
+        lines = []
+        while True:
+            line = (await self.reader.readline()).decode().rstrip('\n')
+            lines.append(line)
+            if line == 'OK' or line.startswith('ERR '):
+                return lines
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+class TestDrawingServer(IsolatedAsyncioTestCase):
+
+    async def start(self, **options) -> DrawingServer:
+        self.server = DrawingServer(**options)
+        self.clients = []
+        self.listener = await self.server.start_tcp()
+        self.port = self.listener.sockets[0].getsockname()[1]
+        return self.server
+
+    async def connect(self) -> Client:
+        client = Client(*await asyncio.open_connection('127.0.0.1', self.port))
+        self.clients.append(client)
+        return client
+
+    async def asyncTearDown(self):
+        for client in self.clients:
+            await client.close()
+        while self.server.sessions:
+            await asyncio.sleep(0.01)
+        self.listener.close()
+        await self.listener.wait_closed()
+        self.server.close()
+
+    async def test_full_render_responses(self):
+        await self.start()
+        client = await self.connect()
+        self.assertEqual(await client.send('C 3 2'), ['-----', '|   |', '|   |', '-----', 'OK'])
+        self.assertEqual(await client.send('L 1 1 3 1 x'), ['-----', '|xxx|', '|   |', '-----', 'OK'])
+        self.assertEqual(await client.send('L 1 1 4 1 x'),
+                         ['ERR Drawing error: The required pixel (4,1) is outside of the canvas [3, 2]'])
+        self.assertEqual(await client.send('X'), ['ERR Command error: Unknown command: X'])
+
+    async def test_ack_and_diff_modes(self):
+        await self.start(mode='ack')
+        client = await self.connect()
+        self.assertEqual(await client.send('C 3 2'), ['OK'])
+        self.assertEqual(await client.send('B 1 1 o'), ['OK'])
+        self.assertEqual(await client.send('P'), ['-----', '|ooo|', '|ooo|', '-----', 'OK'])
+        self.assertEqual(await client.send('M diff'), ['OK'])
+        self.assertEqual(await client.send('L 1 2 3 2 x'), ['\x1b[3;1H|xxx|\x1b[5;1H\x1b[J', 'OK'])
+        self.assertEqual(await client.send('M everything'),
+                         ['ERR Command error: M takes one of full, diff, ack'])
+
+    async def test_sessions_are_independent(self):
+        await self.start(mode='ack')
+        clients = [await self.connect() for _ in range(20)]
+        await asyncio.gather(*(client.send(f'C {i + 1} 1') for i, client in enumerate(clients)))
+        await asyncio.gather(*(client.send(f'L 1 1 {i + 1} 1 {i % 10}') for i, client in enumerate(clients)))
+        frames = await asyncio.gather(*(client.send('P') for client in clients))
+        for i, frame in enumerate(frames):
+            self.assertEqual(frame[1], '|' + str(i % 10) * (i + 1) + '|')
+        self.assertEqual(len(self.server.sessions), 20)
+
+    async def test_large_commands_run_in_executor(self):
+        await self.start(mode='ack', offload_pixels=1)
+        big, small = await self.connect(), await self.connect()
+        await big.send('C 400 400')
+        await small.send('C 2 1')
+        results = await asyncio.gather(big.send('B 1 1 x'), small.send('L 1 1 2 1 y'))
+        self.assertEqual(results, [['OK'], ['OK']])
+        self.assertEqual((await big.send('P'))[400], '|' + 'x' * 400 + '|')
+
+    async def test_new_large_canvas_runs_in_executor(self):
+        server = await self.start(mode='ack', offload_pixels=1000)
+        threads = []
+        run = server._run
+
+        def recording_run(session, cmd, params):
+            threads.append(threading.current_thread())
+            return run(session, cmd, params)
+
+        server._run = recording_run
+        client = await self.connect()
+        await client.send('C 10 10')
+        await client.send('C 40 40')
+        await client.send('L 1 1 1 1 x')
+        self.assertEqual([thread is threading.main_thread() for thread in threads], [True, False, False])
+
+    async def test_long_lines_are_skipped(self):
+        await self.start(mode='ack')
+        client = await self.connect()
+        self.assertEqual(await client.send('C 2 1'), ['OK'])
+        for length in (70_000, 300_000):
+            self.assertEqual(await client.send('L 1 1 2 1 ' + 'x' * length),
+                             ['ERR Command error: line too long'])
+            self.assertEqual(await client.send('L 1 1 2 1 y'), ['OK'])
+        self.assertEqual((await client.send('P'))[1], '|yy|')
+
+    async def test_stats(self):
+        await self.start(mode='ack', stats=True)
+        client = await self.connect()
+        await client.send('C 3 2')
+        await client.send('L 1 1 3 1 x')
+        response = await client.send('S')
+        self.assertEqual(response[-1], 'OK')
+        self.assertTrue(any(line.startswith('draw_line') for line in response))
+        self.assertEqual(await client.send('S stats.json'),
+                         ['ERR Command error: S file is not available on the server, use S'])
+        self.assertFalse(os.path.exists('stats.json'))
+
+    async def test_content_query(self):
+        await self.start(mode='ack')
+        client = await self.connect()
+        await client.send('C 3 2')
+        await client.send('L 1 1 3 1 #')
+        response = await client.send('H')
+        self.assertRegex(response[0], '^Hash: [0-9a-f]{16}$')
+        self.assertEqual(response[1:], ["' ': 3", "'#': 3", 'OK'])
+        self.assertEqual(await client.send('H #'), ["'#': 3", 'OK'])
+        self.assertEqual(await client.send('H ##'), ['ERR Command error: Parameter c must be a character (length 1)'])
+
+    async def test_export_is_refused(self):
+        await self.start(mode='ack')
+        client = await self.connect()
+        await client.send('C 3 2')
+        self.assertEqual(await client.send('E canvas.txt'), ['ERR Command error: E is not available on the server'])
+        self.assertFalse(os.path.exists('canvas.txt'))
+
+    async def test_stats_disabled(self):
+        await self.start(mode='ack')
+        client = await self.connect()
+        self.assertEqual(await client.send('S'),
+                         ['ERR Command error: Statistics are not enabled, restart with --stats'])
+
+    async def test_quit_closes_session(self):
+        await self.start()
+        client = await self.connect()
+        self.assertEqual(await client.send('Q'), ['OK'])
+        self.assertEqual(await client.reader.read(), b'')
+
+
+@skipUnless(hasattr(socket, 'AF_UNIX'), "Unix sockets are not available")
+class TestUnixSocketServer(IsolatedAsyncioTestCase):
+
+    async def test_unix_socket_session(self):
+        server = DrawingServer(mode='ack')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'drawing.sock')
+            listener = await server.start_unix(path)
+            client = Client(*await asyncio.open_unix_connection(path))
+            self.assertEqual(await client.send('C 2 2'), ['OK'])
+            self.assertEqual(await client.send('P'), ['----', '|  |', '|  |', '----', 'OK'])
+            await client.close()
+            while server.sessions:
+                await asyncio.sleep(0.01)
+            listener.close()
+            await listener.wait_closed()
+        server.close()
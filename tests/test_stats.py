@@ -0,0 +1,129 @@
+import io
+import json
+import os
+import tempfile
+import tracemalloc
+from unittest import TestCase
+
+from runner import run_batch
+from src.drawing_board import DrawingBoard
+from src.history import History
+from src.stats import LatencyHistogram, Stats
+
+
+class TestLatencyHistogram(TestCase):
+
+    def test_buckets_and_percentiles(self):
+        histogram = LatencyHistogram()
+        for microseconds in (1, 3, 3, 100, 5000):
+            histogram.record(microseconds / 1e6)
+        summary = histogram.to_dict()
+        self.assertEqual(summary['count'], 5)
+        self.assertEqual(summary['buckets_us'], {'<2': 1, '<4': 2, '<128': 1, '<8192': 1})
+        self.assertEqual(summary['p50_us'], 4.0)
+        self.assertEqual(summary['p99_us'], 5000.0)
+        self.assertEqual(summary['min_us'], 1.0)
+
+
+class TestStats(TestCase):
+
+    def test_board_operations_are_measured(self):
+        stats = Stats()
+        board = DrawingBoard(stats=stats, history=History())
+        board.new_canvas(20, 10)
+        board.draw_line(1, 1, 20, 1, 'x')
+        board.draw_rectangle(2, 3, 6, 7, '#')
+        board.bucket_fill(4, 5, '.')
+        board.bucket_fill(10, 8, 'o')
+        board.undo()
+        frame = str(board)
+
+        self.assertEqual({name: histogram.count for name, histogram in stats.latency.items()},
+                         {'new_canvas': 1, 'draw_line': 1, 'draw_rectangle': 1, 'bucket_fill': 2, 'undo': 1,
+                          'render': 1})
+        self.assertEqual(stats.pixels['draw_line'], 20)
+        self.assertEqual(stats.pixels['draw_rectangle'], 5 + 5 + 5 + 5)
+        self.assertEqual(stats.fill.fills, 2)
+        self.assertGreaterEqual(stats.fill.visited, 9 + 200 - 20 - 25)
+        self.assertGreaterEqual(stats.fill.peak_depth, 1)
+        self.assertEqual(stats.render_bytes, len(frame))
+        self.assertEqual(board.canvas.observers, [])
+
+    def test_naive_fill_counts_visited_pixels(self):
+        stats = Stats()
+        board = DrawingBoard(fill_engine='naive', stats=stats)
+        board.new_canvas(5, 4)
+        board.bucket_fill(1, 1, 'x')
+        self.assertEqual(stats.fill.visited, 20)
+        self.assertEqual(stats.pixels['bucket_fill'], 20)
+
+    def test_failed_commands_write_no_pixels(self):
+        stats = Stats()
+        board = DrawingBoard(stats=stats, history=History())
+        board.new_canvas(4, 3)
+
+        class FailThirdWrite:
+            writes = 0
+
+            def before_write(self, *write):
+                self.writes += 1
+                if self.writes == 3:
+                    raise RuntimeError('write failed')
+
+        board.canvas.observers.append(FailThirdWrite())
+        with self.assertRaises(RuntimeError):
+            board.draw_rectangle(1, 1, 4, 3, '#')
+        board.canvas.observers.pop()
+        self.assertEqual(stats.pixels['draw_rectangle'], 0)
+        self.assertEqual(stats.latency['draw_rectangle'].count, 1)
+        board.draw_rectangle(1, 1, 4, 3, '#')
+        self.assertEqual(stats.pixels['draw_rectangle'], 14)
+
+    def test_sampled_profiles_and_memory(self):
+        stats = Stats(profile_every=2, trace_memory=True)
+        board = DrawingBoard(stats=stats)
+        board.new_canvas(50, 50)
+        board.bucket_fill(1, 1, 'x')
+        self.assertIn('bucket_fill', stats.memory_peaks)
+        self.assertTrue(any('span_fill' in row['function'] for row in stats.profile_rows()))
+
+    def test_sampling_counts_top_level_operations(self):
+        stats = Stats(profile_every=3)
+        for name in ('first', 'second', 'third'):
+            with stats.measure(name):
+                with stats.measure('nested'):
+                    pass
+        self.assertEqual(stats.measured, 3)
+        self.assertIsNotNone(stats.profile)
+
+    def test_sampling_keeps_running_memory_traces(self):
+        stats = Stats(profile_every=1, trace_memory=True)
+        tracemalloc.start()
+        try:
+            with stats.measure('traced'):
+                pass
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+        with stats.measure('traced'):
+            pass
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertIn('traced', stats.memory_peaks)
+
+    def test_runner_stats_command_and_json_dump(self):
+        out, err = io.StringIO(), io.StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'stats.json')
+            board = DrawingBoard(stats=Stats())
+            run_batch(['C 4 3', 'L 1 1 4 1 x', 'S', f'S {path}', 'S a b'], board, out, err)
+            with open(path) as stats_file:
+                dumped = json.load(stats_file)
+        self.assertIn('draw_line', out.getvalue())
+        self.assertEqual(dumped['operations']['draw_line']['pixels_written'], 4)
+        self.assertEqual(dumped['operations']['validate_params']['count'], 4)
+        self.assertEqual(err.getvalue(), "line 5: Command error: S takes at most 1 parameter: file\n")
+
+    def test_stats_command_requires_stats(self):
+        out, err = io.StringIO(), io.StringIO()
+        run_batch(['S'], DrawingBoard(), out, err)
+        self.assertEqual(err.getvalue(), "line 1: Command error: Statistics are not enabled, restart with --stats\n")
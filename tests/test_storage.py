@@ -0,0 +1,308 @@
+import random
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+
+from src.canvas import Canvas
+from src.drawing_board import DrawingBoard
+from src.exceptions import UnsupportedCharacterError
+from src.fill import FILL_ENGINES
+from src.history import History
+from src.storage import (STORAGE_BACKENDS, ByteStorage, NumpyStorage, RunStorage, TiledStorage, WideStorage,
+                         _scanline_region, numpy)
+
+
+class TestStorage(TestCase):
+
+    def test_backends_share_pixel_semantics(self):
+        for name in STORAGE_BACKENDS:
+            canvas = Canvas(4, 3, storage=name)
+            self.assertEqual(canvas.get_pixel(1, 1), ' ')
+            canvas.draw_pixel(2, 3, 'x')
+            self.assertEqual(canvas.get_pixel(2, 3), 'x')
+            self.assertEqual(len(canvas.pixels), 3)
+            self.assertEqual(len(canvas.pixels[0]), 4)
+            self.assertEqual(canvas.pixels[2][1], 'x')
+            self.assertEqual(list(canvas.pixels[2]), [' ', 'x', ' ', ' '])
+            self.assertEqual(list(canvas.iter_rows()), ['    ', '    ', ' x  '])
+
+    def test_row_view_writes(self):
+        for name in ('bytes', 'wide'):
+            canvas = Canvas(4, 2, storage=name)
+            canvas.pixels[0][1:3] = ['a', 'b']
+            canvas.pixels[1][-1] = 'z'
+            self.assertEqual(list(canvas.iter_rows()), [' ab ', '   z'])
+            with self.assertRaises(ValueError):
+                canvas.pixels[0][0:2] = ['a']
+
+    def test_fill_span(self):
+        for name in STORAGE_BACKENDS:
+            canvas = Canvas(5, 1, storage=name)
+            canvas.storage.fill_span(0, 1, 4, '#')
+            self.assertEqual(next(canvas.iter_rows()), ' ### ')
+
+    def test_byte_storage_is_compact(self):
+        self.assertEqual(len(ByteStorage(100, 100).buffer), 100 * 100)
+        self.assertEqual(WideStorage(100, 100).buffer.itemsize * len(WideStorage(100, 100).buffer),
+                         4 * 100 * 100)
+
+    def test_byte_storage_rejects_wide_characters(self):
+        canvas = Canvas(3, 3, storage='bytes')
+        canvas.draw_pixel(1, 1, 'é')
+        self.assertEqual(canvas.get_pixel(1, 1), 'é')
+        with self.assertRaises(UnsupportedCharacterError):
+            canvas.draw_pixel(1, 1, '█')
+
+        canvas = Canvas(3, 3, storage='wide')
+        canvas.draw_pixel(1, 1, '█')
+        self.assertEqual(canvas.get_pixel(1, 1), '█')
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            Canvas(3, 3, storage='unknown')
+
+    def test_drawing_board_uses_backend(self):
+        outputs = []
+        for name in STORAGE_BACKENDS:
+            board = DrawingBoard(storage=name)
+            board.new_canvas(7, 7)
+            board.draw_rectangle(1, 1, 7, 7, '*')
+            board.draw_line(4, 1, 4, 5, 'o')
+            board.bucket_fill(2, 2, '#')
+            self.assertIsInstance(board.canvas.storage, STORAGE_BACKENDS[name])
+            outputs.append(str(board))
+        self.assertEqual(len(set(outputs)), 1)
+
+
+class TestFork(TestCase):
+
+    def test_forks_are_independent(self):
+        for name in STORAGE_BACKENDS:
+            canvas = Canvas(70, 6, storage=name)
+            canvas.fill_rect(1, 1, 70, 3, '#')
+            canvas.draw_pixel(5, 2, 'o')
+            fork = canvas.fork()
+            grandchild = fork.fork()
+            canvas.fill_horizontal(1, 70, 2, 'a')
+            fork.fill_vertical(5, 1, 6, 'b')
+            fork.pixels[5][0] = 'c'
+            rows = ['#' * 70, '####o' + '#' * 65, '#' * 70, *[' ' * 70] * 3]
+            self.assertEqual(list(grandchild.iter_rows()), rows, name)
+            self.assertEqual(list(canvas.iter_rows()), [rows[0], 'a' * 70, *rows[2:]], name)
+            self.assertEqual(list(fork.iter_rows()), [
+                '####b' + '#' * 65, '####b' + '#' * 65, '####b' + '#' * 65,
+                '    b' + ' ' * 65, '    b' + ' ' * 65, 'c   b' + ' ' * 65], name)
+
+    def test_rows_are_copied_on_first_write(self):
+        storage = STORAGE_BACKENDS['list'](4, 3)
+        fork = storage.fork()
+        self.assertTrue(all(row is fork_row for row, fork_row in zip(storage.rows, fork.rows)))
+        fork.set(1, 1, 'x')
+        self.assertIsNot(fork.rows[1], storage.rows[1])
+        self.assertIs(fork.rows[0], storage.rows[0])
+
+    def test_buffer_is_copied_once(self):
+        storage = ByteStorage(4, 3)
+        fork = storage.fork()
+        self.assertIs(fork.buffer, storage.buffer)
+        storage.set(0, 0, 'x')
+        self.assertIsNot(fork.buffer, storage.buffer)
+        buffer = fork.buffer
+        fork.set(0, 0, 'y')
+        self.assertIs(fork.buffer, buffer)
+
+    def test_rejected_writes_keep_the_buffer_shared(self):
+        storage = ByteStorage(4, 3)
+        fork = storage.fork()
+        writes = [(storage.set, (1, 0)), (storage.fill_span, (0, 1, 3)), (storage.fill_column, (1, 0, 2)),
+                  (storage.fill_rect, (0, 0, 2, 2))]
+        for write, args in writes:
+            with self.assertRaises(UnsupportedCharacterError):
+                write(*args, '█')
+        self.assertIs(fork.buffer, storage.buffer)
+
+    def test_dropped_forks_release_the_buffer(self):
+        backends = [ByteStorage, WideStorage] + ([NumpyStorage] if numpy is not None else [])
+        for backend in backends:
+            storage = backend(4, 3)
+            shared = lambda: storage.array if backend is NumpyStorage else storage.buffer
+            buffer = shared()
+            storage.fork()
+            storage.set(0, 0, 'x')
+            self.assertIs(shared(), buffer, backend)
+
+            # A fork that copied the buffer before being dropped no longer counts
+            copied, kept = storage.fork(), storage.fork()
+            copied.set(1, 0, 'y')
+            del copied
+            storage.set(2, 0, 'z')
+            self.assertIsNot(shared(), buffer, backend)
+            self.assertEqual(kept.get(2, 0), ' ', backend)
+
+    def test_tiles_are_copied_on_first_write(self):
+        storage = TiledStorage(200, 200)
+        storage.set(0, 0, 'x')
+        storage.fill_rect(64, 0, 128, 64, '#')
+        fork = storage.fork()
+        fork.set(1, 1, 'y')
+        self.assertEqual(fork.tiles[1, 0], '#')
+        self.assertEqual(storage.get(1, 1), ' ')
+        self.assertIsNot(fork.tiles[0, 0], storage.tiles[0, 0])
+
+
+class TestTiledStorage(TestCase):
+
+    def test_matches_list_storage(self):
+        for seed in range(10):
+            rng = random.Random(seed)
+            width, height = rng.randint(5, 23), rng.randint(5, 23)
+            boards = [DrawingBoard(Canvas(width, height)),
+                      DrawingBoard(Canvas(width, height, TiledStorage(width, height, tile_size=4)))]
+            for _ in range(25):
+                x1, y1 = rng.randint(1, width), rng.randint(1, height)
+                x2, y2 = rng.randint(1, width), rng.randint(1, height)
+                c, fill, shape = rng.choice('xo '), rng.choice('#.'), rng.choice('FRL')
+                for board in boards:
+                    match shape:
+                        case 'F':
+                            board.canvas.fill_rect(x1, y1, x2, y2, c)
+                        case 'R':
+                            board.draw_rectangle(x1, y1, x2, y2, c)
+                        case 'L':
+                            board.draw_line(x1, y1, x1, y2, c)
+                    board.bucket_fill(x2, y2, fill)
+                self.assertEqual(str(boards[0]), str(boards[1]), f"seed {seed}")
+
+    def test_huge_canvas_is_sparse(self):
+        board = DrawingBoard(storage='tiled')
+        board.new_canvas(100000, 100000)
+        board.draw_rectangle(1, 1, 100000, 100000, '#')
+        board.draw_rectangle(1, 1, 5000, 3000, '#')
+        board.bucket_fill(2500, 1500, '.')
+        storage = board.canvas.storage
+        self.assertEqual(board.canvas.get_pixel(2, 2), '.')
+        self.assertEqual(board.canvas.get_pixel(5001, 2), ' ')
+        self.assertEqual(board.canvas.get_pixel(1, 50000), '#')
+        self.assertEqual(storage.row_text(0, 0, 5), '#####')
+        self.assertEqual(storage.row_text(500, 4990, 5002), '.' * 9 + '#  ')
+        # Only tiles crossed by rectangle outlines hold per-pixel rows
+        uniform = sum(isinstance(tile, str) for tile in storage.tiles.values())
+        self.assertGreater(uniform, 3000)
+        self.assertLess(len(storage.tiles) - uniform, 7000)
+
+    def test_full_tile_writes_stay_uniform(self):
+        storage = TiledStorage(8, 8, tile_size=4)
+        storage.fill_rect(0, 0, 6, 4, 'x')
+        self.assertEqual(storage.tiles[0, 0], 'x')
+        self.assertIsInstance(storage.tiles[1, 0], list)
+        storage.fill_rect(0, 0, 8, 8, ' ')
+        self.assertEqual(storage.tiles, {})
+
+
+class TestRunStorage(TestCase):
+
+    def test_matches_list_storage(self):
+        for seed in range(10):
+            rng = random.Random(seed)
+            width, height = rng.randint(5, 23), rng.randint(5, 23)
+            boards = [DrawingBoard(storage='list'), DrawingBoard(storage='rle')]
+            for board in boards:
+                board.new_canvas(width, height)
+            for _ in range(25):
+                x1, y1 = rng.randint(1, width), rng.randint(1, height)
+                x2, y2 = rng.randint(1, width), rng.randint(1, height)
+                c, fill, shape = rng.choice('xo '), rng.choice('#.'), rng.choice('PRL')
+                for board in boards:
+                    match shape:
+                        case 'P':
+                            board.canvas.draw_pixel(x1, y1, c)
+                        case 'R':
+                            board.draw_rectangle(x1, y1, x2, y2, c)
+                        case 'L':
+                            board.draw_line(x1, y1, x1, y2, c)
+                    board.bucket_fill(x2, y2, fill)
+                self.assertEqual(str(boards[0]), str(boards[1]), f"seed {seed}")
+
+    def test_rows_are_run_lists(self):
+        storage = RunStorage(10, 1)
+        storage.fill_span(0, 2, 5, 'x')
+        storage.fill_span(0, 5, 7, 'x')
+        storage.set(9, 0, 'o')
+        self.assertEqual((storage.starts[0], storage.chars[0]), ([0, 2, 7, 9], [' ', 'x', ' ', 'o']))
+        self.assertEqual(storage.run_at(4, 0), (2, 7, 'x'))
+        self.assertEqual(storage.row_text(0, 1, 8), ' xxxxx ')
+        storage.fill_span(0, 0, 10, ' ')
+        self.assertEqual((storage.starts[0], storage.chars[0]), ([0], [' ']))
+
+    def test_wide_canvas_scales_with_runs(self):
+        board = DrawingBoard(storage='rle')
+        board.new_canvas(10_000_000, 20)
+        board.draw_rectangle(1, 1, 10_000_000, 20, '#')
+        board.draw_line(5_000_000, 1, 5_000_000, 20, '|')
+        board.bucket_fill(2, 2, '.')
+        storage = board.canvas.storage
+        self.assertEqual(max(len(starts) for starts in storage.starts), 5)
+        self.assertEqual(board.canvas.get_pixel(5_000_001, 10), ' ')
+        self.assertEqual(storage.row_text(9, 4_999_997, 5_000_002), '..|  ')
+
+
+@skipUnless(numpy, "NumPy is not installed")
+class TestNumpyStorage(TestCase):
+
+    def test_matches_list_storage(self):
+        for seed in range(10):
+            rng = random.Random(seed)
+            width, height = rng.randint(5, 30), rng.randint(5, 30)
+            history = seed % 2 == 0
+            boards = [DrawingBoard(storage='list'), DrawingBoard(storage='numpy', history=History() if history else None)]
+            for board in boards:
+                board.new_canvas(width, height)
+            for _ in range(25):
+                x1, y1 = rng.randint(1, width), rng.randint(1, height)
+                x2, y2 = rng.randint(1, width), rng.randint(1, height)
+                c, fill, shape = rng.choice('xo '), rng.choice('#.'), rng.choice('RL')
+                for board in boards:
+                    if shape == 'R':
+                        board.draw_rectangle(x1, y1, x2, y2, c)
+                    else:
+                        board.draw_line(x1, y1, x2, y1, c)
+                    board.bucket_fill(x2, y2, fill)
+                self.assertEqual(str(boards[0]), str(boards[1]), f"seed {seed}")
+
+    def test_spiral_fill(self):
+        boards = [DrawingBoard(storage=name) for name in ('list', 'numpy')]
+        for board in boards:
+            board.new_canvas(41, 41)
+            for offset in range(2, 21, 2):
+                board.draw_rectangle(offset, offset, 42 - offset, 42 - offset, '#')
+                board.canvas.draw_pixel(offset, offset + 1, ' ')
+            board.bucket_fill(1, 1, '.')
+        self.assertEqual(str(boards[0]), str(boards[1]))
+
+    def test_fill_window_grows(self):
+        # Windows of one pixel around the seed have to grow over and over
+        with patch.object(NumpyStorage, 'window_margin', 1):
+            self.test_matches_list_storage()
+            self.test_spiral_fill()
+
+    def test_fill_reads_around_the_region(self):
+        canvas = Canvas(3000, 3000, 'numpy')
+        canvas.fill_rect(10, 10, 14, 14, '#')
+        canvas.fill_rect(11, 11, 13, 13, ' ')
+        canvas.take_dirty()
+        with patch('src.storage._scanline_region', wraps=_scanline_region) as scanline:
+            FILL_ENGINES['span'](canvas, 12, 12, '.')
+        self.assertEqual(canvas.take_dirty(), ({10, 11, 12}, (10, 10, 12, 12)))
+        # One small window around the seed was read
+        self.assertEqual(len(scanline.call_args_list), 1)
+        self.assertLess(scanline.call_args.args[0].size, 100 * 100)
+        self.assertEqual(canvas.content.count('.'), 9)
+
+    def test_backend_is_numpy(self):
+        self.assertIsInstance(Canvas(3, 3, 'numpy').storage, NumpyStorage)
+
+
+class TestNumpyFallback(TestCase):
+
+    def test_fallback_without_numpy(self):
+        expected = NumpyStorage if numpy is not None else WideStorage
+        self.assertIs(STORAGE_BACKENDS['numpy'], expected)